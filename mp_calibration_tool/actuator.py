@@ -0,0 +1,100 @@
+"""Actuator layer that only sends the servo commands that changed."""
+from array import array
+
+from typing import Optional
+
+from mp_calibration_tool.clock import SYSTEM_CLOCK
+from mp_calibration_tool.clock import Clock
+from mp_calibration_tool.matrix import Matrix
+from mp_calibration_tool.metrics import REGISTRY
+
+
+ACTUATOR_WRITES = REGISTRY.counter(
+    'mpct_actuator_writes_total', 'Number of servo commands written.')
+ACTUATOR_SKIPPED_WRITES = REGISTRY.counter(
+    'mpct_actuator_skipped_writes_total',
+    'Number of servo commands skipped because the target did not change.')
+
+
+class DeltaActuator():
+    """Track the last command per servo and skip redundant writes.
+
+    A servo is only written when its target moved by more than the
+    deadband (in radians). Every servo is rewritten once per keep-alive
+    period regardless, so a missed write cannot persist.
+    """
+
+    def __init__(
+            self,
+            hardware_interface,
+            deadband: float = 0.0,
+            keepalive: float = 1.0,
+            clock: Clock = SYSTEM_CLOCK
+        ) -> None:
+        self._hardware_interface = hardware_interface
+        self._clock = clock
+        self._per_servo = hasattr(hardware_interface, 'set_actuator_position')
+        self.deadband = deadband
+        self.keepalive = keepalive
+
+        self._last_command = array('d', bytes(8 * 12))
+        self._changed = [0] * 12
+        self._last_refresh: Optional[float] = None
+
+        self.writes = 0
+        self.skipped = 0
+
+    def refresh(self, joint_angles: Matrix, now: float) -> None:
+        """Write every servo."""
+        self._hardware_interface.set_actuator_postions(joint_angles)
+        self._last_command[:] = joint_angles.data
+        self._last_refresh = now
+        self.writes += 12
+        ACTUATOR_WRITES.inc(12)
+
+    def command(
+            self,
+            joint_angles: Matrix,
+            now: Optional[float] = None
+        ) -> int:
+        """Send the changed servo targets and return how many were written."""
+        if now is None:
+            now = self._clock.monotonic()
+
+        if self._last_refresh is None \
+                or now - self._last_refresh >= self.keepalive:
+            self.refresh(joint_angles, now)
+            return 12
+
+        angles = joint_angles.data
+        last_command = self._last_command
+        deadband = self.deadband
+        changed_servos = self._changed
+        changed = 0
+        for servo in range(12):
+            if abs(angles[servo] - last_command[servo]) > deadband:
+                changed_servos[changed] = servo
+                changed += 1
+        if changed == 0:
+            self.skipped += 12
+            ACTUATOR_SKIPPED_WRITES.inc(12)
+            return 0
+
+        if self._per_servo:
+            for servo in changed_servos[:changed]:
+                axis, leg = divmod(servo, 4)
+                self._hardware_interface.set_actuator_position(
+                    angles[servo], axis, leg)
+                last_command[servo] = angles[servo]
+            self.writes += changed
+            self.skipped += 12 - changed
+            ACTUATOR_WRITES.inc(changed)
+            ACTUATOR_SKIPPED_WRITES.inc(12 - changed)
+        else:
+            # Without per-servo writes the whole matrix has to be sent
+            self._hardware_interface.set_actuator_postions(joint_angles)
+            last_command[:] = angles
+            self.writes += 12
+            ACTUATOR_WRITES.inc(12)
+
+        return changed
@@ -0,0 +1,200 @@
+"""Hardware backends giving a Pupper access to the devices of its robot."""
+import os
+
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+from mp_calibration_tool.history import MACHINE_ID_PATH
+from mp_calibration_tool.history import get_robot_id
+from mp_calibration_tool.matrix import Matrix
+from mp_calibration_tool.metrics import REGISTRY
+from mp_calibration_tool.sampler import BATTERY_CURRENT_PATH
+from mp_calibration_tool.sampler import read_battery_current
+
+
+HW_VERSION_PATH = '/home/ubuntu/.hw_version'
+P1_CALIBRATION_PATH = '/home/ubuntu/.nv_file'
+EEPROM_PATH = '/sys/bus/i2c/devices/3-0050/eeprom'
+GPIO_VALUE_PATH = '/sys/class/gpio/gpio{}/value'
+
+SERVO_ENABLE_PINS = (19, 26, 25, 21)
+
+SERVO_POWER_ERRORS = REGISTRY.counter(
+    'mpct_servo_power_errors_total',
+    'Number of servo power GPIO writes that failed.')
+
+
+class SysfsBackend():
+    """Devices of a robot reached through its filesystem under root.
+
+    The default root is the running system. Any other root, like the
+    mounted filesystem of a board on a test bench, is never allowed to
+    manage the local robot daemon unless manage_daemon says so.
+    """
+
+    def __init__(
+            self,
+            root: str = '/',
+            manage_daemon: Optional[bool] = None
+        ) -> None:
+        self.root = root
+        self.manage_daemon = root == '/' if manage_daemon is None \
+            else manage_daemon
+
+    def path(self, path: str) -> str:
+        """Return where an absolute device path lives under the root."""
+        return os.path.join(self.root, path.lstrip('/'))
+
+    def robot_id(self) -> str:
+        """Return the machine id of the robot, or else the name of its root."""
+        if self.root == '/':
+            return get_robot_id()
+
+        robot_id = get_robot_id(self.path(MACHINE_ID_PATH), default='')
+        return robot_id or os.path.basename(os.path.normpath(self.root))
+
+    def read_hw_version(self) -> str:
+        """Return the first line of the hardware version file."""
+        with open(self.path(HW_VERSION_PATH), 'r') as hw_f:
+            return hw_f.readline()
+
+    def read_battery_current(self) -> int:
+        """Return the battery current in uA."""
+        return read_battery_current(self.path(BATTERY_CURRENT_PATH))
+
+    def set_servo_power(self, pins: Sequence[int], on: bool) -> None:
+        """Switch the servo power enable GPIOs, ignoring missing pins.
+
+        Every pin is switched even when another one fails. A failed power
+        cut raises the first error once all pins were tried.
+        """
+        value = '1' if on else '0'
+        error: Optional[OSError] = None
+        for pin in pins:
+            try:
+                with open(self.path(GPIO_VALUE_PATH.format(pin)), 'w') as gpio_f:
+                    gpio_f.write(value)
+            except FileNotFoundError:
+                # Robots only export the pins of their hardware version
+                pass
+            except OSError as pin_error:
+                SERVO_POWER_ERRORS.inc()
+                print(f'Could not switch servo power GPIO {pin}: {pin_error}')
+                if error is None:
+                    error = pin_error
+        if error is not None and not on:
+            raise error
+
+    def stop_daemon(self, pins: Sequence[int]) -> None:
+        """Stop the robot daemon and keep the servos powered."""
+        if self.manage_daemon:
+            os.system('sudo systemctl stop robot')
+        self.set_servo_power(pins, True)
+
+    def start_daemon(self, pins: Sequence[int]) -> None:
+        """Start the robot daemon with the servos powered."""
+        if self.manage_daemon:
+            os.system('sudo systemctl start robot')
+        self.set_servo_power(pins, True)
+
+    def create_servo_driver(self):
+        """Create the servo driver of the robot."""
+        from pupper.HardwareInterface import HardwareInterface
+        return HardwareInterface()
+
+
+class SimulatedServoDriver():
+    """Servo driver keeping the last commanded positions in memory."""
+
+    def __init__(self) -> None:
+        self.positions = Matrix.zeros(3, 4)
+        self.writes = 0
+
+    def set_actuator_postions(self, joint_angles: Matrix) -> None:
+        self.positions.assign(joint_angles)
+        self.writes += 1
+
+    def set_actuator_position(self, joint_angle: float, axis: int, leg: int) -> None:
+        self.positions[axis, leg] = joint_angle
+        self.writes += 1
+
+
+class SimulatedBackend(SysfsBackend):
+    """Robot simulated by a directory laid out like its filesystem.
+
+    Missing device files are created on construction, so an empty root
+    becomes a robot with a blank EEPROM. The battery current is read back
+    from its file, so a test can change it while the robot runs, unless a
+    current_source callable replaces it. A GPIO file is only rewritten
+    when its value changes, as overload detection enables the servos on
+    every tick.
+    """
+
+    def __init__(
+            self,
+            root: str,
+            hw_version: str = 'P2',
+            current: int = 500000,
+            eeprom_size: int = 256
+        ) -> None:
+        super().__init__(root, manage_daemon=False)
+        self.daemon_running = True
+        self.servo_drivers: List[SimulatedServoDriver] = []
+        self.current_source: Optional[Callable[[], int]] = None
+        self.servo_power: Dict[int, bool] = {}
+
+        files = [
+            (HW_VERSION_PATH, f'{hw_version}\n'.encode()),
+            (P1_CALIBRATION_PATH if hw_version == 'P1' else EEPROM_PATH,
+             b'\xff' * eeprom_size),
+            (BATTERY_CURRENT_PATH, f'{current}\n'.encode()),
+        ] + [(GPIO_VALUE_PATH.format(pin), b'1') for pin in SERVO_ENABLE_PINS]
+        for path, content in files:
+            path = self.path(path)
+            if not os.path.exists(path):
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, 'wb') as device_f:
+                    device_f.write(content)
+
+    def read_battery_current(self) -> int:
+        if self.current_source is not None:
+            return self.current_source()
+
+        return super().read_battery_current()
+
+    def set_servo_power(self, pins: Sequence[int], on: bool) -> None:
+        changed = [pin for pin in pins if self.servo_power.get(pin) != on]
+        if changed:
+            super().set_servo_power(changed, on)
+            self.servo_power.update((pin, on) for pin in changed)
+
+    def stop_daemon(self, pins: Sequence[int]) -> None:
+        self.daemon_running = False
+        self.set_servo_power(pins, True)
+
+    def start_daemon(self, pins: Sequence[int]) -> None:
+        self.daemon_running = True
+        self.set_servo_power(pins, True)
+
+    def create_servo_driver(self) -> SimulatedServoDriver:
+        driver = SimulatedServoDriver()
+        self.servo_drivers.append(driver)
+
+        return driver
+
+
+BACKENDS = {
+    'sysfs': SysfsBackend,
+    'sim': SimulatedBackend,
+}
+
+
+def create_backend(kind: str, root: str) -> SysfsBackend:
+    """Create a backend by name for the robot at root."""
+    if kind not in BACKENDS:
+        raise ValueError(f'Unknown hardware backend {kind}!')
+
+    return BACKENDS[kind](root)
@@ -1,40 +1,167 @@
+from array import array
 from dataclasses import dataclass
+from dataclasses import field
+import math
+import numbers
+from typing import Callable
 from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Tuple
 from typing import Union
 
-import numpy as np
+from mp_calibration_tool.matrix import Matrix
 
 
-@dataclass
-class LegCalibrationData():
+DEGREES_TO_RADIANS = 0.01745
 
-    matrix_eeprom: np.ndarray = np.array([
-            [0, 0, 0, 0],
-            [45, 45, 45, 45],
-            [-45, -45, -45, -45]
-        ]
-    )
-    # servo_standard_langle: List[List[Union[float, int]]] = [
-    servo_standard_langle: np.ndarray = np.array([
+
+def _default_matrix() -> Matrix:
+    """Return the factory default 3x4 calibration matrix."""
+    return Matrix.from_rows([
         [0, 0, 0, 0],
         [45, 45, 45, 45],
         [-45, -45, -45, -45]
     ])
+
+
+def validate_matrix(matrix) -> None:
+    """Raise ValueError unless matrix is a 3x4 matrix of calibration angles."""
+    try:
+        rows = [list(row) for row in matrix]
+    except TypeError:
+        raise ValueError('Calibration matrix must be 3x4 rows of angles')
+    if len(rows) != 3 or any(len(row) != 4 for row in rows):
+        raise ValueError(
+            'Calibration matrix must be 3 rows of 4 angles, got '
+            f'{len(rows)} rows of {[len(row) for row in rows]} angles')
+    for value in (value for row in rows for value in row):
+        # bool is an int, but never a meaningful angle
+        if isinstance(value, bool) or not isinstance(value, numbers.Real):
+            raise ValueError(
+                f'Calibration angles must be numbers, got {value!r}')
+        if not math.isfinite(value) or abs(value) > 90:
+            raise ValueError(
+                f'Calibration angles must be within [-90, 90], got {value!r}')
+
+
+@dataclass
+class CalibrationTransform():
+    """Affine transform from 3x4 joint values to servo angles in radians.
+
+    angle = clip((value - offset) * scale, minimum, maximum)
+    """
+    offset: Matrix = field(default_factory=lambda: Matrix.zeros(3, 4))
+    scale: float = DEGREES_TO_RADIANS
+    minimum: float = -math.pi
+    maximum: float = math.pi
+
+    def angle(self, value: float, axis: int, leg: int) -> float:
+        """Transform the value of a single joint."""
+        angle = (value - self.offset[axis, leg]) * self.scale
+
+        return min(self.maximum, max(self.minimum, angle))
+
+    def apply(self, values: Matrix, out: Matrix) -> Matrix:
+        """Transform 3x4 values into the preallocated out."""
+        for axis in range(3):
+            for leg in range(4):
+                out[axis, leg] = self.angle(values[axis, leg], axis, leg)
+
+        return out
+
+
+class JointLookupTable():
+    """Final servo command of every integer joint value of every servo.
+
+    The table is compiled once per calibration, which turns the command of
+    all 12 servos into an add and an index per servo, without any float
+    math. Joint values are clamped to the ranges the table was built for.
+    """
+
+    def __init__(self, ranges: Sequence[Tuple[int, int]]) -> None:
+        self._ranges = list(ranges)
+        self._size = max(high - low for low, high in ranges) + 1
+
+        # Flat index of a joint value is its servo's base plus the value.
+        # Servos are in the 3x4 axis-major order of the commands.
+        self._low = [low for low, _ in ranges for _ in range(4)]
+        self._high = [high for _, high in ranges for _ in range(4)]
+        self._base = [
+            servo * self._size - low for servo, low in enumerate(self._low)]
+        # Position of each servo's value among the leg-major joint values
+        self._joint = [3 * (servo % 4) + servo // 4 for servo in range(12)]
+        self._table = array('d', bytes(8 * len(self._base) * self._size))
+
+    def compile(
+            self,
+            transform: CalibrationTransform,
+            convert: Optional[Callable[[float], float]] = None
+        ) -> None:
+        """Fill the table with the command of every joint value.
+
+        Commands are servo angles in radians, passed through convert when
+        the servos take another unit.
+        """
+        table = self._table
+        for servo, low in enumerate(self._low):
+            axis, leg = divmod(servo, 4)
+            start = servo * self._size
+            for offset in range(self._size):
+                value = min(low + offset, self._high[servo])
+                command = transform.angle(value, axis, leg)
+                if convert is not None:
+                    command = convert(command)
+                table[start + offset] = command
+
+    def apply(self, joints: Sequence[int], out: Matrix) -> Matrix:
+        """Look up the commands of 12 joint values into the 3x4 out.
+
+        The joint values are in leg-major order, three per leg, as the
+        joint snapshot holds them.
+        """
+        table = self._table
+        low = self._low
+        high = self._high
+        base = self._base
+        data = out.data
+        for servo, joint in enumerate(self._joint):
+            value = joints[joint]
+            if value < low[servo]:
+                value = low[servo]
+            elif value > high[servo]:
+                value = high[servo]
+            data[servo] = table[base[servo] + value]
+
+        return out
+
+
+@dataclass
+class LegCalibrationData():
+
+    matrix_eeprom: Matrix = field(default_factory=_default_matrix)
+    # servo_standard_langle: List[List[Union[float, int]]] = [
+    servo_standard_langle: Matrix = field(default_factory=_default_matrix)
     # servo_neutral_langle: List[List[Union[float, int]]] = [
-    servo_neutral_langle: np.ndarray = np.array([
-        [0, 0, 0, 0],
-        [45, 45, 45, 45],
-        [-45, -45, -45, -45]
-    ])
+    servo_neutral_langle: Matrix = field(default_factory=_default_matrix)
     # no_calibration_servo_angle: List[List[Union[float, int]]] = [
-    no_calibration_servo_angle: np.ndarray = np.array([
-        [0, 0, 0, 0],
-        [45, 45, 45, 45],
-        [-45, -45, -45, -45]
-    ])
+    no_calibration_servo_angle: Matrix = field(
+        default_factory=_default_matrix)
     # calibration_servo_angle: List[List[Union[float, int]]] = [
-    calibration_servo_angle: np.ndarray = np.array([
-        [0, 0, 0, 0],
-        [45, 45, 45, 45],
-        [-45, -45, -45, -45]
-    ])
+    calibration_servo_angle: Matrix = field(
+        default_factory=_default_matrix)
+    transform: CalibrationTransform = field(
+        default_factory=CalibrationTransform, init=False)
+
+    def __post_init__(self) -> None:
+        self.compile_transform()
+
+    def compile_transform(self) -> CalibrationTransform:
+        """Rebuild the cached transform after the calibration changed."""
+        offset = self.transform.offset
+        for axis in range(3):
+            for leg in range(4):
+                offset[axis, leg] = self.no_calibration_servo_angle[axis, leg] \
+                    - self.calibration_servo_angle[axis, leg]
+
+        return self.transform
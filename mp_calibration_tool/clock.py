@@ -0,0 +1,70 @@
+"""Injectable clocks for the timed parts of the calibration tool."""
+import threading
+import time
+
+from typing import Optional
+from typing import Union
+
+
+class SystemClock():
+    """The real monotonic and wall clocks of the system."""
+
+    def monotonic(self) -> float:
+        return time.monotonic()
+
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        if seconds > 0:
+            time.sleep(seconds)
+
+    def wait(self, event: threading.Event, timeout: Optional[float]) -> bool:
+        """Wait for event for at most timeout seconds and return whether set."""
+        return event.wait(timeout)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class SimulatedClock():
+    """Clock whose time only moves when it is advanced or slept on.
+
+    Sleeping or waiting advances the clock at once instead of blocking, so
+    a component driven by it runs as fast as its code allows while seeing
+    its usual periods go by. Every thread sleeping on the clock advances
+    it, so a simulation should drive its timed components from a single
+    thread.
+    """
+
+    def __init__(self, start: float = 0.0, epoch: float = 1600000000.0) -> None:
+        self._lock = threading.Lock()
+        self._now = start
+        self._epoch = epoch
+
+    def monotonic(self) -> float:
+        return self._now
+
+    def time(self) -> float:
+        return self._epoch + self._now
+
+    def advance(self, seconds: float) -> None:
+        """Move the clock forward."""
+        if seconds > 0:
+            with self._lock:
+                self._now += seconds
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def wait(self, event: threading.Event, timeout: Optional[float]) -> bool:
+        """Return at once, after the timeout elapsed unless event is set."""
+        if not event.is_set():
+            if timeout is None:
+                raise ValueError('Waiting forever on a simulated clock!')
+            self.advance(timeout)
+
+        return event.is_set()
+
+
+Clock = Union[SystemClock, SimulatedClock]
@@ -0,0 +1,92 @@
+"""Background control loop driving the servos from the leg values."""
+import threading
+
+from typing import Optional
+
+from mp_calibration_tool.actuator import DeltaActuator
+from mp_calibration_tool.clock import SYSTEM_CLOCK
+from mp_calibration_tool.clock import Clock
+from mp_calibration_tool.quadruped import Pupper
+from mp_calibration_tool.realtime import RealtimeReport
+from mp_calibration_tool.realtime import RealtimeSettings
+from mp_calibration_tool.realtime import apply_realtime_settings
+from mp_calibration_tool.realtime import measure_jitter
+
+
+class ControlLoop(threading.Thread):
+    """Periodically check for overloads and push joint angles to the servos.
+
+    This replaces the ``updateServoValue`` thread of the original GUI.
+    """
+
+    def __init__(
+            self,
+            pupper: Pupper,
+            period: float = 0.01,
+            realtime: Optional[RealtimeSettings] = None,
+            actuator: Optional[DeltaActuator] = None,
+            clock: Clock = SYSTEM_CLOCK
+        ) -> None:
+        super().__init__(name='servo-control', daemon=True)
+        self._pupper = pupper
+        self._period = period
+        self._realtime = realtime
+        self._clock = clock
+        self.actuator = actuator or DeltaActuator(
+            pupper.hardware_interface, clock=clock)
+        self._ready = threading.Event()
+        self._stop_event = threading.Event()
+        self.report: Optional[RealtimeReport] = None
+        self.overload = False
+        self.overload_trips = 0
+        self.overload_ticks = 0
+        self.ticks = 0
+        self.max_lateness = 0.0
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until the real-time settings are applied and measured."""
+        return self._ready.wait(timeout)
+
+    def tick(self) -> None:
+        """Run a single control step."""
+        overload = self._pupper.overload_detection()
+        if overload:
+            self.overload_trips += not self.overload
+            self.overload_ticks += 1
+        else:
+            self.actuator.command(self._pupper.calculate_joint_angles())
+        self.overload = overload
+        self.ticks += 1
+
+    def run(self) -> None:
+        """Apply the real-time settings and run until stopped."""
+        if self._realtime is not None:
+            self.report = apply_realtime_settings(self._realtime)
+            self.report.jitter = measure_jitter(self._period)
+        self._ready.set()
+        self._run_ticks()
+
+    def run_for(self, duration: float) -> None:
+        """Run in the calling thread for duration seconds of the clock."""
+        self._run_ticks(self._clock.monotonic() + duration)
+
+    def _run_ticks(self, deadline: Optional[float] = None) -> None:
+        clock = self._clock
+        next_time = clock.monotonic()
+        while not self._stop_event.is_set() \
+                and (deadline is None or next_time < deadline):
+            self.tick()
+
+            next_time += self._period
+            delay = next_time - clock.monotonic()
+            if delay > 0:
+                clock.wait(self._stop_event, delay)
+            else:
+                self.max_lateness = max(self.max_lateness, -delay)
+                next_time = clock.monotonic()
+
+    def stop(self) -> None:
+        """Stop the loop and wait for the thread to finish."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
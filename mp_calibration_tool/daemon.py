@@ -0,0 +1,286 @@
+"""Hot-apply of calibrations to a running robot daemon over a control socket.
+
+The daemon listens on a Unix socket for JSON lines like the RPC server::
+
+    {"id": 1, "method": "apply_calibration",
+     "params": {"matrix": [[0, 0, 0, 0], [45, 45, 45, 45], [-45, -45, -45, -45]]}}
+
+and answers once the matrix drives the servos, at its next control tick.
+StandInDaemon implements the protocol for testing without the robot
+daemon.
+"""
+import asyncio
+import json
+import os
+import socket
+import time
+
+from typing import Any
+from typing import Awaitable
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+
+from mp_calibration_tool.calibration import DEGREES_TO_RADIANS
+from mp_calibration_tool.calibration import validate_matrix
+from mp_calibration_tool.matrix import Matrix
+
+
+DAEMON_SOCKET_PATH = '/run/mpct/daemon.sock'
+
+
+class DaemonError(Exception):
+    """Error reported by the robot daemon."""
+
+
+class DaemonClient():
+    """Client of the control socket of a running robot daemon.
+
+    The connection is opened on the first call and kept for the next ones.
+    """
+
+    def __init__(
+            self,
+            socket_path: str = DAEMON_SOCKET_PATH,
+            timeout: float = 1.0
+        ) -> None:
+        self.socket_path = socket_path
+        self._timeout = timeout
+        self._socket: Optional[socket.socket] = None
+        self._file = None
+        self._next_id = 0
+
+    def call(self, method: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """Send a single request and return its result."""
+        if self._socket is None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(self._timeout)
+            try:
+                self._socket.connect(self.socket_path)
+            except OSError:
+                self.close()
+                raise
+            self._file = self._socket.makefile('rb')
+
+        self._next_id += 1
+        request = {'id': self._next_id, 'method': method, 'params': params or {}}
+        try:
+            self._socket.sendall(json.dumps(request).encode() + b'\n')
+            line = self._file.readline()
+        except OSError:
+            self.close()
+            raise
+        if not line:
+            self.close()
+            raise ConnectionError('Robot daemon closed the control socket!')
+
+        try:
+            response = json.loads(line)
+        except ValueError:
+            # The stream can not be trusted to be framed anymore
+            self.close()
+            raise DaemonError('Invalid JSON response from the robot daemon!')
+        if not isinstance(response, dict):
+            raise DaemonError('Robot daemon response is not a JSON object!')
+        if 'error' in response:
+            raise DaemonError(response['error'])
+        if 'result' not in response:
+            raise DaemonError('Robot daemon response holds no result!')
+
+        return response['result']
+
+    def ping(self) -> Dict[str, Any]:
+        """Return the state of the daemon."""
+        return self.call('ping')
+
+    def get_calibration(self) -> List[List[int]]:
+        """Return the calibration matrix driving the servos."""
+        return self.call('get_calibration')['matrix']
+
+    def apply_calibration(self, matrix) -> Dict[str, Any]:
+        """Hand a calibration matrix over to the daemon.
+
+        Return once the daemon drives the servos with it.
+        """
+        matrix = [[int(value) for value in row] for row in matrix]
+        return self.call('apply_calibration', {'matrix': matrix})
+
+    def close(self) -> None:
+        """Close the connection to the daemon."""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+
+
+class StandInDaemon():
+    """Local stand-in for the robot daemon, for testing hot-apply.
+
+    It commands the servos at the neutral pose offset by the calibration
+    on every tick, and takes over a hot-applied matrix at its next tick.
+    """
+
+    def __init__(
+            self,
+            servo_driver,
+            matrix,
+            socket_path: str = DAEMON_SOCKET_PATH,
+            period: float = 0.01
+        ) -> None:
+        validate_matrix(matrix)
+        self._servo_driver = servo_driver
+        self._socket_path = socket_path
+        self._period = period
+        self._matrix = Matrix.from_rows(matrix, 'i')
+        self._angles = Matrix.zeros(3, 4)
+        self._pending: List[asyncio.Future] = []
+        self._staged: Optional[Matrix] = None
+        self.generation = 1
+        self.ticks = 0
+        self._methods: Dict[str, Callable[[Dict[str, Any]], Awaitable[Any]]] = {
+            'ping': self.ping,
+            'get_calibration': self.get_calibration,
+            'apply_calibration': self.apply_calibration,
+        }
+
+    async def serve_forever(self) -> None:
+        """Run the control ticks and serve the control socket until cancelled."""
+        os.makedirs(os.path.dirname(os.path.abspath(self._socket_path)),
+                    exist_ok=True)
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+
+        server = await asyncio.start_unix_server(
+            self._handle_client, path=self._socket_path)
+        ticks = asyncio.create_task(self._run_ticks())
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            ticks.cancel()
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+
+    def tick(self) -> None:
+        """Take over any staged calibration and command the servos."""
+        if self._staged is not None:
+            self._matrix = self._staged
+            self._staged = None
+            self.generation += 1
+            for future in self._pending:
+                if not future.done():
+                    future.set_result(self.ticks)
+            self._pending = []
+
+        angles = self._angles.data
+        for servo, angle in enumerate(self._matrix.data):
+            angles[servo] = angle * DEGREES_TO_RADIANS
+        self._servo_driver.set_actuator_postions(self._angles)
+        self.ticks += 1
+
+    async def _run_ticks(self) -> None:
+        loop = asyncio.get_running_loop()
+        next_time = loop.time()
+        while True:
+            self.tick()
+            next_time += self._period
+            delay = next_time - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                next_time = loop.time()
+                await asyncio.sleep(0)
+
+    async def _handle_client(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter
+        ) -> None:
+        """Answer every request line sent by a single client."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                response = await self._handle_line(line)
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_line(self, line: bytes) -> Dict[str, Any]:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {'id': None, 'error': 'Invalid JSON request!'}
+        if not isinstance(request, dict):
+            return {'id': None, 'error': 'Request must be a JSON object!'}
+
+        request_id = request.get('id')
+        name = request.get('method')
+        method = self._methods.get(name) if isinstance(name, str) else None
+        if method is None:
+            return {'id': request_id, 'error': f'Unknown method: {name}'}
+
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            return {'id': request_id, 'error': 'Params must be a JSON object!'}
+
+        try:
+            return {'id': request_id, 'result': await method(params)}
+        except DaemonError as error:
+            return {'id': request_id, 'error': str(error)}
+        except Exception as error:
+            # Answer the request rather than drop the client
+            return {
+                'id': request_id,
+                'error': f'{name} failed: {type(error).__name__}: {error}',
+            }
+
+    async def ping(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the tick count and calibration generation."""
+        return {'ticks': self.ticks, 'generation': self.generation}
+
+    async def get_calibration(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Return the calibration matrix driving the servos."""
+        return {'matrix': self._matrix.tolist(), 'generation': self.generation}
+
+    async def apply_calibration(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Stage a calibration matrix and wait for a tick to take it over."""
+        matrix = params.get('matrix')
+        try:
+            validate_matrix(matrix)
+        except (TypeError, ValueError) as error:
+            raise DaemonError(str(error))
+
+        start = time.perf_counter()
+        self._staged = Matrix.from_rows(matrix, 'i')
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append(future)
+        tick = await future
+
+        return {
+            'generation': self.generation,
+            'tick': tick,
+            'seconds': time.perf_counter() - start,
+        }
+
+
+def run_stand_in_daemon(
+        servo_driver,
+        matrix,
+        socket_path: str = DAEMON_SOCKET_PATH,
+        period: float = 0.01
+    ) -> None:
+    """Run a stand-in robot daemon until interrupted."""
+    daemon = StandInDaemon(servo_driver, matrix, socket_path, period)
+    try:
+        asyncio.run(daemon.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,62 @@
+"""Key dispatch shared by the interactive and replayed calibration tool."""
+from dataclasses import dataclass
+
+from mp_calibration_tool.quadruped import Pupper
+
+
+LEG_OPTIONS = {
+    '1': 'left_front',
+    '2': 'right_front',
+    '3': 'left_back',
+    '4': 'right_back',
+}
+
+
+@dataclass
+class Selection():
+    """Currently selected leg and joint."""
+    leg: str = 'left_front'
+    joint: str = 'h'
+    confirm_apply: bool = False
+
+    def status(self) -> str:
+        """Return the prompt of a pending apply, if any."""
+        if not self.confirm_apply:
+            return ''
+
+        return 'Write the calibration to the EEPROM? y: Yes, any other key: No'
+
+
+def handle_key(pupper: Pupper, key: str, selection: Selection) -> bool:
+    """Apply a key press to the Pupper and return whether to redraw."""
+    # NOTE: Applying overwrites the EEPROM calibration, so it waits for a
+    # confirming y in place of the message box of the original GUI version.
+    # Any other key cancels it and is handled as usual.
+    if selection.confirm_apply:
+        selection.confirm_apply = False
+        if key in ['y', 'Y']:
+            pupper.apply_calibration()
+            return True
+        handle_key(pupper, key, selection)
+        return True
+
+    if key in LEG_OPTIONS:
+        selection.leg = LEG_OPTIONS[key]
+
+    elif key in ['h', 'H', 't', 'T', 'c', 'C']:
+        selection.joint = key.lower()
+
+    elif key in ['i', 'I', 'd', 'D']:
+        if key.lower() == 'i':
+            pupper.__dict__[selection.leg].increase_joint_value(selection.joint)
+        elif key.lower() == 'd':
+            pupper.__dict__[selection.leg].decrease_joint_value(selection.joint)
+        pupper.publish_joints()
+
+    elif key in ['a', 'A']:
+        selection.confirm_apply = True
+
+    else:
+        return False
+
+    return True
@@ -0,0 +1,184 @@
+"""File backed model of a 24Cxx I2C EEPROM for testing calibration I/O."""
+import errno
+import io
+import os
+import time
+from array import array
+
+from dataclasses import dataclass
+from typing import Callable
+from typing import IO
+
+
+# 24C02 defaults, on a 100 kHz bus moving 9 bits per byte
+DEFAULT_EEPROM_SIZE = 256
+DEFAULT_PAGE_SIZE = 8
+DEFAULT_WRITE_CYCLE = 0.005
+DEFAULT_BUS_RATE = 100000 / 9
+
+
+@dataclass
+class EepromStats():
+    """Traffic and time spent by a simulated EEPROM."""
+    reads: int = 0
+    bytes_read: int = 0
+    page_writes: int = 0
+    bytes_written: int = 0
+    read_time: float = 0.0
+    write_time: float = 0.0
+
+    def __str__(self) -> str:
+        return (
+            f'{self.reads} reads ({self.bytes_read} bytes, '
+            f'{self.read_time * 1e3:.1f} ms), '
+            f'{self.page_writes} page writes ({self.bytes_written} bytes, '
+            f'{self.write_time * 1e3:.1f} ms)'
+        )
+
+
+class _EepromIO(io.RawIOBase):
+    """Raw file of a simulated EEPROM, like its sysfs attribute."""
+
+    def __init__(self, eeprom: 'SimulatedEeprom', readable: bool) -> None:
+        super().__init__()
+        self._eeprom = eeprom
+        self._readable = readable
+        self._position = 0
+
+    def readable(self) -> bool:
+        return self._readable
+
+    def writable(self) -> bool:
+        return not self._readable
+
+    def readinto(self, buffer) -> int:
+        data = self._eeprom.read(self._position, len(buffer))
+        buffer[:len(data)] = data
+        self._position += len(data)
+
+        return len(data)
+
+    def write(self, data) -> int:
+        written = self._eeprom.write(self._position, bytes(data))
+        self._position += written
+
+        return written
+
+
+class SimulatedEeprom():
+    """EEPROM image kept in a file, with 24Cxx timing and wear.
+
+    Reads cost the bus transfer time. Writes are split at page boundaries
+    like the at24 driver does, and every page costs its bus transfer plus
+    a write cycle. Every byte counts how often it was programmed, and the
+    counts are kept in a sidecar file next to the image.
+
+    A read-only EEPROM refuses writes and never saves the wear counters,
+    for processes sharing the image with the one writing it.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            size: int = DEFAULT_EEPROM_SIZE,
+            page_size: int = DEFAULT_PAGE_SIZE,
+            write_cycle: float = DEFAULT_WRITE_CYCLE,
+            bus_rate: float = DEFAULT_BUS_RATE,
+            sleep: Callable[[float], None] = time.sleep,
+            read_only: bool = False
+        ) -> None:
+        self.path = path
+        self.read_only = read_only
+        self.size = size
+        self.page_size = page_size
+        self.write_cycle = write_cycle
+        self.bus_rate = bus_rate
+        self.stats = EepromStats()
+        self._sleep = sleep
+
+        # A blank EEPROM reads as all ones
+        self._image = bytearray(b'\xff' * size)
+        if os.path.exists(path):
+            with open(path, 'rb') as image_f:
+                data = image_f.read(size)
+            self._image[:len(data)] = data
+        elif not read_only:
+            self._save_image()
+
+        self.wear = array('I', bytes(4 * size))
+        if os.path.exists(self.wear_path):
+            with open(self.wear_path, 'rb') as wear_f:
+                wear = array('I')
+                wear.frombytes(wear_f.read())
+            self.wear[:min(size, len(wear))] = wear[:size]
+
+    @property
+    def wear_path(self) -> str:
+        return self.path + '.wear'
+
+    @property
+    def max_wear(self) -> int:
+        return max(self.wear)
+
+    def open(self, mode: str = 'rb') -> IO:
+        """Open the EEPROM like its sysfs file, for reading or writing."""
+        readable = 'r' in mode
+        if readable == ('w' in mode or 'a' in mode or '+' in mode):
+            raise ValueError(f'Unsupported EEPROM mode {mode}!')
+
+        raw = _EepromIO(self, readable)
+        buffered = io.BufferedReader(raw) if readable else io.BufferedWriter(raw)
+        if 'b' in mode:
+            return buffered
+
+        return io.TextIOWrapper(buffered)
+
+    def read(self, offset: int, length: int) -> bytes:
+        """Read up to length bytes at offset."""
+        data = bytes(self._image[offset:offset + length])
+        duration = len(data) / self.bus_rate
+        self._sleep(duration)
+        self.stats.reads += 1
+        self.stats.bytes_read += len(data)
+        self.stats.read_time += duration
+
+        return data
+
+    def write(self, offset: int, data: bytes) -> int:
+        """Program data at offset one page at a time."""
+        if self.read_only:
+            raise OSError(errno.EROFS, 'Read-only EEPROM')
+        if offset >= self.size:
+            raise OSError(27, 'File too large')
+        data = data[:self.size - offset]
+
+        position = offset
+        end = offset + len(data)
+        while position < end:
+            page_end = min(end, (position // self.page_size + 1) * self.page_size)
+            chunk = data[position - offset:page_end - offset]
+            duration = len(chunk) / self.bus_rate + self.write_cycle
+            self._sleep(duration)
+
+            self._image[position:page_end] = chunk
+            for i in range(position, page_end):
+                self.wear[i] += 1
+            self.stats.page_writes += 1
+            self.stats.bytes_written += len(chunk)
+            self.stats.write_time += duration
+            position = page_end
+
+        self._save_image()
+
+        return len(data)
+
+    def _save_image(self) -> None:
+        with open(self.path, 'wb') as image_f:
+            image_f.write(self._image)
+
+    def save_wear(self) -> None:
+        """Persist the wear counters next to the image."""
+        if self.read_only:
+            return
+        with open(self.wear_path, 'wb') as wear_f:
+            self.wear.tofile(wear_f)
@@ -0,0 +1,182 @@
+"""SQLite backed history of read and applied calibration matrices."""
+import json
+import os
+import socket
+import sqlite3
+import time
+
+from typing import Iterable
+from typing import List
+from typing import NamedTuple
+from typing import Optional
+
+
+DEFAULT_HISTORY_PATH = os.path.expanduser('~/.mpct/history.db')
+MACHINE_ID_PATH = '/etc/machine-id'
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS calibrations (
+    id INTEGER PRIMARY KEY,
+    robot_id TEXT NOT NULL,
+    hw_version TEXT NOT NULL,
+    timestamp REAL NOT NULL,
+    action TEXT NOT NULL,
+    matrix TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS calibrations_robot_time
+    ON calibrations (robot_id, timestamp);
+CREATE INDEX IF NOT EXISTS calibrations_hw_version_time
+    ON calibrations (hw_version, timestamp);
+CREATE INDEX IF NOT EXISTS calibrations_time
+    ON calibrations (timestamp);
+'''
+
+
+class HistoryEntry(NamedTuple):
+    """A calibration matrix read from or written to a robot."""
+    id: Optional[int]
+    robot_id: str
+    hw_version: str
+    timestamp: float
+    action: str
+    matrix: List[List[int]]
+
+    def __str__(self) -> str:
+        when = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(self.timestamp))
+        return (
+            f'{self.id:>6}  {when}  {self.robot_id:<32} '
+            f'{self.hw_version:<4} {self.action:<8} {self.matrix}'
+        )
+
+
+def get_robot_id(
+        path: str = MACHINE_ID_PATH,
+        default: Optional[str] = None
+    ) -> str:
+    """Return a stable identifier of this robot.
+
+    Without a machine id, default is returned, or else the hostname.
+    """
+    try:
+        with open(path, 'r') as id_f:
+            robot_id = id_f.read().strip()
+        if robot_id:
+            return robot_id
+    except OSError:
+        pass
+
+    return socket.gethostname() if default is None else default
+
+
+def _to_entry(row: tuple) -> HistoryEntry:
+    return HistoryEntry(
+        row[0], row[1], row[2], row[3], row[4], json.loads(row[5]))
+
+
+class CalibrationHistory():
+    """Indexed store of every calibration read and applied."""
+
+    def __init__(self, path: str = DEFAULT_HISTORY_PATH) -> None:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.executescript(SCHEMA)
+
+    def record(
+            self,
+            robot_id: str,
+            hw_version: str,
+            action: str,
+            matrix,
+            timestamp: Optional[float] = None
+        ) -> int:
+        """Store a single matrix and return its entry id."""
+        with self._connection:
+            cursor = self._connection.execute(
+                'INSERT INTO calibrations '
+                '(robot_id, hw_version, timestamp, action, matrix) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (
+                    robot_id,
+                    hw_version,
+                    time.time() if timestamp is None else timestamp,
+                    action,
+                    json.dumps([[int(v) for v in row] for row in matrix]),
+                )
+            )
+
+        return cursor.lastrowid
+
+    def record_many(self, entries: Iterable[HistoryEntry]) -> None:
+        """Store many entries in a single transaction."""
+        with self._connection:
+            self._connection.executemany(
+                'INSERT INTO calibrations '
+                '(robot_id, hw_version, timestamp, action, matrix) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (
+                    (
+                        entry.robot_id,
+                        entry.hw_version,
+                        entry.timestamp,
+                        entry.action,
+                        json.dumps(
+                            [[int(v) for v in row] for row in entry.matrix]),
+                    )
+                    for entry in entries
+                )
+            )
+
+    def get(self, entry_id: int) -> Optional[HistoryEntry]:
+        """Return a single entry by id."""
+        row = self._connection.execute(
+            'SELECT id, robot_id, hw_version, timestamp, action, matrix '
+            'FROM calibrations WHERE id = ?',
+            (entry_id,)
+        ).fetchone()
+
+        return None if row is None else _to_entry(row)
+
+    def query(
+            self,
+            robot_id: Optional[str] = None,
+            hw_version: Optional[str] = None,
+            action: Optional[str] = None,
+            since: Optional[float] = None,
+            until: Optional[float] = None,
+            limit: Optional[int] = None
+        ) -> List[HistoryEntry]:
+        """Return matching entries, newest first."""
+        conditions = []
+        parameters = []
+        for column, operator, value in [
+                ('robot_id', '=', robot_id),
+                ('hw_version', '=', hw_version),
+                ('action', '=', action),
+                ('timestamp', '>=', since),
+                ('timestamp', '<', until)]:
+            if value is not None:
+                conditions.append(f'{column} {operator} ?')
+                parameters.append(value)
+
+        sql = (
+            'SELECT id, robot_id, hw_version, timestamp, action, matrix '
+            'FROM calibrations'
+        )
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY timestamp DESC, id DESC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+
+        return [
+            _to_entry(row)
+            for row in self._connection.execute(sql, parameters)
+        ]
+
+    def close(self) -> None:
+        """Close the database."""
+        self._connection.close()
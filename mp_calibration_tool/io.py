@@ -1,21 +1,22 @@
 from typing import Tuple
-import numpy as np
+
+from mp_calibration_tool.matrix import Matrix
 
 def read_calibration_file(
         servo_calibration_file_path: str
-    ) -> Tuple[bool, np.ndarray]:
+    ) -> Tuple[bool, Matrix]:
     """Read all lines text from EEPROM."""
     try:
         with open(servo_calibration_file_path, 'rb') as nv_f:
-            arr1 = np.array(eval(nv_f.readline()))
-            arr2 = np.array(eval(nv_f.readline()))
-            matrix = np.append(arr1, arr2)
-            arr3 = np.array(eval(nv_f.readline()))
-            matrix = np.append(matrix, arr3)
-            matrix.resize(3,4)
+            values = list(eval(nv_f.readline()))
+            values.extend(eval(nv_f.readline()))
+            values.extend(eval(nv_f.readline()))
+            values = (values + [0] * 12)[:12]
+            matrix = Matrix.from_rows(
+                [values[0:4], values[4:8], values[8:12]], 'i')
             print(f'Get nv calibration params: \n {matrix}')
     except:
-        matrix = np.array(
+        matrix = Matrix.from_rows(
             [[0, 0, 0, 0],
                 [45, 45, 45, 45],
                 [-45, -45, -45, -45]]
@@ -27,4 +28,4 @@ def read_calibration_file(
     #         self.NocalibrationServoAngle[i][j] = self.Matrix_EEPROM[i,j]
     #         self.CalibrationServoAngle[i][j] = self.Matrix_EEPROM[i,j]
 
-    return True, matrix
\ No newline at end of file
+    return True, matrix
@@ -0,0 +1,71 @@
+"""Rich based layout renderer for the calibration tool."""
+from rich import print as r_print
+from rich.layout import Layout
+from rich.text import Text
+
+from mp_calibration_tool.options import create_options_panel
+from mp_calibration_tool.quadruped import LEG_NAMES
+from mp_calibration_tool.quadruped import Pupper
+from mp_calibration_tool.title import create_title_panel
+
+
+def create_layout(pupper: Pupper) -> Layout:
+    """Create layout containing the minipupper leg and joint selection."""
+    layout = Layout()
+    layout.split_column(
+        Layout(name='spacer', size=2),
+        Layout(name='title_bar')
+    )
+    layout['title_bar'].split_column(
+        Layout(create_title_panel(), name='title', size=5),
+        Layout(name='upper')
+    )
+    layout['upper'].split_column(
+        Layout(name='front_legs_viz', size=10),
+        Layout(name='lower')
+    )
+    layout['lower'].split_column(
+        Layout(name='back_legs_viz', size=10),
+        Layout(create_options_panel(), name='options', size=10),
+    )
+    layout['front_legs_viz'].split_row(
+        Layout(pupper.left_front.update(True), name='left_front'),
+        Layout(pupper.right_front.update(), name='right_front'),
+    )
+    layout['back_legs_viz'].split_row(
+        Layout(pupper.left_back.update(), name='left_back'),
+        Layout(pupper.right_back.update(), name='right_back'),
+    )
+
+    return layout
+
+
+class RichRenderer():
+    """Render the calibration tool through rich panels."""
+
+    def __init__(self, pupper: Pupper) -> None:
+        self._pupper = pupper
+        self._layout = create_layout(pupper)
+        self._is_first_draw = True
+        self._status = ''
+
+    def draw(
+            self,
+            leg_selection: str,
+            joint_selection: str,
+            status: str = ''
+        ) -> None:
+        """Redraw every leg panel and the status and print the layout."""
+        if status != self._status:
+            self._status = status
+            self._layout['spacer'].update(Text(status))
+        for leg in LEG_NAMES:
+            self._layout[leg].update(
+                self._pupper.__dict__[leg].update(leg == leg_selection)
+            )
+
+        if self._is_first_draw:
+            r_print(self._layout)
+            self._is_first_draw = False
+        else:
+            r_print(self._layout, end='\r')
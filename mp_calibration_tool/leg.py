@@ -1,10 +1,10 @@
 from typing import List
+from typing import Tuple
+from typing import TYPE_CHECKING
 
-from rich import box
-from rich.align import Align
-from rich.panel import Panel
-from rich.table import Table
-
+if TYPE_CHECKING:
+    from rich.panel import Panel
+    from rich.table import Table
 
 
 class Leg():
@@ -40,6 +40,14 @@ class Leg():
             }
         }
 
+    @property
+    def name(self) -> str:
+        return self._name
+
+    @property
+    def title(self) -> str:
+        return self._title
+
     @property
     def hip(self) -> int:
         return self._hip
@@ -83,8 +91,15 @@ class Leg():
 
         return value
 
-    def generate_table(self) -> Table:
+    def joint_range(self, section: str) -> Tuple[int, int]:
+        """Return the min and max values allowed for a joint."""
+        return self._range[section]['min'], self._range[section]['max']
+
+    def generate_table(self) -> 'Table':
         """Generate rich.Table with current hip, calf, and thigh values."""
+        # rich is imported lazily so the plain UI never loads it
+        from rich.table import Table
+
         table = Table()
         table.add_column(f'{self._name}', justify='right', style='cyan')
         table.add_column('Value', style='magenta')
@@ -95,8 +110,12 @@ class Leg():
 
         return table
 
-    def update(self, is_selected: bool = False) -> Panel:
+    def update(self, is_selected: bool = False) -> 'Panel':
         """Update leg information in the form of a rich.Panel."""
+        from rich import box
+        from rich.align import Align
+        from rich.panel import Panel
+
         table = self.generate_table()
         color = f'on {self._color}' if is_selected else self._color
 
@@ -1,22 +1,60 @@
 """Mini-Pupper non-GUI Calibration Tool"""
+import argparse
+import json
 import re
 import sys
 import _thread
+import multiprocessing
 import termios
 import time
 import os
 
-import numpy as np
-
-from rich import print as r_print
-from rich.layout import Layout
+from typing import Callable
+from typing import List
+from typing import Optional
 
 # from pupper.HardwareInterface import HardwareInterface
 
+from mp_calibration_tool.actuator import DeltaActuator
+from mp_calibration_tool.backend import BACKENDS
+from mp_calibration_tool.backend import create_backend
+from mp_calibration_tool.control import ControlLoop
+from mp_calibration_tool.daemon import DAEMON_SOCKET_PATH
+from mp_calibration_tool.daemon import DaemonClient
+from mp_calibration_tool.daemon import run_stand_in_daemon
+from mp_calibration_tool.dispatch import Selection
+from mp_calibration_tool.dispatch import handle_key
+from mp_calibration_tool.eeprom_sim import DEFAULT_EEPROM_SIZE
+from mp_calibration_tool.eeprom_sim import DEFAULT_PAGE_SIZE
+from mp_calibration_tool.eeprom_sim import DEFAULT_WRITE_CYCLE
+from mp_calibration_tool.eeprom_sim import SimulatedEeprom
+from mp_calibration_tool.history import DEFAULT_HISTORY_PATH
+from mp_calibration_tool.history import CalibrationHistory
 from mp_calibration_tool.keyboard import get_key
-from mp_calibration_tool.options import create_options_panel
+from mp_calibration_tool.metrics import REGISTRY
+from mp_calibration_tool.metrics import TextfileExporter
+from mp_calibration_tool.orchestrator import CalibrationJob
+from mp_calibration_tool.orchestrator import run_jobs
+from mp_calibration_tool.profiler import CLOCKS
+from mp_calibration_tool.profiler import SamplingProfiler
+from mp_calibration_tool.published import PUBLISHED_CALIBRATION_PATH
+from mp_calibration_tool.published import CalibrationPublisher
+from mp_calibration_tool.published import read_published_calibration
 from mp_calibration_tool.quadruped import Pupper
-from mp_calibration_tool.title import create_title_panel
+from mp_calibration_tool.realtime import RealtimeSettings
+from mp_calibration_tool.replay import KeyRecorder
+from mp_calibration_tool.replay import load_key_events
+from mp_calibration_tool.replay import replay_key_events
+from mp_calibration_tool.sampler import CurrentSampler
+from mp_calibration_tool.server import DEFAULT_SOCKET_PATH
+from mp_calibration_tool.server import serve
+from mp_calibration_tool.startup import Startup
+from mp_calibration_tool.thresholds import DEFAULT_THRESHOLDS_PATH
+from mp_calibration_tool.thresholds import ThresholdLearner
+from mp_calibration_tool.thresholds import load_thresholds
+from mp_calibration_tool.thresholds import save_thresholds
+from mp_calibration_tool.web import WebDashboard
+from mp_calibration_tool.writer import WriteBehindQueue
 
 
 OverLoadCurrentMax = 1500000
@@ -27,85 +65,882 @@ servo1_en = 25
 servo2_en = 21
 hw_version = ''
 
+RENDER_SECONDS = REGISTRY.histogram(
+    'mpct_render_seconds', 'Time spent drawing the calibration tool.')
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    """Parse the command line arguments of the calibration tool."""
+    parser = argparse.ArgumentParser(
+        prog='mpct',
+        description='A non-GUI Calibration Tool for the Mini-Pupper.'
+    )
+    parser.add_argument(
+        '--telemetry', metavar='PATH',
+        help='Record battery current, overload state and joints to PATH.')
+    parser.add_argument(
+        '--telemetry-capacity', type=int, metavar='SAMPLES',
+        help='Number of samples kept in the telemetry ring file '
+             '(default: 4 hours at 100 Hz).')
+    parser.add_argument(
+        '--sample-rate', type=float, default=0.0, metavar='HZ',
+        help='Sample the battery current on a background thread at HZ '
+             'instead of inside the overload check.')
+    parser.add_argument(
+        '--ui', choices=['rich', 'plain'], default='rich',
+        help='User interface to use; plain does not load rich.')
+    parser.add_argument(
+        '--record-keys', metavar='PATH',
+        help='Record the timestamped key presses of the session to PATH.')
+    parser.add_argument(
+        '--live', action='store_true',
+        help='Drive the servos from a background control loop.')
+    parser.add_argument(
+        '--servo-rate', type=float, default=100.0, metavar='HZ',
+        help='Update rate of the servo control loop.')
+    parser.add_argument(
+        '--deadband', type=float, default=0.0, metavar='DEGREES',
+        help='Skip servo writes whose target moved less than DEGREES.')
+    parser.add_argument(
+        '--keepalive', type=float, default=1.0, metavar='SECONDS',
+        help='Rewrite every servo at least once every SECONDS.')
+    parser.add_argument(
+        '--rt-cpu', type=int, metavar='CPU',
+        help='Pin the servo control thread to CPU.')
+    parser.add_argument(
+        '--rt-priority', type=int, metavar='PRIORITY',
+        help='Run the servo control thread as SCHED_FIFO with PRIORITY.')
+    parser.add_argument(
+        '--rt-mlock', action='store_true',
+        help='Lock the process memory with mlockall.')
+    parser.add_argument(
+        '--web', action='store_true',
+        help='Serve a browser dashboard streaming the joint state.')
+    parser.add_argument(
+        '--web-host', default='0.0.0.0',
+        help='Address the browser dashboard listens on.')
+    parser.add_argument(
+        '--web-port', type=int, default=8080,
+        help='Port the browser dashboard listens on.')
+    parser.add_argument(
+        '--web-rate', type=float, default=10.0, metavar='HZ',
+        help='Maximum rate of dashboard updates.')
+    parser.add_argument(
+        '--metrics', metavar='PATH',
+        help='Periodically write Prometheus metrics to the textfile PATH. '
+             'With --split, the control process writes its own next to it.')
+    parser.add_argument(
+        '--metrics-interval', type=float, default=15.0, metavar='SECONDS',
+        help='Interval between metrics textfile writes.')
+    parser.add_argument(
+        '--split', action='store_true',
+        help='Run the servo control in a separate process from the UI.')
+    parser.add_argument(
+        '--history-db', default=DEFAULT_HISTORY_PATH, metavar='PATH',
+        help='SQLite database recording every calibration read and applied.')
+    parser.add_argument(
+        '--no-history', action='store_true',
+        help='Do not record the calibrations in the history database.')
+    parser.add_argument(
+        '--publish', metavar='PATH',
+        help='Memory-mapped file the active calibration is published to; '
+             f'defaults to {PUBLISHED_CALIBRATION_PATH} under the device root.')
+    parser.add_argument(
+        '--no-publish', action='store_true',
+        help='Do not publish the active calibration.')
+    parser.add_argument(
+        '--no-write-behind', action='store_true',
+        help='Write the EEPROM and GPIOs inline instead of on a background '
+             'writer.')
+    parser.add_argument(
+        '--hot-apply', action='store_true',
+        help='Leave the robot daemon running and hand every applied '
+             'calibration to it over its control socket.')
+    parser.add_argument(
+        '--daemon-socket', metavar='PATH',
+        help='Control socket of the robot daemon; defaults to '
+             f'{DAEMON_SOCKET_PATH} under the device root.')
+    parser.add_argument(
+        '--eeprom-sim', metavar='PATH',
+        help='Use a simulated EEPROM backed by the file PATH.')
+    parser.add_argument(
+        '--eeprom-size', type=int, default=DEFAULT_EEPROM_SIZE,
+        metavar='BYTES', help='Size of the simulated EEPROM.')
+    parser.add_argument(
+        '--eeprom-page-size', type=int, default=DEFAULT_PAGE_SIZE,
+        metavar='BYTES', help='Page size of the simulated EEPROM.')
+    parser.add_argument(
+        '--eeprom-write-cycle', type=float, default=DEFAULT_WRITE_CYCLE,
+        metavar='SECONDS', help='Write cycle time of a simulated page write.')
+    parser.add_argument(
+        '--profile', metavar='PATH',
+        help='Profile the session and write collapsed stacks to PATH and '
+             'a summary to PATH.txt.')
+    parser.add_argument(
+        '--profile-interval', type=float, default=0.005, metavar='SECONDS',
+        help='Interval between profiler samples.')
+    parser.add_argument(
+        '--profile-clock', choices=sorted(CLOCKS), default='cpu',
+        help='Take profiler samples on process CPU or wall time; wall '
+             'sampling also interrupts sleeps and blocking calls.')
+    parser.add_argument(
+        '--profile-top', type=int, default=20, metavar='N',
+        help='Number of functions listed in the profile summary.')
+    parser.add_argument(
+        '--thresholds', default=DEFAULT_THRESHOLDS_PATH, metavar='PATH',
+        help='File holding the learned overload thresholds of every robot.')
+    parser.add_argument(
+        '--fixed-thresholds', action='store_true',
+        help='Ignore learned overload thresholds and use the defaults.')
+    parser.add_argument(
+        '--backend', choices=sorted(BACKENDS), default='sysfs',
+        help='Hardware backend; sim simulates a robot under --device-root.')
+    parser.add_argument(
+        '--device-root', default='/', metavar='ROOT',
+        help='Root of the filesystem holding the robot devices.')
+    subparsers = parser.add_subparsers(dest='command')
+
+    serve_parser = subparsers.add_parser(
+        'serve', help='Serve Pupper operations over a Unix socket.')
+    serve_parser.add_argument(
+        '--socket', default=DEFAULT_SOCKET_PATH,
+        help='Path of the Unix domain socket to listen on.')
+
+    replay_parser = subparsers.add_parser(
+        'replay', help='Replay a recorded key session and report throughput.')
+    replay_parser.add_argument(
+        'path', help='Key log written with --record-keys.')
+    replay_parser.add_argument(
+        '--paced', action='store_true',
+        help='Replay at the recorded pace instead of as fast as possible.')
+    replay_parser.add_argument(
+        '--apply', action='store_true',
+        help='Also replay apply key presses, which write the EEPROM.')
+    replay_parser.add_argument(
+        '--no-render', action='store_true',
+        help='Only measure the key dispatch, without drawing.')
+
+    selftest_parser = subparsers.add_parser(
+        'selftest', help='Sweep every joint and check the servo currents.')
+    selftest_parser.add_argument(
+        '--steps', type=int, default=40,
+        help='Number of positions in every joint sweep.')
+    selftest_parser.add_argument(
+        '--power-budget', type=int, default=3000000, metavar='MICROAMPS',
+        help='Extra current allowed for joints swept at the same time.')
+
+    history_parser = subparsers.add_parser(
+        'history', help='List the recorded calibrations, newest first.')
+    history_parser.add_argument(
+        '--robot', metavar='ID',
+        help='Robot to list; defaults to this robot.')
+    history_parser.add_argument(
+        '--all-robots', action='store_true',
+        help='List the calibrations of every robot.')
+    history_parser.add_argument(
+        '--hw-version', metavar='VERSION',
+        help='Only list calibrations of this hardware version.')
+    history_parser.add_argument(
+        '--limit', type=int, default=20,
+        help='Maximum number of calibrations to list.')
+
+    rollback_parser = subparsers.add_parser(
+        'rollback', help='Write a recorded calibration back to the EEPROM.')
+    rollback_parser.add_argument(
+        'entry', type=int, help='Id of the history entry to restore.')
+    rollback_parser.add_argument(
+        '--force', action='store_true',
+        help='Restore an entry of another robot or hardware version.')
+
+    thresholds_parser = subparsers.add_parser(
+        'thresholds', help='Learn or show the overload thresholds.')
+    thresholds_parser.add_argument(
+        'action', choices=['learn', 'show'],
+        help='Learn new thresholds or show the stored ones.')
+    thresholds_parser.add_argument(
+        '--from-telemetry', metavar='PATH', action='append', default=[],
+        help='Learn from the currents of a telemetry file; may be repeated.')
+    thresholds_parser.add_argument(
+        '--duration', type=float, default=0.0, metavar='SECONDS',
+        help='Also learn from the live battery current for SECONDS.')
+    thresholds_parser.add_argument(
+        '--rate', type=float, default=100.0, metavar='HZ',
+        help='Sampling rate of the live battery current.')
+
+    orchestrate_parser = subparsers.add_parser(
+        'orchestrate',
+        help='Read, validate, apply and verify the calibration of many '
+             'robots concurrently.')
+    orchestrate_parser.add_argument(
+        'roots', nargs='+', metavar='ROOT',
+        help='Device roots of the robots, created when simulated.')
+    orchestrate_parser.add_argument(
+        '--apply', metavar='PATH',
+        help='JSON 3x4 calibration matrix to apply and verify on every robot.')
+    orchestrate_parser.add_argument(
+        '--parallel', type=int, default=8,
+        help='Maximum number of robots calibrated at once.')
+
+    published_parser = subparsers.add_parser(
+        'published', help='Show the published calibration.')
+    published_parser.add_argument(
+        'path', nargs='?',
+        help='Published calibration file; defaults to the one of --publish.')
+
+    daemon_parser = subparsers.add_parser(
+        'daemon',
+        help='Run a stand-in robot daemon taking hot-applied calibrations.')
+    daemon_parser.add_argument(
+        '--period', type=float, default=0.01, metavar='SECONDS',
+        help='Control tick period of the stand-in daemon.')
+
+    simulate_parser = subparsers.add_parser(
+        'simulate',
+        help='Run the overload and control logic of a simulated robot on a '
+             'simulated clock, faster than real time.')
+    simulate_parser.add_argument(
+        '--trace', metavar='PATH',
+        help='Replay the battery currents of a telemetry file, looping it; '
+             'a synthetic trace is used otherwise.')
+    simulate_parser.add_argument(
+        '--duration', type=float, default=3600.0, metavar='SECONDS',
+        help='Simulated time to run for.')
+    simulate_parser.add_argument(
+        '--period', type=float, default=0.01, metavar='SECONDS',
+        help='Control loop period.')
+    simulate_parser.add_argument(
+        '--idle-current', type=int, default=500000, metavar='UA',
+        help='Battery current of the synthetic trace between stalls.')
+    simulate_parser.add_argument(
+        '--stall-current', type=int, default=1800000, metavar='UA',
+        help='Battery current of the synthetic trace during stalls.')
+    simulate_parser.add_argument(
+        '--stall-every', type=float, default=600.0, metavar='SECONDS',
+        help='Period of the stalls of the synthetic trace.')
+    simulate_parser.add_argument(
+        '--stall-length', type=float, default=5.0, metavar='SECONDS',
+        help='Length of the stalls of the synthetic trace.')
+    simulate_parser.add_argument(
+        '--record', metavar='PATH',
+        help='Record the simulated run to a telemetry file.')
 
-def main():
+    args = parser.parse_args(argv)
+    if args.hot_apply and (args.live or args.split
+                           or args.command == 'selftest'):
+        parser.error('--hot-apply leaves the servos to the robot daemon')
+    if args.web and args.split:
+        parser.error('--web is not supported with --split')
+
+    return args
+
+
+def main(argv: Optional[List[str]] = None):
     """Run the mini pupper calibration tool."""
-    settings = termios.tcgetattr(sys.stdin)
-    pupper = Pupper(ServoCalibrationFilePath)
-    leg_options = {
-        '1': 'left_front',
-        '2': 'right_front',
-        '3': 'left_back',
-        '4': 'right_back',
-    }
-
-    # Create layout containing the minipupper leg and joint selection
-    layout = Layout()
-    layout.split_column(
-        Layout(name='spacer', size=2),
-        Layout(name='title_bar')
+    args = parse_args(argv)
+    exporter = None
+    if args.metrics:
+        exporter = TextfileExporter(
+            args.metrics,
+            args.metrics_interval,
+            labels={'process': 'ui'} if args.split else None
+        )
+        exporter.start()
+
+    profiler = None
+    if args.profile:
+        profiler = SamplingProfiler(args.profile_interval, args.profile_clock)
+        profiler.start()
+
+    try:
+        run(args)
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.write_collapsed(args.profile)
+            summary = profiler.summary(args.profile_top)
+            with open(args.profile + '.txt', 'w') as summary_f:
+                summary_f.write(summary + '\n')
+            print(summary)
+        if exporter is not None:
+            exporter.stop()
+
+
+def run(args: argparse.Namespace) -> None:
+    """Run the mode of the calibration tool selected by args."""
+    if args.command == 'history':
+        run_history(args)
+        return
+    if args.command == 'rollback':
+        run_rollback(args)
+        return
+    if args.command == 'thresholds':
+        run_thresholds(args)
+        return
+    if args.command == 'orchestrate':
+        run_orchestrate(args)
+        return
+    if args.command == 'simulate':
+        run_simulate(args)
+        return
+    if args.command == 'published':
+        run_published(args)
+        return
+    if args.command == 'daemon':
+        run_daemon(args)
+        return
+    if args.split:
+        run_split_calibration_tool(args)
+        return
+
+    pupper = create_pupper(args, bring_up=False)
+    startup = start_bring_up(pupper, args)
+
+    dashboard = None
+    if args.web:
+        dashboard = WebDashboard(
+            pupper, args.web_host, args.web_port, args.web_rate,
+            live=args.live)
+        dashboard.start()
+
+    try:
+        if args.command is None:
+            run_calibration_tool(
+                pupper,
+                args.ui,
+                key_log_path=args.record_keys,
+                startup=startup
+            )
+            startup.check()
+        else:
+            startup.wait()
+            startup.check()
+            print(startup.status())
+            if args.command == 'serve':
+                serve(pupper, args.socket)
+            elif args.command == 'selftest':
+                run_selftest(pupper, args)
+            elif args.command == 'replay':
+                run_replay(pupper, args)
+    finally:
+        # Never hand the servos back while a step may still use them
+        startup.wait()
+        if dashboard is not None:
+            dashboard.stop()
+        control = startup.result('control loop') if args.live else None
+        if control is not None:
+            control.stop()
+            if control.report is not None:
+                print(control.report)
+        release_pupper(pupper)
+
+    pupper.start_daemon()
+
+
+def start_bring_up(pupper: Pupper, args: argparse.Namespace) -> Startup:
+    """Bring up the hardware side of the Pupper on a thread pool."""
+    startup = Startup()
+    if pupper.daemon is not None:
+        startup.add('daemon', pupper.daemon.ping)
+    else:
+        startup.add('stop daemon', pupper.stop_daemon)
+        startup.add(
+            'servo driver', pupper.attach_hardware, after=['stop daemon'])
+    startup.add('calibration', pupper.read_calibration_file)
+    if args.live:
+        startup.add(
+            'control loop',
+            lambda: start_control_loop(pupper, args),
+            after=['servo driver', 'calibration']
+        )
+    startup.start()
+
+    return startup
+
+
+def start_control_loop(pupper: Pupper, args: argparse.Namespace) -> ControlLoop:
+    """Start the servo control loop and wait for its real-time setup."""
+    control = ControlLoop(
+        pupper,
+        1.0 / args.servo_rate,
+        create_realtime_settings(args),
+        create_actuator(args, pupper)
     )
-    layout['title_bar'].split_column(
-        Layout(create_title_panel(), name='title', size=5),
-        Layout(name='upper')
+    control.start()
+    control.wait_ready()
+
+    return control
+
+
+def create_realtime_settings(
+        args: argparse.Namespace
+    ) -> Optional[RealtimeSettings]:
+    """Return the real-time settings requested on the command line."""
+    if args.rt_cpu is None and args.rt_priority is None and not args.rt_mlock:
+        return None
+
+    return RealtimeSettings(args.rt_cpu, args.rt_priority, args.rt_mlock)
+
+
+def create_actuator(args: argparse.Namespace, pupper: Pupper) -> DeltaActuator:
+    """Create the delta actuator configured on the command line."""
+    return DeltaActuator(
+        pupper.hardware_interface, args.deadband * 0.01745, args.keepalive)
+
+
+def create_pupper(
+        args: argparse.Namespace,
+        hardware: bool = True,
+        history: bool = True,
+        bring_up: bool = True,
+        writes_eeprom: bool = True
+    ) -> Pupper:
+    """Create the Pupper along with its optional sampler and recorder.
+
+    Without bring_up, the daemon, servos and calibration are left to be
+    brought up later, see start_bring_up(). Without writes_eeprom, the
+    simulated EEPROM is only read, leaving its wear to another process.
+    """
+    pupper = Pupper(
+        ServoCalibrationFilePath,
+        hardware and bring_up and not args.hot_apply,
+        create_backend(args.backend, args.device_root)
     )
-    layout['upper'].split_column(
-        Layout(name='front_legs_viz', size=10),
-        Layout(name='lower')
+    if not args.no_write_behind:
+        pupper.writer = WriteBehindQueue()
+    if args.eeprom_sim:
+        pupper.eeprom = SimulatedEeprom(
+            args.eeprom_sim,
+            args.eeprom_size,
+            args.eeprom_page_size,
+            args.eeprom_write_cycle,
+            read_only=not writes_eeprom
+        )
+    if history and not args.no_history:
+        pupper.history = CalibrationHistory(args.history_db)
+    if history and not args.no_publish:
+        try:
+            pupper.publisher = CalibrationPublisher(
+                get_published_path(args, pupper.backend))
+        except OSError as error:
+            print(f'Not publishing the calibration: {error}')
+    if history and args.hot_apply:
+        pupper.daemon = DaemonClient(get_daemon_socket(args, pupper.backend))
+    if not args.fixed_thresholds:
+        thresholds = load_thresholds(args.thresholds, pupper.robot_id)
+        if thresholds is not None:
+            pupper.overload_current_max = thresholds.current_max
+            pupper.overload_hold_counter_max = thresholds.hold_counter_max
+    if bring_up:
+        pupper.read_calibration_file()
+    if not hardware:
+        return pupper
+
+    if args.telemetry:
+        # NumPy-backed modules are imported lazily so the core never loads it
+        from mp_calibration_tool.telemetry import DEFAULT_TELEMETRY_CAPACITY
+        from mp_calibration_tool.telemetry import TelemetryRecorder
+
+        pupper.telemetry = TelemetryRecorder(
+            args.telemetry,
+            args.telemetry_capacity or DEFAULT_TELEMETRY_CAPACITY
+        )
+    if args.sample_rate > 0:
+        pupper.current_sampler = CurrentSampler(
+            args.sample_rate, read_current=pupper.backend.read_battery_current)
+        pupper.current_sampler.start()
+
+    return pupper
+
+
+def get_published_path(args: argparse.Namespace, backend=None) -> str:
+    """Return the published calibration file selected by args."""
+    if args.publish:
+        return args.publish
+    if backend is None:
+        backend = create_backend(args.backend, args.device_root)
+
+    return backend.path(PUBLISHED_CALIBRATION_PATH)
+
+
+def get_daemon_socket(args: argparse.Namespace, backend) -> str:
+    """Return the control socket of the robot daemon selected by args."""
+    return args.daemon_socket or backend.path(DAEMON_SOCKET_PATH)
+
+
+def get_control_metrics_path(path: str) -> str:
+    """Return the metrics textfile of the control process in --split mode."""
+    root, ext = os.path.splitext(path)
+    return f'{root}.control{ext}'
+
+
+def release_pupper(pupper: Pupper) -> None:
+    """Stop the optional sampler and close the optional recorder."""
+    # Queued writes still record to the history and publish
+    if pupper.writer is not None:
+        pupper.writer.close()
+        pupper.writer = None
+    if pupper.history is not None:
+        pupper.history.close()
+    if pupper.publisher is not None:
+        pupper.publisher.close()
+    if pupper.daemon is not None:
+        pupper.daemon.close()
+    if pupper.eeprom is not None:
+        pupper.eeprom.save_wear()
+        print(f'Simulated EEPROM: {pupper.eeprom.stats}, '
+              f'max wear {pupper.eeprom.max_wear}')
+    if pupper.current_sampler is not None:
+        pupper.current_sampler.stop()
+    if pupper.telemetry is not None:
+        pupper.telemetry.close()
+
+
+def run_control_process(state_name: str, args: argparse.Namespace) -> None:
+    """Own the hardware side of the Pupper in a separate process."""
+    from mp_calibration_tool.shared_state import SharedPupperState
+    from mp_calibration_tool.shared_state import SharedStateControlLoop
+
+    # The overload and actuator metrics are only updated in this process
+    exporter = None
+    if args.metrics:
+        exporter = TextfileExporter(
+            get_control_metrics_path(args.metrics),
+            args.metrics_interval,
+            labels={'process': 'control'}
+        )
+        exporter.start()
+
+    state = SharedPupperState(state_name)
+    # The UI process records and writes the calibrations
+    pupper = create_pupper(args, history=False, writes_eeprom=False)
+    control = SharedStateControlLoop(
+        pupper,
+        state,
+        1.0 / args.servo_rate,
+        create_realtime_settings(args),
+        create_actuator(args, pupper)
     )
-    layout['lower'].split_column(
-        Layout(name='back_legs_viz', size=10),
-        Layout(create_options_panel(), name='options', size=10),
+    try:
+        # Run in this process' main thread rather than starting a new one
+        control.run()
+    finally:
+        release_pupper(pupper)
+        pupper.start_daemon()
+        state.close()
+        if exporter is not None:
+            exporter.stop()
+
+
+def run_split_calibration_tool(args: argparse.Namespace) -> None:
+    """Run the UI in this process and the servo control in another one."""
+    from mp_calibration_tool.shared_state import SharedPupperState
+
+    pupper = create_pupper(args, hardware=False)
+    state = SharedPupperState()
+    state.write_joints(pupper.get_all_leg_joint_values())
+
+    process = multiprocessing.Process(
+        target=run_control_process,
+        args=(state.name, args),
+        name='mpct-control'
     )
-    layout['front_legs_viz'].split_row(
-        Layout(pupper.left_front.update(True), name='left_front'),
-        Layout(pupper.right_front.update(), name='right_front'),
+    process.start()
+    try:
+        run_calibration_tool(
+            pupper,
+            args.ui,
+            lambda: state.write_joints(pupper.get_all_leg_joint_values()),
+            args.record_keys,
+            control_status=lambda: state.read_status().describe()
+        )
+    finally:
+        # The control process restarts the daemon, which loads the EEPROM
+        pupper.flush_writes()
+        state.request_quit()
+        process.join()
+        release_pupper(pupper)
+        state.close()
+        state.unlink()
+
+
+def run_selftest(pupper: Pupper, args: argparse.Namespace) -> None:
+    """Run the joint sweep self-test and print its results."""
+    from mp_calibration_tool.selftest import SelfTest
+
+    start = time.monotonic()
+    results = SelfTest(
+        pupper,
+        pupper.backend.read_battery_current,
+        steps=args.steps,
+        power_budget=args.power_budget
+    ).run()
+    for result in results:
+        print(result)
+
+    failed = sum(result.status != 'ok' for result in results)
+    print(f'{failed} of {len(results)} joints flagged '
+          f'in {time.monotonic() - start:.1f} s')
+
+
+def run_history(args: argparse.Namespace) -> None:
+    """Print the recorded calibrations."""
+    history = CalibrationHistory(args.history_db)
+    try:
+        robot_id = None if args.all_robots else \
+            args.robot or create_backend(args.backend, args.device_root).robot_id()
+        for entry in history.query(
+                robot_id=robot_id,
+                hw_version=args.hw_version,
+                limit=args.limit):
+            print(entry)
+    finally:
+        history.close()
+
+
+def run_rollback(args: argparse.Namespace) -> None:
+    """Write a recorded calibration back to the EEPROM."""
+    pupper = create_pupper(args, hardware=False, history=False)
+    pupper.history = CalibrationHistory(args.history_db)
+    if args.hot_apply:
+        pupper.daemon = DaemonClient(get_daemon_socket(args, pupper.backend))
+    try:
+        entry = pupper.history.get(args.entry)
+        if entry is None:
+            sys.exit(f'No calibration {args.entry} in {args.history_db}')
+        if not args.force and (entry.robot_id != pupper.robot_id
+                               or entry.hw_version != pupper.hw_version):
+            sys.exit(
+                f'Calibration {entry.id} belongs to robot {entry.robot_id} '
+                f'({entry.hw_version}); use --force to restore it anyway')
+
+        # The daemon only loads the calibration when it starts
+        pupper.stop_daemon()
+        try:
+            pupper.update_calibration_matrix(entry.matrix)
+            pupper.write_calibration_file('rollback').result()
+        finally:
+            pupper.start_daemon()
+        print(f'Restored calibration {entry.id}: \n {entry.matrix}')
+    finally:
+        release_pupper(pupper)
+
+
+def run_thresholds(args: argparse.Namespace) -> None:
+    """Learn the overload thresholds of this robot or show them."""
+    backend = create_backend(args.backend, args.device_root)
+    robot_id = backend.robot_id()
+    if args.action == 'show':
+        thresholds = load_thresholds(args.thresholds, robot_id)
+        print(thresholds if thresholds is not None
+              else f'{robot_id}: no learned thresholds')
+        return
+
+    learner = ThresholdLearner()
+    if args.from_telemetry:
+        from mp_calibration_tool.telemetry import load_telemetry
+    for path in args.from_telemetry:
+        learner.observe_many(load_telemetry(path)['current'].tolist())
+
+    if args.duration > 0:
+        period = 1.0 / args.rate
+        end = time.monotonic() + args.duration
+        try:
+            while time.monotonic() < end:
+                learner.observe(backend.read_battery_current())
+                time.sleep(period)
+        except KeyboardInterrupt:
+            pass
+
+    if learner.samples == 0:
+        sys.exit('No battery current samples to learn from')
+    thresholds = learner.learn(robot_id)
+    save_thresholds(args.thresholds, thresholds)
+    print(thresholds)
+
+
+def run_orchestrate(args: argparse.Namespace) -> None:
+    """Calibrate many robots concurrently and print per-robot timings."""
+    matrix = None
+    if args.apply:
+        with open(args.apply, 'r') as matrix_f:
+            matrix = json.load(matrix_f)
+
+    jobs = [
+        CalibrationJob(create_backend(args.backend, root), matrix)
+        for root in args.roots
+    ]
+    start = time.perf_counter()
+    results = run_jobs(jobs, args.parallel)
+    for result in results:
+        print(result)
+
+    failed = sum(not result.ok for result in results)
+    print(f'{len(results) - failed} of {len(results)} robots ok '
+          f'in {time.perf_counter() - start:.2f} s')
+    if failed:
+        sys.exit(1)
+
+
+def run_published(args: argparse.Namespace) -> None:
+    """Print the published calibration."""
+    path = args.path or get_published_path(args)
+    try:
+        print(read_published_calibration(path))
+    except (OSError, ValueError) as error:
+        sys.exit(f'{path}: {error}')
+
+
+def run_daemon(args: argparse.Namespace) -> None:
+    """Run a stand-in robot daemon starting from the EEPROM calibration."""
+    backend = create_backend(args.backend, args.device_root)
+    pupper = Pupper(ServoCalibrationFilePath, False, backend)
+    pupper.read_calibration_file()
+    socket_path = get_daemon_socket(args, backend)
+    print(f'Stand-in robot daemon listening on {socket_path}')
+    run_stand_in_daemon(
+        backend.create_servo_driver(),
+        pupper.calibration.matrix_eeprom,
+        socket_path,
+        args.period
     )
-    layout['back_legs_viz'].split_row(
-        Layout(pupper.left_back.update(), name='left_back'),
-        Layout(pupper.right_back.update(), name='right_back'),
+
+
+def run_simulate(args: argparse.Namespace) -> None:
+    """Run the control loop of a simulated robot and print its report."""
+    from mp_calibration_tool.simulation import CurrentTrace
+    from mp_calibration_tool.simulation import simulate_control
+
+    if args.trace:
+        trace = CurrentTrace.from_telemetry(args.trace)
+    else:
+        trace = CurrentTrace.synthetic(
+            args.idle_current,
+            args.stall_current,
+            args.stall_every,
+            args.stall_length
+        )
+
+    # Simulate the overload thresholds this robot would run with
+    current_max = None
+    hold_counter_max = None
+    if not args.fixed_thresholds:
+        backend = create_backend(args.backend, args.device_root)
+        thresholds = load_thresholds(args.thresholds, backend.robot_id())
+        if thresholds is not None:
+            current_max = thresholds.current_max
+            hold_counter_max = thresholds.hold_counter_max
+
+    report = simulate_control(
+        trace,
+        args.duration,
+        args.period,
+        overload_current_max=current_max,
+        overload_hold_counter_max=hold_counter_max,
+        telemetry_path=args.record
     )
+    print(report)
+
+
+def run_replay(pupper: Pupper, args: argparse.Namespace) -> None:
+    """Replay a recorded key session and print its throughput."""
+    events = load_key_events(args.path)
+    if not args.apply:
+        events = [event for event in events if event[1] not in ['a', 'A']]
+
+    renderer = None if args.no_render else create_renderer(pupper, args.ui)
+    stats = replay_key_events(pupper, events, renderer, args.paced)
+    print(stats)
+    pupper.flush_writes()
+    if pupper.calibration_write_status():
+        print(pupper.calibration_write_status())
+
 
-    # Print initial layout
-    r_print(layout)
+def create_renderer(pupper: Pupper, ui: str):
+    """Create the renderer for the selected user interface."""
+    if ui == 'plain':
+        from mp_calibration_tool.plain import PlainRenderer
+        return PlainRenderer(pupper)
+
+    from mp_calibration_tool.layout import RichRenderer
+    return RichRenderer(pupper)
+
+
+def run_calibration_tool(
+        pupper: Pupper,
+        ui: str = 'rich',
+        on_update: Optional[Callable[[], None]] = None,
+        key_log_path: Optional[str] = None,
+        startup: Optional[Startup] = None,
+        control_status: Optional[Callable[[], str]] = None
+    ) -> None:
+    """Run the keyboard driven calibration tool until quit.
+
+    on_update is called after every key press that changed the Pupper.
+    When key_log_path is set, every key press is recorded for replay.
+    While startup is still bringing up the Pupper, its progress is shown
+    and key presses are held back until it is done. control_status returns
+    the status of a separate control process, shown next to it along with
+    a pending apply and a failed calibration write.
+    """
+    settings = termios.tcgetattr(sys.stdin)
+    renderer = create_renderer(pupper, ui)
+    key_recorder = KeyRecorder(key_log_path) if key_log_path else None
 
     # Select default leg and joint
-    leg_selection = 'left_front'
-    joint_selection = 'h'
+    selection = Selection()
+
+    def get_status() -> str:
+        parts = [
+            selection.status(),
+            startup.status() if startup is not None else '',
+            control_status() if control_status is not None else '',
+            pupper.calibration_write_status(),
+        ]
+        return ' | '.join(part for part in parts if part)
+
+    status = get_status()
+    renderer.draw(selection.leg, selection.joint, status)
+    pending_keys: List[str] = []
 
     # Run the calibration tool
-    while True:
-        keyboard_input = get_key(settings)
-        if keyboard_input in ['q', 'Q']:
-            pupper.start_daemon()
-            break
-
-        if keyboard_input in ['1', '2', '3', '4']:
-            for key, leg in leg_options.items():
-                if key == keyboard_input:
-                    is_leg_selected = True
-                    leg_selection = leg
-                else:
-                    is_leg_selected = False
-
-                layout[leg].update(
-                    pupper.__dict__[leg].update(is_leg_selected)
-                )
-
-            r_print(layout, end='\r')
-        elif keyboard_input in ['h', 'H', 't', 'T', 'c', 'C']:
-            joint_selection = keyboard_input.lower()
-            r_print(layout, end='\r')
-
-        elif keyboard_input in ['i', 'I', 'd', 'D']:
-            if keyboard_input.lower() == 'i':
-                pupper.__dict__[leg_selection].increase_joint_value(joint_selection)
-            elif keyboard_input.lower() == 'd':
-                pupper.__dict__[leg_selection].decrease_joint_value(joint_selection)
-            layout[leg_selection].update(
-                pupper.__dict__[leg_selection].update(True)
-            )
-            r_print(layout, end='\r')
+    try:
+        while True:
+            keyboard_input = get_key(settings)
+            if key_recorder is not None and keyboard_input:
+                key_recorder.record(keyboard_input)
+
+            if keyboard_input in ['q', 'Q']:
+                break
+            if keyboard_input:
+                pending_keys.append(keyboard_input)
+
+            redraw = False
+            current_status = get_status()
+            if current_status != status:
+                status = current_status
+                redraw = True
+            if startup is not None and not startup.ready:
+                if redraw:
+                    renderer.draw(selection.leg, selection.joint, status)
+                if startup.failed:
+                    break
+                continue
+
+            for key in pending_keys:
+                if handle_key(pupper, key, selection):
+                    if on_update is not None:
+                        on_update()
+                    redraw = True
+            pending_keys.clear()
+
+            if redraw:
+                status = get_status()
+                start = time.perf_counter()
+                renderer.draw(selection.leg, selection.joint, status)
+                RENDER_SECONDS.observe(time.perf_counter() - start)
+    finally:
+        if key_recorder is not None:
+            key_recorder.close()
 
 
 if __name__ == '__main__':
@@ -0,0 +1,149 @@
+"""Small matrices stored in an array.array, for a core without NumPy.
+
+The calibration core only ever handles 3x4 matrices, which NumPy makes
+costly to import and keep in memory on a small board. Matrix covers the
+part of the ndarray API the core uses, and converts to an ndarray without
+copying when NumPy is installed, so bulk analysis can still use it.
+"""
+from array import array
+
+from typing import Iterable
+from typing import Iterator
+from typing import List
+from typing import Tuple
+from typing import Union
+
+
+Index = Union[int, Tuple[int, int]]
+
+
+class Matrix():
+    """Row-major matrix of ints ('i') or floats ('d').
+
+    Supports m[i, j] and m[i][j], where a row is a writable memoryview,
+    shape, len, iteration over rows, equality, tolist() and copy().
+    """
+
+    def __init__(
+            self,
+            rows: int,
+            cols: int,
+            typecode: str = 'd',
+            values: Iterable[Union[int, float]] = ()
+        ) -> None:
+        self.shape = (rows, cols)
+        self.data = array(typecode, values)
+        if not self.data:
+            self.data = array(typecode, bytes(self.data.itemsize * rows * cols))
+        if len(self.data) != rows * cols:
+            raise ValueError(
+                f'{len(self.data)} values do not fill a {rows}x{cols} matrix!')
+        self._view = memoryview(self.data)
+
+    @classmethod
+    def zeros(cls, rows: int, cols: int, typecode: str = 'd') -> 'Matrix':
+        return cls(rows, cols, typecode)
+
+    @classmethod
+    def from_rows(cls, rows, typecode: str = '') -> 'Matrix':
+        """Build a matrix from rows of numbers.
+
+        Without a typecode, the matrix holds ints when every value is one.
+        """
+        rows = [list(row) for row in rows]
+        if not rows or any(len(row) != len(rows[0]) for row in rows):
+            raise ValueError('Matrix rows must all have the same length!')
+        values = [value for row in rows for value in row]
+        if not typecode:
+            typecode = 'i' if all(
+                hasattr(value, '__index__') for value in values) else 'd'
+        if typecode == 'i':
+            values = [int(value) for value in values]
+
+        return cls(len(rows), len(rows[0]), typecode, values)
+
+    @property
+    def typecode(self) -> str:
+        return self.data.typecode
+
+    def __len__(self) -> int:
+        return self.shape[0]
+
+    def __getitem__(self, index: Index):
+        cols = self.shape[1]
+        if isinstance(index, tuple):
+            i, j = index
+            return self.data[i * cols + j]
+
+        return self._view[index * cols:(index + 1) * cols]
+
+    def __setitem__(self, index: Index, value) -> None:
+        cols = self.shape[1]
+        if isinstance(index, tuple):
+            i, j = index
+            self.data[i * cols + j] = value
+        else:
+            self._view[index * cols:(index + 1) * cols] = array(
+                self.typecode, value)
+
+    def __iter__(self) -> Iterator[memoryview]:
+        for i in range(self.shape[0]):
+            yield self[i]
+
+    def __eq__(self, other) -> bool:
+        try:
+            return self.tolist() == [list(row) for row in other]
+        except TypeError:
+            return NotImplemented
+
+    def tolist(self) -> List[list]:
+        cols = self.shape[1]
+        values = self.data.tolist()
+        return [values[i:i + cols] for i in range(0, len(values), cols)]
+
+    def copy(self) -> 'Matrix':
+        return Matrix(self.shape[0], self.shape[1], self.typecode, self.data)
+
+    def assign(self, values) -> None:
+        """Copy the values of another matrix of the same shape into this one."""
+        data = self.data
+        cols = self.shape[1]
+        for i, row in enumerate(values):
+            for j, value in enumerate(row):
+                data[i * cols + j] = value
+
+    def transpose(self) -> 'Matrix':
+        rows, cols = self.shape
+        data = self.data
+        return Matrix(cols, rows, self.typecode, (
+            data[i * cols + j] for j in range(cols) for i in range(rows)))
+
+    @property
+    def T(self) -> 'Matrix':
+        return self.transpose()
+
+    def __array__(self, dtype=None, copy=None):
+        """Return an ndarray sharing the storage of the matrix."""
+        import numpy as np
+
+        array_ = np.frombuffer(self.data, dtype=self.typecode).reshape(self.shape)
+        return array_ if dtype is None else array_.astype(dtype)
+
+    def __str__(self) -> str:
+        if self.typecode == 'i':
+            items = [str(value) for value in self.data]
+        elif all(value.is_integer() for value in self.data):
+            items = [f'{value:.0f}.' for value in self.data]
+        else:
+            items = [f'{value:.8g}' for value in self.data]
+        width = max(len(item) for item in items)
+        cols = self.shape[1]
+        rows = [
+            '[' + ' '.join(item.rjust(width) for item in items[i:i + cols]) + ']'
+            for i in range(0, len(items), cols)
+        ]
+
+        return '[' + '\n '.join(rows) + ']'
+
+    def __repr__(self) -> str:
+        return f'Matrix({self.tolist()})'
@@ -0,0 +1,197 @@
+"""In-process metrics registry with a Prometheus textfile exporter."""
+from bisect import bisect_left
+import os
+import tempfile
+import threading
+
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+from typing import Union
+
+
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0,
+)
+
+
+def _format_labels(labels: str, extra: str = '') -> str:
+    """Return the label set of a sample, empty without any labels."""
+    joined = ','.join(label for label in (labels, extra) if label)
+    return f'{{{joined}}}' if joined else ''
+
+
+class Counter():
+    """Monotonically increasing value."""
+
+    kind = 'counter'
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.value += amount
+
+    def samples(self, labels: str = '') -> List[str]:
+        return [f'{self.name}{_format_labels(labels)} {self.value}']
+
+
+class Gauge():
+    """Value that can go up and down."""
+
+    kind = 'gauge'
+
+    def __init__(self, name: str, documentation: str) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.value = 0.0
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def samples(self, labels: str = '') -> List[str]:
+        return [f'{self.name}{_format_labels(labels)} {self.value}']
+
+
+class Histogram():
+    """Distribution of observations over fixed buckets."""
+
+    kind = 'histogram'
+
+    def __init__(
+            self,
+            name: str,
+            documentation: str,
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+        ) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(sorted(buckets))
+        # The last count holds the observations above every bucket
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def samples(self, labels: str = '') -> List[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.counts):
+            cumulative += count
+            bucket = _format_labels(labels, f'le="{bound}"')
+            lines.append(f'{self.name}_bucket{bucket} {cumulative}')
+        cumulative += self.counts[-1]
+        bucket = _format_labels(labels, 'le="+Inf"')
+        lines.append(f'{self.name}_bucket{bucket} {cumulative}')
+        lines.append(f'{self.name}_sum{_format_labels(labels)} {self.sum}')
+        lines.append(
+            f'{self.name}_count{_format_labels(labels)} {cumulative}')
+
+        return lines
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class MetricsRegistry():
+    """Collection of named metrics.
+
+    Updating a metric is a plain attribute update with no locking, which
+    keeps the overhead on the control and UI paths negligible.
+    """
+
+    def __init__(self) -> None:
+        self._metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered!')
+        self._metrics[metric.name] = metric
+
+        return metric
+
+    def counter(self, name: str, documentation: str) -> Counter:
+        return self._register(Counter(name, documentation))
+
+    def gauge(self, name: str, documentation: str) -> Gauge:
+        return self._register(Gauge(name, documentation))
+
+    def histogram(
+            self,
+            name: str,
+            documentation: str,
+            buckets: Sequence[float] = DEFAULT_BUCKETS
+        ) -> Histogram:
+        return self._register(Histogram(name, documentation, buckets))
+
+    def render(self, labels: Optional[Dict[str, str]] = None) -> str:
+        """Render all metrics in the Prometheus text exposition format.
+
+        labels are added to every sample, to tell apart the processes
+        exporting the same metrics.
+        """
+        label_text = ','.join(
+            f'{name}="{value}"' for name, value in (labels or {}).items())
+        lines = []
+        for metric in list(self._metrics.values()):
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples(label_text))
+
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(
+            self,
+            path: str,
+            labels: Optional[Dict[str, str]] = None
+        ) -> None:
+        """Atomically write the metrics for the node_exporter textfile collector."""
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(
+            dir=directory, prefix='.mpct-metrics-', suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'w') as metrics_f:
+                metrics_f.write(self.render(labels))
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+REGISTRY = MetricsRegistry()
+
+
+class TextfileExporter(threading.Thread):
+    """Periodically dump a registry to a Prometheus textfile."""
+
+    def __init__(
+            self,
+            path: str,
+            interval: float = 15.0,
+            registry: MetricsRegistry = REGISTRY,
+            labels: Optional[Dict[str, str]] = None
+        ) -> None:
+        super().__init__(name='metrics-exporter', daemon=True)
+        self._path = path
+        self._interval = interval
+        self._registry = registry
+        self._labels = labels
+        self._stop_event = threading.Event()
+
+    def run(self) -> None:
+        """Write the textfile every interval until stopped."""
+        while not self._stop_event.wait(self._interval):
+            self._registry.write_textfile(self._path, self._labels)
+
+    def stop(self) -> None:
+        """Stop the exporter and write the final values."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
+        self._registry.write_textfile(self._path, self._labels)
@@ -0,0 +1,174 @@
+"""Run calibration jobs against many robots concurrently from one process."""
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import time
+
+from dataclasses import dataclass
+from dataclasses import field
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Sequence
+
+from mp_calibration_tool.backend import EEPROM_PATH
+from mp_calibration_tool.backend import SysfsBackend
+from mp_calibration_tool.calibration import validate_matrix
+from mp_calibration_tool.quadruped import Pupper
+
+
+JOB_STEPS = ('connect', 'read', 'validate', 'apply', 'verify')
+
+
+@dataclass
+class CalibrationJob():
+    """Calibration of a single robot.
+
+    Without a matrix the job only reads and validates the calibration.
+    """
+    backend: SysfsBackend
+    matrix: Optional[List[List[int]]] = None
+
+
+@dataclass
+class JobResult():
+    """Outcome and per-step timing of a calibration job."""
+    root: str
+    robot_id: str = ''
+    ok: bool = False
+    error: str = ''
+    matrix: Optional[List[List[int]]] = None
+    queued: float = 0.0
+    timings: Dict[str, float] = field(default_factory=dict)
+
+    @property
+    def duration(self) -> float:
+        return sum(self.timings.values())
+
+    def __str__(self) -> str:
+        steps = ', '.join(
+            f'{name} {seconds * 1e3:.1f} ms'
+            for name, seconds in self.timings.items())
+        status = 'ok' if self.ok else f'FAILED {self.error}'
+        return (
+            f'{self.robot_id or self.root}: {status} '
+            f'(queued {self.queued * 1e3:.1f} ms; {steps})'
+        )
+
+
+class CalibrationOrchestrator():
+    """Run calibration jobs with bounded parallelism.
+
+    The blocking EEPROM and sysfs I/O of every job runs on a thread pool
+    while asyncio interleaves the jobs. At most parallelism jobs hold a
+    robot at once, and each one reports how long it waited and spent in
+    every step.
+    """
+
+    def __init__(
+            self,
+            parallelism: int = 8,
+            calibration_file: str = EEPROM_PATH
+        ) -> None:
+        self.parallelism = parallelism
+        self.calibration_file = calibration_file
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    async def run(self, jobs: Sequence[CalibrationJob]) -> List[JobResult]:
+        """Run every job and return their results in order."""
+        semaphore = asyncio.Semaphore(self.parallelism)
+        self._executor = ThreadPoolExecutor(
+            self.parallelism, thread_name_prefix='orchestrator')
+        try:
+            return list(await asyncio.gather(
+                *(self._run_job(job, semaphore) for job in jobs)))
+        finally:
+            self._executor.shutdown()
+
+    async def _step(
+            self,
+            result: JobResult,
+            name: str,
+            function: Callable[[], Any]
+        ) -> Any:
+        start = time.perf_counter()
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, function)
+        except Exception as error:
+            result.error = f'{name}: {error}'
+            raise
+        finally:
+            result.timings[name] = time.perf_counter() - start
+
+    async def _run_job(
+            self,
+            job: CalibrationJob,
+            semaphore: asyncio.Semaphore
+        ) -> JobResult:
+        result = JobResult(job.backend.root)
+        queued = time.perf_counter()
+        async with semaphore:
+            result.queued = time.perf_counter() - queued
+            try:
+                pupper = await self._step(
+                    result, 'connect',
+                    lambda: Pupper(self.calibration_file, False, job.backend))
+                result.robot_id = pupper.robot_id
+
+                read_eeprom = await self._step(
+                    result, 'read', pupper.read_calibration_file)
+                await self._step(
+                    result, 'validate',
+                    lambda: self._validate(pupper, read_eeprom, job.matrix))
+
+                if job.matrix is not None:
+                    await self._step(
+                        result, 'apply', lambda: self._apply(pupper, job.matrix))
+                    await self._step(
+                        result, 'verify', lambda: self._verify(pupper, job.matrix))
+
+                result.matrix = pupper.calibration.matrix_eeprom.tolist()
+                result.ok = True
+            except Exception:
+                pass
+
+        return result
+
+    def _validate(
+            self,
+            pupper: Pupper,
+            read_eeprom: bool,
+            matrix: Optional[List[List[int]]]
+        ) -> None:
+        if matrix is not None:
+            validate_matrix(matrix)
+        elif not read_eeprom:
+            raise ValueError('EEPROM holds no readable calibration')
+        else:
+            validate_matrix(pupper.calibration.matrix_eeprom)
+
+    def _apply(self, pupper: Pupper, matrix: List[List[int]]) -> None:
+        # The daemon only loads the calibration when it starts
+        pupper.stop_daemon()
+        try:
+            pupper.update_calibration_matrix(matrix)
+            pupper.write_calibration_file().result()
+        finally:
+            pupper.start_daemon()
+
+    def _verify(self, pupper: Pupper, matrix: List[List[int]]) -> None:
+        if not pupper.read_calibration_file():
+            raise ValueError('EEPROM could not be read back')
+        if pupper.calibration.matrix_eeprom != matrix:
+            raise ValueError(
+                f'EEPROM holds {pupper.calibration.matrix_eeprom.tolist()}')
+
+
+def run_jobs(
+        jobs: Sequence[CalibrationJob],
+        parallelism: int = 8
+    ) -> List[JobResult]:
+    """Run calibration jobs to completion from synchronous code."""
+    return asyncio.run(CalibrationOrchestrator(parallelism).run(jobs))
@@ -0,0 +1,102 @@
+"""Plain-text renderer for low-power boards and dumb terminals.
+
+This module must not import rich: the whole frame is a preallocated
+bytearray and redrawing only patches the joint value fields in place.
+"""
+import os
+import sys
+
+from typing import List
+from typing import Optional
+from typing import TextIO
+
+from mp_calibration_tool.quadruped import JOINT_NAMES
+from mp_calibration_tool.quadruped import LEG_NAMES
+from mp_calibration_tool.quadruped import Pupper
+
+
+TITLE = b'Mini Pupper CLI Calibration Tool'
+OPTIONS = (
+    b'q: Quit  a: Apply  1-4: Select Leg  h/t/c: Select Joint  '
+    b'i/d: Increase/Decrease'
+)
+VALUE_FIELD = b' +000 '
+STATUS_WIDTH = 80
+JOINT_KEYS = ('h', 't', 'c')
+
+_SPACE = ord(' ')
+_MARK = ord('*')
+_OPEN = ord('[')
+_CLOSE = ord(']')
+_PLUS = ord('+')
+_MINUS = ord('-')
+_ZERO = ord('0')
+
+
+class PlainRenderer():
+    """Render the calibration tool as fixed-layout plain text."""
+
+    def __init__(self, pupper: Pupper, stream: Optional[TextIO] = None) -> None:
+        self._pupper = pupper
+        self._fd = (stream or sys.stdout).fileno()
+        self._legs = [pupper.__dict__[leg] for leg in LEG_NAMES]
+
+        buffer = bytearray(b'\n' + TITLE + b'\n')
+        self._status_offset = len(buffer)
+        self._status = ''
+        buffer += b' ' * STATUS_WIDTH + b'\n'
+        self._marker_offsets: List[int] = []
+        self._value_offsets: List[List[int]] = []
+        for leg in self._legs:
+            self._marker_offsets.append(len(buffer))
+            buffer += b'  ' + leg.title.encode().ljust(16)
+            offsets = []
+            for joint in JOINT_NAMES:
+                buffer += joint.encode().rjust(6)
+                offsets.append(len(buffer))
+                buffer += VALUE_FIELD
+            self._value_offsets.append(offsets)
+            buffer += b'\n'
+        buffer += OPTIONS + b'\n'
+
+        self._buffer = buffer
+
+    def _write_value(self, offset: int, value: int, is_selected: bool) -> None:
+        """Format a joint value into its field without allocating."""
+        buffer = self._buffer
+        buffer[offset] = _OPEN if is_selected else _SPACE
+        buffer[offset + 1] = _MINUS if value < 0 else _PLUS
+        value = -value if value < 0 else value
+        buffer[offset + 2] = _ZERO + value // 100 % 10
+        buffer[offset + 3] = _ZERO + value // 10 % 10
+        buffer[offset + 4] = _ZERO + value % 10
+        buffer[offset + 5] = _CLOSE if is_selected else _SPACE
+
+    def draw(
+            self,
+            leg_selection: str,
+            joint_selection: str,
+            status: str = ''
+        ) -> None:
+        """Patch the joint values and status into the frame and write it out."""
+        if status != self._status:
+            self._status = status
+            offset = self._status_offset
+            self._buffer[offset:offset + STATUS_WIDTH] = \
+                status.encode()[:STATUS_WIDTH].ljust(STATUS_WIDTH)
+
+        selected_leg = LEG_NAMES.index(leg_selection)
+        selected_joint = JOINT_KEYS.index(joint_selection)
+        for i, leg in enumerate(self._legs):
+            is_leg_selected = i == selected_leg
+            offsets = self._value_offsets[i]
+            self._buffer[self._marker_offsets[i]] = \
+                _MARK if is_leg_selected else _SPACE
+            self._write_value(
+                offsets[0], leg.hip, is_leg_selected and selected_joint == 0)
+            self._write_value(
+                offsets[1], leg.thigh, is_leg_selected and selected_joint == 1)
+            self._write_value(
+                offsets[2], leg.calf, is_leg_selected and selected_joint == 2)
+
+        os.write(self._fd, self._buffer)
@@ -0,0 +1,222 @@
+"""Signal based sampling profiler using only the standard library."""
+import os
+import signal
+import sys
+import threading
+import time
+
+from collections import defaultdict
+from types import CodeType
+from types import FrameType
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+
+MAX_DEPTH = 64
+OFF_CPU_FRAME = '[off-cpu]'
+
+# Subsystem of the innermost frame matching a path fragment and function
+SUBSYSTEM_RULES: Tuple[Tuple[str, str, Optional[str]], ...] = (
+    ('eeprom', '/mp_calibration_tool/eeprom_sim.py', None),
+    ('eeprom', '/mp_calibration_tool/quadruped.py', 'read_calibration_file'),
+    ('eeprom', '/mp_calibration_tool/quadruped.py', 'write_calibration_file'),
+    ('eeprom', '/mp_calibration_tool/quadruped.py', '_write_calibration'),
+    ('sysfs', '/mp_calibration_tool/quadruped.py', 'overload_detection'),
+    ('sysfs', '/mp_calibration_tool/quadruped.py', 'stop_daemon'),
+    ('sysfs', '/mp_calibration_tool/quadruped.py', 'start_daemon'),
+    ('sysfs', '/mp_calibration_tool/sampler.py', 'read_battery_current'),
+    ('sysfs', '/mp_calibration_tool/backend.py', 'robot_id'),
+    ('sysfs', '/mp_calibration_tool/backend.py', 'read_hw_version'),
+    ('sysfs', '/mp_calibration_tool/backend.py', 'read_battery_current'),
+    ('sysfs', '/mp_calibration_tool/backend.py', 'set_servo_power'),
+    ('sysfs', '/mp_calibration_tool/backend.py', 'stop_daemon'),
+    ('sysfs', '/mp_calibration_tool/backend.py', 'start_daemon'),
+    ('hardware', '/mp_calibration_tool/backend.py', None),
+    ('hardware', '/pupper/', None),
+    ('hardware', '/mp_calibration_tool/actuator.py', None),
+    ('rendering', '/rich/', None),
+    ('rendering', '/mp_calibration_tool/layout.py', None),
+    ('rendering', '/mp_calibration_tool/plain.py', None),
+    ('rendering', '/mp_calibration_tool/leg.py', None),
+    ('rendering', '/mp_calibration_tool/options.py', None),
+    ('rendering', '/mp_calibration_tool/title.py', None),
+    ('keyboard', '/mp_calibration_tool/keyboard.py', None),
+    ('history', '/mp_calibration_tool/history.py', None),
+    ('telemetry', '/mp_calibration_tool/telemetry.py', None),
+    ('metrics', '/mp_calibration_tool/metrics.py', None),
+    ('web', '/mp_calibration_tool/web.py', None),
+    ('web', '/http/server.py', None),
+)
+
+# The wall clock also fires while the process sleeps or blocks, which
+# interrupts those calls in the profiled code
+CLOCKS = {
+    'wall': (signal.ITIMER_REAL, signal.SIGALRM),
+    'cpu': (signal.ITIMER_PROF, signal.SIGPROF),
+}
+
+StackKey = Tuple[str, Tuple[CodeType, ...], bool]
+
+
+def frame_name(code: CodeType) -> str:
+    """Return the collapsed-stack name of a code object."""
+    module = os.path.basename(code.co_filename)
+    if module.endswith('.py'):
+        module = module[:-3]
+    return f'{module}:{getattr(code, "co_qualname", code.co_name)}'
+
+
+def classify(stack: Tuple[CodeType, ...]) -> str:
+    """Return the subsystem of an outermost-first stack."""
+    for code in reversed(stack):
+        filename = code.co_filename.replace(os.sep, '/')
+        for subsystem, fragment, function in SUBSYSTEM_RULES:
+            if fragment in filename and function in [None, code.co_name]:
+                return subsystem
+
+    return 'other'
+
+
+class SamplingProfiler():
+    """Sample the stacks of every thread from an interval timer signal.
+
+    The signal handler only walks the frames and counts them, keyed by code
+    objects, and all naming and attribution happens once at the end. Each
+    sample is weighted by the wall time since the previous one; the CPU
+    time a thread used meanwhile comes from its own CPU clock, so threads
+    waiting on I/O, sleeps or keys are marked off-CPU instead of hiding the
+    threads that actually run.
+    """
+
+    def __init__(self, interval: float = 0.005, clock: str = 'cpu') -> None:
+        self.interval = interval
+        self._timer, self._signal = CLOCKS[clock]
+        self._previous_handler = None
+        self._last_sample = 0.0
+        self._thread_cpu: Dict[int, float] = {}
+        self._thread_names: Dict[int, str] = {}
+        # Stack key to [wall seconds, CPU seconds]
+        self._stacks: Dict[StackKey, List[float]] = defaultdict(
+            lambda: [0.0, 0.0])
+        self.samples = 0
+        self.duration = 0.0
+        self._started = 0.0
+
+    def _cpu_time(
+            self,
+            ident: int,
+            threads: Dict[int, threading.Thread]
+        ) -> Optional[float]:
+        # The clock of a thread that exited is invalid or a reused thread's
+        thread = threads.get(ident)
+        if thread is None or not thread.is_alive():
+            return None
+        try:
+            return time.clock_gettime(time.pthread_getcpuclockid(ident))
+        except (OSError, OverflowError):
+            return None
+
+    def start(self) -> None:
+        """Start sampling; must be called from the main thread."""
+        threads = {thread.ident: thread for thread in threading.enumerate()}
+        for ident in sys._current_frames():
+            cpu = self._cpu_time(ident, threads)
+            if cpu is not None:
+                self._thread_cpu[ident] = cpu
+
+        self._started = self._last_sample = time.perf_counter()
+        self._previous_handler = signal.signal(self._signal, self._sample)
+        # Restart system calls the sampling signal lands in
+        signal.siginterrupt(self._signal, False)
+        signal.setitimer(self._timer, self.interval, self.interval)
+
+    def stop(self) -> None:
+        """Stop sampling and restore the previous signal handler."""
+        signal.setitimer(self._timer, 0)
+        signal.signal(self._signal, self._previous_handler)
+        self.duration = time.perf_counter() - self._started
+
+    def _sample(self, signum: int, frame: Optional[FrameType]) -> None:
+        now = time.perf_counter()
+        wall = now - self._last_sample
+        self._last_sample = now
+        self.samples += 1
+
+        threads = {thread.ident: thread for thread in threading.enumerate()}
+        if self._thread_names.keys() != threads.keys():
+            self._thread_names = {
+                ident: thread.name for ident, thread in threads.items()}
+            # Forget exited threads, whose ident may be reused
+            for ident in list(self._thread_cpu):
+                if ident not in threads:
+                    del self._thread_cpu[ident]
+
+        handler_code = self._sample.__code__
+        for ident, thread_frame in sys._current_frames().items():
+            cpu_now = self._cpu_time(ident, threads)
+            if cpu_now is None:
+                continue
+            cpu = cpu_now - self._thread_cpu.get(ident, 0.0)
+            self._thread_cpu[ident] = cpu_now
+
+            stack = []
+            while thread_frame is not None and len(stack) < MAX_DEPTH:
+                if thread_frame.f_code is not handler_code:
+                    stack.append(thread_frame.f_code)
+                thread_frame = thread_frame.f_back
+            stack.reverse()
+
+            key = (
+                self._thread_names.get(ident, str(ident)),
+                tuple(stack),
+                cpu < wall / 2,
+            )
+            totals = self._stacks[key]
+            totals[0] += wall
+            totals[1] += cpu
+
+    def write_collapsed(self, path: str) -> None:
+        """Write wall time in microseconds per stack for flame graph tools."""
+        lines: Dict[str, float] = defaultdict(float)
+        for (thread, stack, off_cpu), (wall, _) in list(self._stacks.items()):
+            frames = [thread] + [frame_name(code) for code in stack]
+            if off_cpu:
+                frames.append(OFF_CPU_FRAME)
+            lines[';'.join(frames)] += wall
+
+        with open(path, 'w') as collapsed_f:
+            for line, wall in sorted(lines.items()):
+                microseconds = round(wall * 1e6)
+                if microseconds > 0:
+                    collapsed_f.write(f'{line} {microseconds}\n')
+
+    def summary(self, top: int = 20) -> str:
+        """Return the time by subsystem and the top functions by self time."""
+        subsystems: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0.0])
+        functions: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0.0])
+        for (_, stack, _), (wall, cpu) in list(self._stacks.items()):
+            totals = subsystems[classify(stack)]
+            totals[0] += wall
+            totals[1] += cpu
+            if stack:
+                totals = functions[frame_name(stack[-1])]
+                totals[0] += wall
+                totals[1] += cpu
+
+        lines = [
+            f'{self.samples} samples over {self.duration:.1f} s',
+            '',
+            f'{"subsystem":<40} {"wall s":>10} {"cpu s":>10}',
+        ]
+        for name, (wall, cpu) in sorted(
+                subsystems.items(), key=lambda item: -item[1][1]):
+            lines.append(f'{name:<40} {wall:>10.3f} {cpu:>10.3f}')
+
+        lines += ['', f'{"function (self time)":<40} {"wall s":>10} {"cpu s":>10}']
+        for name, (wall, cpu) in sorted(
+                functions.items(), key=lambda item: -item[1][1])[:top]:
+            lines.append(f'{name[:40]:<40} {wall:>10.3f} {cpu:>10.3f}')
+
+        return '\n'.join(lines)
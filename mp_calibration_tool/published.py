@@ -0,0 +1,230 @@
+"""Active calibration published in a memory-mapped file for other processes.
+
+The record has a fixed little-endian layout, so a reader in any language
+can map it and find every field at the same offset::
+
+    offset  field          type
+         0  magic          8 bytes, b'MPCTCAL1'
+         8  layout         u32, layout version, currently 1
+        12  size           u32, record size in bytes
+        16  sequence       u64, odd while the record is being written
+        24  generation     u64, incremented on every publication
+        32  timestamp      f64, UNIX time of the publication
+        40  matrix         3x4 i32, calibration angles in degrees
+        88  hw_version     8 bytes, NUL padded
+        96  robot_id       64 bytes, NUL padded
+       160  checksum       u32, CRC-32 of the bytes from timestamp to checksum
+
+A reader copies the record while the sequence is even and unchanged, then
+checks the checksum.
+"""
+import mmap
+import os
+import struct
+import time
+import zlib
+
+from typing import NamedTuple
+from typing import Optional
+
+from mp_calibration_tool.calibration import validate_matrix
+from mp_calibration_tool.matrix import Matrix
+
+
+PUBLISHED_CALIBRATION_PATH = '/run/mpct/calibration'
+
+PUBLISHED_MAGIC = b'MPCTCAL1'
+PUBLISHED_LAYOUT = 1
+
+HEADER = struct.Struct('<8sII')
+SEQUENCE = struct.Struct('<Q')
+GENERATION = struct.Struct('<Q')
+BODY = struct.Struct('<d12i8s64s')
+CHECKSUM = struct.Struct('<I')
+
+SEQUENCE_OFFSET = 16
+GENERATION_OFFSET = 24
+CHECKSUM_START = 32
+CHECKSUM_END = CHECKSUM_START + BODY.size
+RECORD_SIZE = 168
+
+
+class PublishedCalibration(NamedTuple):
+    """Calibration read back from a published record."""
+    generation: int
+    timestamp: float
+    matrix: Matrix
+    hw_version: str
+    robot_id: str
+
+    def __str__(self) -> str:
+        return (
+            f'generation {self.generation} of {self.robot_id} '
+            f'({self.hw_version}): \n {self.matrix}'
+        )
+
+
+class CalibrationPublisher():
+    """Single writer of the published calibration record.
+
+    An existing record is updated in place, so readers keep their mapping
+    and its generation keeps counting up across runs.
+    """
+
+    def __init__(self, path: str = PUBLISHED_CALIBRATION_PATH) -> None:
+        self._path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size != RECORD_SIZE:
+                os.ftruncate(fd, RECORD_SIZE)
+            self._mmap = mmap.mmap(fd, RECORD_SIZE)
+        finally:
+            os.close(fd)
+
+        magic, layout, _ = HEADER.unpack_from(self._mmap)
+        if magic != PUBLISHED_MAGIC or layout != PUBLISHED_LAYOUT:
+            self._mmap[:] = bytes(RECORD_SIZE)
+            HEADER.pack_into(
+                self._mmap, 0, PUBLISHED_MAGIC, PUBLISHED_LAYOUT, RECORD_SIZE)
+        elif self._sequence & 1:
+            # A previous writer died while publishing
+            self._sequence += 1
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def generation(self) -> int:
+        return GENERATION.unpack_from(self._mmap, GENERATION_OFFSET)[0]
+
+    @property
+    def _sequence(self) -> int:
+        return SEQUENCE.unpack_from(self._mmap, SEQUENCE_OFFSET)[0]
+
+    @_sequence.setter
+    def _sequence(self, value: int) -> None:
+        SEQUENCE.pack_into(self._mmap, SEQUENCE_OFFSET, value)
+
+    def publish(
+            self,
+            matrix,
+            hw_version: str,
+            robot_id: str,
+            timestamp: float
+        ) -> int:
+        """Publish a validated calibration matrix and return its generation."""
+        validate_matrix(matrix)
+        values = [int(value) for row in matrix for value in row]
+        generation = self.generation + 1
+
+        self._sequence += 1
+        GENERATION.pack_into(self._mmap, GENERATION_OFFSET, generation)
+        BODY.pack_into(
+            self._mmap, CHECKSUM_START, timestamp, *values,
+            hw_version.encode()[:8], robot_id.encode()[:64])
+        CHECKSUM.pack_into(
+            self._mmap, CHECKSUM_END,
+            zlib.crc32(self._mmap[CHECKSUM_START:CHECKSUM_END]))
+        self._sequence += 1
+
+        return generation
+
+    def close(self) -> None:
+        """Release the memory map, leaving the record for its readers."""
+        self._mmap.close()
+
+
+class CalibrationReader():
+    """Zero-copy reader of the published calibration record.
+
+    Checking the generation is a single load from the mapping, so a
+    consumer can poll it and only copy the record when it changed.
+    """
+
+    def __init__(
+            self,
+            path: str = PUBLISHED_CALIBRATION_PATH,
+            timeout: float = 1.0
+        ) -> None:
+        self._timeout = timeout
+        with open(path, 'rb') as record_f:
+            if os.fstat(record_f.fileno()).st_size < RECORD_SIZE:
+                raise ValueError(f'{path} is not a published calibration!')
+            self._mmap = mmap.mmap(
+                record_f.fileno(), RECORD_SIZE, access=mmap.ACCESS_READ)
+
+        magic, layout, _ = HEADER.unpack_from(self._mmap)
+        if magic != PUBLISHED_MAGIC or layout != PUBLISHED_LAYOUT:
+            self.close()
+            raise ValueError(f'{path} is not a published calibration!')
+
+    @property
+    def generation(self) -> int:
+        return GENERATION.unpack_from(self._mmap, GENERATION_OFFSET)[0]
+
+    def read(self) -> PublishedCalibration:
+        """Return a consistent copy of the published calibration.
+
+        Raise ValueError when nothing was published yet, the record is
+        corrupt, or it kept changing while being read.
+        """
+        deadline = time.monotonic() + self._timeout
+        while True:
+            sequence = SEQUENCE.unpack_from(self._mmap, SEQUENCE_OFFSET)[0]
+            record = self._mmap[:RECORD_SIZE]
+            if sequence & 1 or sequence != SEQUENCE.unpack_from(
+                    self._mmap, SEQUENCE_OFFSET)[0]:
+                # Let the writer finish before retrying
+                if time.monotonic() > deadline:
+                    raise ValueError(
+                        'Published calibration kept changing while read!')
+                time.sleep(0)
+                continue
+
+            generation = GENERATION.unpack_from(record, GENERATION_OFFSET)[0]
+            if generation == 0:
+                raise ValueError('No calibration was published yet!')
+            checksum = CHECKSUM.unpack_from(record, CHECKSUM_END)[0]
+            if zlib.crc32(record[CHECKSUM_START:CHECKSUM_END]) != checksum:
+                raise ValueError('Published calibration is corrupt!')
+
+            timestamp, *values, hw_version, robot_id = BODY.unpack_from(
+                record, CHECKSUM_START)
+            return PublishedCalibration(
+                generation,
+                timestamp,
+                Matrix(3, 4, 'i', values),
+                hw_version.rstrip(b'\0').decode(),
+                robot_id.rstrip(b'\0').decode(),
+            )
+
+    def read_if_changed(
+            self,
+            generation: int
+        ) -> Optional[PublishedCalibration]:
+        """Return the calibration unless its generation is still generation."""
+        if self.generation == generation:
+            return None
+
+        return self.read()
+
+    def close(self) -> None:
+        """Release the memory map."""
+        self._mmap.close()
+
+    def __enter__(self) -> 'CalibrationReader':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def read_published_calibration(
+        path: str = PUBLISHED_CALIBRATION_PATH
+    ) -> PublishedCalibration:
+    """Return the calibration published at path."""
+    with CalibrationReader(path) as reader:
+        return reader.read()
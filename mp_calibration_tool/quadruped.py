@@ -1,14 +1,53 @@
 """Pupper class definition."""
-import os
 import re
+import time
+from array import array
+from concurrent.futures import Future
+from typing import Callable
+from typing import Hashable
+from typing import IO
+from typing import List
+from typing import Optional
+from typing import TYPE_CHECKING
 from typing import Union
 
-import numpy as np
-
-from pupper.HardwareInterface import HardwareInterface
-
+from mp_calibration_tool.backend import P1_CALIBRATION_PATH
+from mp_calibration_tool.backend import SysfsBackend
+from mp_calibration_tool.calibration import JointLookupTable
 from mp_calibration_tool.calibration import LegCalibrationData
+from mp_calibration_tool.daemon import DaemonClient
+from mp_calibration_tool.daemon import DaemonError
+from mp_calibration_tool.eeprom_sim import SimulatedEeprom
+from mp_calibration_tool.history import CalibrationHistory
 from mp_calibration_tool.leg import Leg
+from mp_calibration_tool.matrix import Matrix
+from mp_calibration_tool.metrics import REGISTRY
+from mp_calibration_tool.published import CalibrationPublisher
+from mp_calibration_tool.sampler import CurrentSampler
+from mp_calibration_tool.snapshot import JointSnapshot
+from mp_calibration_tool.thresholds import DEFAULT_CURRENT_MAX
+from mp_calibration_tool.thresholds import DEFAULT_HOLD_COUNTER_MAX
+from mp_calibration_tool.writer import WriteBehindQueue
+
+if TYPE_CHECKING:
+    # The recorder needs NumPy, which the core does without
+    from mp_calibration_tool.telemetry import TelemetryRecorder
+
+
+LEG_NAMES = ('left_front', 'right_front', 'left_back', 'right_back')
+JOINT_NAMES = ('hip', 'thigh', 'calf')
+
+EEPROM_READ_SECONDS = REGISTRY.histogram(
+    'mpct_eeprom_read_seconds', 'Time spent reading the calibration EEPROM.')
+EEPROM_WRITE_SECONDS = REGISTRY.histogram(
+    'mpct_eeprom_write_seconds', 'Time spent writing the calibration EEPROM.')
+HOT_APPLY_SECONDS = REGISTRY.histogram(
+    'mpct_hot_apply_seconds',
+    'Time until the running daemon took over a calibration.')
+OVERLOAD_TRIPS = REGISTRY.counter(
+    'mpct_overload_trips_total', 'Number of servo power cuts by overloads.')
+OVERLOAD_HOLD_COUNTER = REGISTRY.gauge(
+    'mpct_overload_hold_counter', 'Current overload hold counter level.')
 
 
 class Pupper():
@@ -16,25 +55,44 @@ class Pupper():
 
     def __init__(
             self,
-            calibration_file: str
+            calibration_file: str,
+            hardware: bool = True,
+            backend: Optional[SysfsBackend] = None
         ) -> None:
-        with open('/home/ubuntu/.hw_version', 'r') as hw_f:
-            hw_version = hw_f.readline()
+        # Every device path is resolved by the backend, which defaults to
+        # the running system
+        self.backend = backend if backend is not None else SysfsBackend()
+        hw_version = self.backend.read_hw_version()
+        self.hw_version = hw_version.strip()
+        self.robot_id = self.backend.robot_id()
 
         if hw_version == 'P1\n':
-            self._calibration_file = '/home/ubuntu/.nv_file'
+            self._calibration_file = self.backend.path(P1_CALIBRATION_PATH)
             self.servo1_en = 19
             self.servo2_en = 26
         else:
-            self._calibration_file = calibration_file
+            self._calibration_file = self.backend.path(calibration_file)
             self.servo1_en = 25
             self.servo2_en = 21
 
-        # Stop the robot daemon
-        self.stop_daemon()
+        # Optional background writer running the EEPROM and GPIO writes,
+        # which run inline without one
+        self.writer: Optional[WriteBehindQueue] = None
+        self.calibration_write: Optional[Future] = None
+
+        # Optional client hot-applying calibrations to the running daemon,
+        # which is then left running
+        self.daemon: Optional[DaemonClient] = None
+
+        # Only the process owning the hardware side stops the daemon and
+        # drives the servos
+        self.hardware_interface = None
+        if hardware:
+            # Stop the robot daemon
+            self.stop_daemon()
 
-        # Instantiate the hardware servo
-        self.hardware_interface = HardwareInterface()
+            # Instantiate the hardware servo
+            self.attach_hardware()
 
         # Set all four legs
         self.left_front = Leg('left-front', '1: Left-Front', 0, 0, -90, 'green')
@@ -45,24 +103,76 @@ class Pupper():
         # Leg calibration data
         self.calibration = LegCalibrationData()
 
-        # Initialize overload counter
+        # Servo command of every joint value, compiled per calibration
+        self._command_converter: Optional[Callable[[float], float]] = None
+        self.joint_lookup = JointLookupTable(
+            [self.left_front.joint_range(joint) for joint in JOINT_NAMES])
+        self.compile_lookup()
+
+        # Overload thresholds, possibly replaced by learned ones
+        self.overload_current_max = DEFAULT_CURRENT_MAX
+        self.overload_hold_counter_max = DEFAULT_HOLD_COUNTER_MAX
+
+        # Initialize overload counter, state and last battery current
         self.overload_hold_counter = 0
+        self.overload = False
+        self.current_now = 0
+
+        # Optional simulated EEPROM replacing the calibration file
+        self.eeprom: Optional[SimulatedEeprom] = None
+
+        # Optional history recording every calibration read and written
+        self.history: Optional[CalibrationHistory] = None
+
+        # Optional publisher sharing the active calibration with the daemon
+        self.publisher: Optional[CalibrationPublisher] = None
+
+        # Optional background sampler providing the battery current
+        self.current_sampler: Optional[CurrentSampler] = None
+
+        # Optional telemetry recorder fed by overload detection
+        self.telemetry: Optional['TelemetryRecorder'] = None
+        self._joint_matrix = Matrix.zeros(3, 4)
+        self._joint_angles = Matrix.zeros(3, 4)
+
+        # Joint values published for the control path
+        self.joint_snapshot = JointSnapshot()
+        self._published_joints = [0] * 12
+        self._snapshot_joints = array('i', bytes(4 * 12))
+        self.publish_joints()
+
+    def open_calibration_file(self, mode: str) -> IO:
+        """Open the calibration EEPROM, or its simulation when attached."""
+        if self.eeprom is not None:
+            return self.eeprom.open(mode)
+
+        return open(self._calibration_file, mode)
 
     def read_calibration_file(self) -> bool:
-        """Read all lines text from EEPROM."""
+        """Read all lines text from EEPROM.
+
+        Return whether the matrix came from the EEPROM rather than the
+        defaults used when it can not be read.
+        """
+        # Never read back an older calibration than the one queued
+        self.flush_writes()
+        start = time.perf_counter()
         try:
-            with open(self._calibration_file, 'rb') as nv_f:
+            with self.open_calibration_file('rb') as nv_f:
                 # TODO Figure out a way to replace `eval`
-                arr1 = np.array(eval(nv_f.readline()))
-                arr2 = np.array(eval(nv_f.readline()))
-                matrix = np.append(arr1, arr2)
-                arr3 = np.array(eval(nv_f.readline()))
-                matrix = np.append(matrix, arr3)
-                matrix.resize(3,4)
+                values = list(eval(nv_f.readline()))
+                values.extend(eval(nv_f.readline()))
+                values.extend(eval(nv_f.readline()))
+                # Missing values are zero and extra ones dropped, like resize
+                values = (values + [0] * 12)[:12]
+                matrix = Matrix.from_rows(
+                    [values[0:4], values[4:8], values[8:12]], 'i')
                 self.calibration.matrix_eeprom = matrix
                 print(f'Get nv calibration params: \n {matrix}')
+                read_eeprom = True
         except:
-            matrix = np.array([
+            read_eeprom = False
+            matrix = Matrix.from_rows([
                 [0, 0, 0, 0],
                 [45, 45, 45, 45],
                 [-45, -45, -45, -45]
@@ -74,30 +184,58 @@ class Pupper():
                 self.calibration.no_calibration_servo_angle[i][j] = self.calibration.matrix_eeprom[i, j]
                 self.calibration.calibration_servo_angle[i][j] = self.calibration.matrix_eeprom[i, j]
 
-        return True
+        self.calibration.compile_transform()
+        self.compile_lookup()
+        EEPROM_READ_SECONDS.observe(time.perf_counter() - start)
+        if read_eeprom and self.history is not None:
+            self.history.record(
+                self.robot_id, self.hw_version, 'read', matrix)
+        if read_eeprom:
+            self.publish_calibration(matrix)
+        return read_eeprom
 
     def update_calibration_matrix(self, angle: Union[float, int]) -> bool:
         """Update calibration matrix using new angle values."""
         for i in range(3):
             for j in range(4):
-                self.calibration.matrix_eeprom[i, j] = angle[i][j]
+                self.calibration.matrix_eeprom[i, j] = int(angle[i][j])
 
         return True
 
-    def write_calibration_file(self) -> bool:
-        """Write matrix to EEPROM."""
-        buf_matrix = np.zeros((3, 4))
+    def write_calibration_file(self, action: str = 'apply') -> Future:
+        """Write matrix to EEPROM and record it in the history as action.
+
+        Return a future of the write, which raises its error on result().
+        With a writer attached, the write is queued and this returns at
+        once; a newer write queued before it runs replaces it.
+        """
+        buf_matrix = Matrix.zeros(3, 4)
         for i in range(3):
             for j in range(4):
                 buf_matrix[i,j]= self.calibration.matrix_eeprom[i, j]
 
-        # Format array object string for np.array
+        self.calibration_write = self.submit_write(
+            'calibration', self._write_calibration, buf_matrix, action)
+        return self.calibration_write
+
+    def calibration_write_status(self) -> str:
+        """Describe the last calibration write if it failed."""
+        write = self.calibration_write
+        if write is None or not write.done() or write.exception() is None:
+            return ''
+
+        return f'Calibration write failed: {write.exception()}'
+
+    def _write_calibration(self, buf_matrix: Matrix, action: str) -> None:
+        start = time.perf_counter()
+
+        # Format array object string, printed like a NumPy array
         p1 = re.compile("([0-9]\.) ( *)")  # pattern to replace the space that follows each number with a comma
         partially_formatted_matrix = p1.sub(r"\1,\2", str(buf_matrix))
         p2 = re.compile("(\]\n)")  # pattern to add a comma at the end of the first two lines
         formatted_matrix_with_required_commas = p2.sub("],\n", partially_formatted_matrix)
 
-        with open(self._calibration_file, 'w') as nv_f:
+        with self.open_calibration_file('w') as nv_f:
             _tmp = str(buf_matrix)
             _tmp = _tmp.replace('.' , ',')
             _tmp = _tmp.replace('[' , '')
@@ -105,7 +243,64 @@ class Pupper():
             print(_tmp, file = nv_f)
             nv_f.close()
 
-        return True
+        EEPROM_WRITE_SECONDS.observe(time.perf_counter() - start)
+        if self.history is not None:
+            self.history.record(
+                self.robot_id, self.hw_version, action, buf_matrix)
+        self.publish_calibration(buf_matrix)
+        self.hot_apply_calibration(buf_matrix)
+
+    def submit_write(
+            self,
+            key: Hashable,
+            write: Callable,
+            *args
+        ) -> Future:
+        """Run a device write on the writer, or inline without one.
+
+        The key names what the write overwrites, see WriteBehindQueue.
+        Either way, a failed write raises its error on result().
+        """
+        if self.writer is not None:
+            return self.writer.submit(key, write, *args)
+
+        future: Future = Future()
+        try:
+            future.set_result(write(*args))
+        except Exception as error:
+            future.set_exception(error)
+        return future
+
+    def flush_writes(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the queued device writes to complete."""
+        if self.writer is None:
+            return True
+
+        return self.writer.flush(timeout)
+
+    def publish_calibration(self, matrix: Matrix) -> None:
+        """Publish a calibration matrix when a publisher is attached."""
+        if self.publisher is None:
+            return
+
+        try:
+            self.publisher.publish(
+                matrix, self.hw_version, self.robot_id, time.time())
+        except ValueError as error:
+            print(f'Calibration not published: {error}')
+
+    def hot_apply_calibration(self, matrix: Matrix) -> None:
+        """Hand a calibration matrix to the running daemon when attached."""
+        if self.daemon is None:
+            return
+
+        start = time.perf_counter()
+        try:
+            self.daemon.apply_calibration(matrix)
+        except (OSError, DaemonError) as error:
+            print(f'Calibration not hot-applied: {error}')
+            return
+        HOT_APPLY_SECONDS.observe(time.perf_counter() - start)
 
     def modify_all_leg_joint_values(self, values) -> None:
         """Modify all four leg's joint values."""
@@ -117,60 +312,164 @@ class Pupper():
             values[2][0], values[2][1], values[2][2])
         self.right_back.change_joint_values(
             values[3][0], values[3][1], values[3][2])
+        self.publish_joints()
 
     def reset_leg_joint_values(self) -> bool:
         """Reset all the leg joint values."""
         values = [[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]]
         for i in range(3):
             for j in range(4):
-                values[j][i] = self.calibration.servo_standard_langle[i][j]
+                values[j][i] = int(self.calibration.servo_standard_langle[i][j])
 
         self.modify_all_leg_joint_values(values)
 
         return True
 
-    def update_leg_joint_values(self) -> bool:
-        """Update all the leg joint values."""
-        # NOTE: be careful here since the original value and angle are 3x4 not 4x3.
-        value = []
-        value.append(self.left_front.get_all_joint_values())
-        value.append(self.right_front.get_all_joint_values())
-        value.append(self.left_back.get_all_joint_values())
-        value.append(self.right_back.get_all_joint_values())
-        angle = [[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 0]]
+    def get_all_leg_joint_values(self) -> List[List[int]]:
+        """Return the joint values of all four legs as a 4x3 list."""
+        return [self.__dict__[leg].get_all_joint_values() for leg in LEG_NAMES]
+
+    def publish_joints(self) -> None:
+        """Publish the current leg values to the joint snapshot.
+
+        Must be called after changing the legs for the change to reach the
+        servos.
+        """
+        values = self._published_joints
+        for j, leg in enumerate(LEG_NAMES):
+            leg = self.__dict__[leg]
+            values[3 * j] = leg.hip
+            values[3 * j + 1] = leg.thigh
+            values[3 * j + 2] = leg.calf
+        self.joint_snapshot.publish(values)
+
+    def get_joint_matrix(self) -> Matrix:
+        """Return the last published joint values as a 3x4 matrix.
+
+        The values come from a consistent snapshot, so this is safe to call
+        from another thread than the one changing the legs. The matrix is a
+        buffer owned by the Pupper and is overwritten on every call.
+        """
+        joints = self._snapshot_joints
+        self.joint_snapshot.read(joints)
+        data = self._joint_matrix.data
+        for servo in range(12):
+            axis, leg = divmod(servo, 4)
+            data[servo] = joints[3 * leg + axis]
+
+        return self._joint_matrix
+
+    @property
+    def command_converter(self) -> Optional[Callable[[float], float]]:
+        """Optional conversion of the angles in radians to a driver's unit.
+
+        Setting it recompiles the lookup table with the conversion folded in.
+        """
+        return self._command_converter
+
+    @command_converter.setter
+    def command_converter(
+            self,
+            convert: Optional[Callable[[float], float]]
+        ) -> None:
+        self._command_converter = convert
+        self.compile_lookup()
+
+    def compile_lookup(self) -> None:
+        """Rebuild the joint lookup table after the calibration changed."""
+        self.joint_lookup.compile(
+            self.calibration.transform, self.command_converter)
+
+    def calculate_joint_angles(self) -> Matrix:
+        """Calculate the 3x4 servo joint angles in radians from the leg values.
+
+        The angles are looked up from the last published joint values, or
+        are the converted commands when a command converter is set. They
+        are written into a buffer owned by the Pupper, so the result is
+        overwritten on every call.
+        """
+        self.joint_snapshot.read(self._snapshot_joints)
+
+        return self.joint_lookup.apply(
+            self._snapshot_joints, self._joint_angles)
+
+    def calculate_calibration_angles(self) -> List[List[int]]:
+        """Calculate the 3x4 calibration angle matrix from the leg values."""
+        # NOTE: be careful here since the leg values are 4x3 not 3x4.
+        value = self.get_all_leg_joint_values()
+        angle = [[0, 0, 0, 0], [0, 0, 0, 0], [0, 0, 0, 0]]
         for i in range(3):
             for j in range(4):
-                angle[j][i] = self.calibration.servo_standard_langle[i][j] \
+                angle[i][j] = self.calibration.servo_standard_langle[i][j] \
                     - value[j][i] \
                     + self.calibration.no_calibration_servo_angle[i][j]
 
                 # limit angles if needed
-                if angle[j][i] > 90:
-                    angle[j][i] = 90
-                elif angle[j][i] < -90:
-                    angle[j][i] = -90
+                if angle[i][j] > 90:
+                    angle[i][j] = 90
+                elif angle[i][j] < -90:
+                    angle[i][j] = -90
+
+        return angle
+
+    def update_leg_joint_values(self) -> bool:
+        """Update all the leg joint values."""
+        self.calculate_calibration_angles()
 
         # NOTE: Be careful updating the matrix since there is no message box
-        # that serves as a warning like in the original GUI version.
+        # that serves as a warning like in the original GUI version. The
+        # apply key asks for a confirming key instead, see handle_key.
         return True
 
+    def apply_calibration(self, wait: bool = False) -> List[List[int]]:
+        """Write the calibration angles of the current leg values to EEPROM.
+
+        With wait, return only once the write is done and raise its error.
+        """
+        angle = self.calculate_calibration_angles()
+        self.update_calibration_matrix(angle)
+        write = self.write_calibration_file()
+        if wait:
+            write.result()
+
+        return angle
+
     def overload_detection(
             self,
-            overload_current_max: int = 1500000,
-            overload_hold_counter_max: int = 100) -> bool:
-        """Detect any system overloads from battery."""
+            overload_current_max: Optional[int] = None,
+            overload_hold_counter_max: Optional[int] = None) -> bool:
+        """Detect any system overloads from battery.
+
+        The thresholds default to the overload_current_max and
+        overload_hold_counter_max attributes.
+        """
+        if overload_current_max is None:
+            overload_current_max = self.overload_current_max
+        if overload_hold_counter_max is None:
+            overload_hold_counter_max = self.overload_hold_counter_max
         overload = False
 
-        r = os.popen('cat /sys/class/power_supply/max1720x_battery/current_now')
-        feedback = str(r.readlines())
-        current_now = int(feedback[3:len(feedback)-4])
+        # A stale sample falls back to reading the current directly
+        sample = None
+        if self.current_sampler is not None:
+            sample = self.current_sampler.fresh_sample()
+
+        if sample is not None:
+            current_now = sample.current
+        else:
+            current_now = self.backend.read_battery_current()
+        self.current_now = current_now
 
         if current_now > overload_current_max:
             self.overload_hold_counter += 1
             if self.overload_hold_counter > overload_hold_counter_max:
                 self.overload_hold_counter = overload_hold_counter_max
-                os.popen(f'echo 0 > /sys/class/gpio/gpio{self.servo1_en}/value')
-                os.popen(f'echo 0 > /sys/class/gpio/gpio{self.servo2_en}/value')
+                # A failed cut is retried every step the overload lasts,
+                # while the servos are no longer commanded
+                try:
+                    self.set_servo_power(False)
+                except OSError as error:
+                    print(f'Servo power cut failed: {error}')
                 overload = True
             else:
                 overload = False
@@ -178,20 +477,51 @@ class Pupper():
             self.overload_hold_counter -= 10
             if self.overload_hold_counter < 0:
                 self.overload_hold_counter = 0
-                os.popen(f'echo 1 > /sys/class/gpio/gpio{self.servo1_en}/value')
-                os.popen(f'echo 1 > /sys/class/gpio/gpio{self.servo2_en}/value')
+                self.set_servo_power(True)
                 overload = False
 
+        if overload and not self.overload:
+            OVERLOAD_TRIPS.inc()
+        OVERLOAD_HOLD_COUNTER.set(self.overload_hold_counter)
+        self.overload = overload
+        if self.telemetry is not None:
+            self.telemetry.record(
+                current_now,
+                self.overload_hold_counter,
+                overload,
+                self.get_joint_matrix()
+            )
+
         return overload
 
+    def attach_hardware(self) -> None:
+        """Take over the servos once the robot daemon is stopped."""
+        self.hardware_interface = self.backend.create_servo_driver()
+
+    def set_servo_power(self, on: bool) -> None:
+        """Switch the servo power.
+
+        It is switched inline rather than on the writer, so an overload cut
+        never waits behind EEPROM, history or daemon writes.
+        """
+        self.backend.set_servo_power((self.servo1_en, self.servo2_en), on)
+
     def stop_daemon(self) -> None:
-        """Stop the robot daemon to allow for calibration."""
-        os.system('sudo systemctl stop robot')
-        os.system(f'echo 1 > /sys/class/gpio/gpio{self.servo1_en}/value')
-        os.system(f'echo 1 > /sys/class/gpio/gpio{self.servo2_en}/value')
+        """Stop the robot daemon to allow for calibration.
+
+        A daemon taking hot-applied calibrations is left running.
+        """
+        if self.daemon is None:
+            self.submit_write(
+                'daemon', self.backend.stop_daemon,
+                (self.servo1_en, self.servo2_en)).result()
 
     def start_daemon(self) -> None:
-        """Start the robot daemon after finishing calibration."""
-        os.system('sudo systemctl start robot')
-        os.system(f'echo 1 > /sys/class/gpio/gpio{self.servo1_en}/value')
-        os.system(f'echo 1 > /sys/class/gpio/gpio{self.servo2_en}/value')
+        """Start the robot daemon after finishing calibration.
+
+        Queued writes run first, so the daemon loads the latest calibration.
+        """
+        if self.daemon is None:
+            self.submit_write(
+                'daemon', self.backend.start_daemon,
+                (self.servo1_en, self.servo2_en)).result()
@@ -0,0 +1,127 @@
+"""Real-time scheduling helpers for the servo update thread."""
+import ctypes
+import ctypes.util
+import os
+import time
+
+from dataclasses import dataclass
+from dataclasses import field
+from typing import List
+from typing import Optional
+
+
+MCL_CURRENT = 1
+MCL_FUTURE = 2
+
+
+@dataclass
+class RealtimeSettings():
+    """Opt-in real-time settings applied to the servo update thread."""
+    cpu: Optional[int] = None
+    fifo_priority: Optional[int] = None
+    lock_memory: bool = False
+
+
+@dataclass
+class JitterStats():
+    """Timing error of a periodic loop in microseconds."""
+    period: float
+    samples: int
+    mean: float
+    p99: float
+    max: float
+
+    def __str__(self) -> str:
+        return (
+            f'{self.samples} ticks of {self.period * 1e3:.1f} ms: '
+            f'mean {self.mean:.0f} us, p99 {self.p99:.0f} us, '
+            f'max {self.max:.0f} us'
+        )
+
+
+@dataclass
+class RealtimeReport():
+    """Scheduling state achieved by the servo update thread."""
+    policy: str = 'SCHED_OTHER'
+    priority: int = 0
+    cpus: List[int] = field(default_factory=list)
+    memory_locked: bool = False
+    errors: List[str] = field(default_factory=list)
+    jitter: Optional[JitterStats] = None
+
+    def __str__(self) -> str:
+        lines = [
+            f'Servo thread policy: {self.policy} (priority {self.priority})',
+            f'Servo thread CPUs: {self.cpus}',
+            f'Memory locked: {self.memory_locked}',
+        ]
+        if self.jitter is not None:
+            lines.append(f'Servo loop jitter: {self.jitter}')
+        lines.extend(f'Warning: {error}' for error in self.errors)
+
+        return '\n'.join(lines)
+
+
+def lock_memory() -> None:
+    """Lock all current and future pages of the process into RAM."""
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    if libc.mlockall(MCL_CURRENT | MCL_FUTURE) != 0:
+        errno = ctypes.get_errno()
+        raise OSError(errno, os.strerror(errno))
+
+
+def apply_realtime_settings(settings: RealtimeSettings) -> RealtimeReport:
+    """Apply the settings to the calling thread, falling back gracefully."""
+    report = RealtimeReport()
+
+    if settings.cpu is not None:
+        try:
+            os.sched_setaffinity(0, {settings.cpu})
+        except (OSError, ValueError) as error:
+            report.errors.append(f'Could not pin to CPU {settings.cpu}: {error}')
+
+    if settings.fifo_priority is not None:
+        try:
+            os.sched_setscheduler(
+                0, os.SCHED_FIFO, os.sched_param(settings.fifo_priority))
+        except (OSError, ValueError) as error:
+            report.errors.append(f'Could not enable SCHED_FIFO: {error}')
+
+    if settings.lock_memory:
+        try:
+            lock_memory()
+            report.memory_locked = True
+        except (OSError, AttributeError) as error:
+            report.errors.append(f'Could not lock memory: {error}')
+
+    policy = os.sched_getscheduler(0)
+    report.policy = {
+        os.SCHED_OTHER: 'SCHED_OTHER',
+        os.SCHED_FIFO: 'SCHED_FIFO',
+        os.SCHED_RR: 'SCHED_RR',
+    }.get(policy, str(policy))
+    report.priority = os.sched_getparam(0).sched_priority
+    report.cpus = sorted(os.sched_getaffinity(0))
+
+    return report
+
+
+def measure_jitter(period: float = 0.01, samples: int = 100) -> JitterStats:
+    """Measure how late a periodic sleep loop wakes up."""
+    lateness = []
+    next_time = time.monotonic() + period
+    for _ in range(samples):
+        delay = next_time - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        lateness.append((time.monotonic() - next_time) * 1e6)
+        next_time += period
+
+    lateness.sort()
+    return JitterStats(
+        period=period,
+        samples=samples,
+        mean=sum(lateness) / samples,
+        p99=lateness[min(samples - 1, int(samples * 0.99))],
+        max=lateness[-1],
+    )
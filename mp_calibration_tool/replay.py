@@ -0,0 +1,125 @@
+"""Record and replay keyboard sessions of the calibration tool."""
+import json
+import time
+
+from dataclasses import dataclass
+from typing import Callable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from mp_calibration_tool.clock import SYSTEM_CLOCK
+from mp_calibration_tool.clock import Clock
+from mp_calibration_tool.dispatch import Selection
+from mp_calibration_tool.dispatch import handle_key
+from mp_calibration_tool.quadruped import Pupper
+
+
+KeyEvent = Tuple[float, str]
+
+
+class KeyRecorder():
+    """Append timestamped key presses to a JSON-lines file."""
+
+    def __init__(self, path: str, clock: Clock = SYSTEM_CLOCK) -> None:
+        self._file = open(path, 'w')
+        self._clock = clock
+        self._start = clock.monotonic()
+
+    def record(self, key: str) -> None:
+        """Record a single key press relative to the start of the session."""
+        event = {'t': round(self._clock.monotonic() - self._start, 6), 'key': key}
+        self._file.write(json.dumps(event) + '\n')
+
+    def close(self) -> None:
+        """Close the key log."""
+        self._file.close()
+
+
+def load_key_events(path: str) -> List[KeyEvent]:
+    """Load the key presses of a recorded session."""
+    events = []
+    with open(path, 'r') as key_f:
+        for line in key_f:
+            if line.strip():
+                event = json.loads(line)
+                events.append((float(event['t']), event['key']))
+
+    return events
+
+
+@dataclass
+class ReplayStats():
+    """Throughput and latency of a replayed session."""
+    events: int
+    duration: float
+    mean_latency: float
+    p50_latency: float
+    p99_latency: float
+    max_latency: float
+
+    @property
+    def events_per_second(self) -> float:
+        return self.events / self.duration if self.duration > 0 else 0.0
+
+    def __str__(self) -> str:
+        return (
+            f'{self.events} events in {self.duration:.3f} s '
+            f'({self.events_per_second:.0f} events/s)\n'
+            f'latency mean {self.mean_latency * 1e3:.3f} ms, '
+            f'p50 {self.p50_latency * 1e3:.3f} ms, '
+            f'p99 {self.p99_latency * 1e3:.3f} ms, '
+            f'max {self.max_latency * 1e3:.3f} ms'
+        )
+
+
+def replay_key_events(
+        pupper: Pupper,
+        events: List[KeyEvent],
+        renderer=None,
+        paced: bool = False,
+        on_update: Optional[Callable[[], None]] = None,
+        clock: Clock = SYSTEM_CLOCK
+    ) -> ReplayStats:
+    """Feed recorded key presses through the same dispatch as the tool.
+
+    With paced set, every key is delivered at its recorded time on the
+    clock; otherwise the keys are replayed as fast as possible. The latency
+    of an event is the real time spent dispatching and redrawing it.
+    """
+    selection = Selection()
+    if renderer is not None:
+        renderer.draw(selection.leg, selection.joint)
+
+    latencies = []
+    start = time.perf_counter()
+    clock_start = clock.monotonic()
+    for timestamp, key in events:
+        if key in ['q', 'Q']:
+            break
+
+        if paced:
+            clock.sleep(timestamp - (clock.monotonic() - clock_start))
+
+        event_start = time.perf_counter()
+        if handle_key(pupper, key, selection):
+            if on_update is not None:
+                on_update()
+            if renderer is not None:
+                renderer.draw(selection.leg, selection.joint)
+        latencies.append(time.perf_counter() - event_start)
+    duration = time.perf_counter() - start
+
+    latencies.sort()
+    count = len(latencies)
+    if count == 0:
+        return ReplayStats(0, duration, 0.0, 0.0, 0.0, 0.0)
+
+    return ReplayStats(
+        events=count,
+        duration=duration,
+        mean_latency=sum(latencies) / count,
+        p50_latency=latencies[count // 2],
+        p99_latency=latencies[min(count - 1, int(count * 0.99))],
+        max_latency=latencies[-1],
+    )
@@ -0,0 +1,118 @@
+"""Background battery current sampler."""
+import threading
+
+from array import array
+from typing import Callable
+from typing import NamedTuple
+from typing import Optional
+
+from mp_calibration_tool.clock import SYSTEM_CLOCK
+from mp_calibration_tool.clock import Clock
+
+
+BATTERY_CURRENT_PATH = '/sys/class/power_supply/max1720x_battery/current_now'
+
+# Samples older than this many sampling periods are stale
+STALE_PERIODS = 5
+
+
+class CurrentSample(NamedTuple):
+    """A single published battery current sample."""
+    sequence: int
+    timestamp: float
+    current: int
+    mean: float
+
+
+def read_battery_current(path: str = BATTERY_CURRENT_PATH) -> int:
+    """Read the battery current from the fuel gauge sysfs node."""
+    with open(path, 'r') as current_f:
+        return int(current_f.read())
+
+
+class CurrentSampler(threading.Thread):
+    """Sample the battery current at a fixed rate on a dedicated thread.
+
+    The sampler is the only writer of its slot: every sample is published
+    by rebinding ``latest`` to a new immutable CurrentSample, so readers on
+    the control and UI paths get a consistent sample without locking.
+    """
+
+    def __init__(
+            self,
+            rate_hz: float = 100.0,
+            window: int = 50,
+            read_current: Optional[Callable[[], int]] = None,
+            clock: Clock = SYSTEM_CLOCK
+        ) -> None:
+        super().__init__(name='current-sampler', daemon=True)
+        self._period = 1.0 / rate_hz
+        self._clock = clock
+        self._read_current = read_current or read_battery_current
+        self._window = array('q', bytes(8 * window))
+        self._window_sum = 0
+        self._stop_event = threading.Event()
+        self.latest: Optional[CurrentSample] = None
+        self.errors = 0
+
+    @property
+    def rate_hz(self) -> float:
+        return 1.0 / self._period
+
+    @rate_hz.setter
+    def rate_hz(self, value: float) -> None:
+        if value <= 0:
+            raise ValueError('Sampling rate must be positive!')
+        self._period = 1.0 / value
+
+    def run(self) -> None:
+        """Sample until stopped, publishing every reading."""
+        sequence = 0
+        window = self._window
+        window_size = len(window)
+        clock = self._clock
+        next_time = clock.monotonic()
+        while not self._stop_event.is_set():
+            try:
+                current = self._read_current()
+            except (OSError, ValueError):
+                self.errors += 1
+            else:
+                index = sequence % window_size
+                self._window_sum += current - window[index]
+                window[index] = current
+                sequence += 1
+                self.latest = CurrentSample(
+                    sequence,
+                    clock.monotonic(),
+                    current,
+                    self._window_sum / min(sequence, window_size)
+                )
+
+            next_time += self._period
+            delay = next_time - clock.monotonic()
+            if delay > 0:
+                clock.wait(self._stop_event, delay)
+            else:
+                next_time = clock.monotonic()
+
+    def fresh_sample(self) -> Optional[CurrentSample]:
+        """Return the latest sample, or None when it is missing or stale.
+
+        A sampler failing to read or no longer running keeps its last
+        sample, which must not stand in for the current one.
+        """
+        sample = self.latest
+        if sample is None:
+            return None
+        if self._clock.monotonic() - sample.timestamp \
+                > STALE_PERIODS * self._period:
+            return None
+
+        return sample
+
+    def stop(self) -> None:
+        """Stop sampling and wait for the thread to finish."""
+        self._stop_event.set()
+        if self.is_alive():
+            self.join()
@@ -0,0 +1,204 @@
+"""Automated per-joint sweep self-test based on the battery current."""
+from dataclasses import dataclass
+from typing import Callable
+from typing import List
+from typing import Tuple
+
+import numpy as np
+
+from mp_calibration_tool.clock import SYSTEM_CLOCK
+from mp_calibration_tool.clock import Clock
+from mp_calibration_tool.quadruped import JOINT_NAMES
+from mp_calibration_tool.quadruped import LEG_NAMES
+from mp_calibration_tool.quadruped import Pupper
+from mp_calibration_tool.sampler import read_battery_current
+
+
+@dataclass
+class JointResult():
+    """Outcome of sweeping a single joint."""
+    leg: str
+    joint: str
+    status: str
+    peak_excess: float
+    mean_excess: float
+    slope: float
+    intercept: float
+
+    def __str__(self) -> str:
+        return (
+            f'{self.leg:<12} {self.joint:<6} {self.status:<9} '
+            f'peak {self.peak_excess / 1000:7.0f} mA  '
+            f'mean {self.mean_excess / 1000:7.0f} mA'
+        )
+
+
+def build_trajectory(
+        start: int,
+        minimum: int,
+        maximum: int,
+        steps: int
+    ) -> np.ndarray:
+    """Return integer joint values sweeping start -> min -> max -> start."""
+    quarter = max(2, steps // 4)
+    return np.concatenate((
+        np.linspace(start, minimum, quarter),
+        np.linspace(minimum, maximum, 2 * quarter),
+        np.linspace(maximum, start, quarter),
+    )).round().astype(int)
+
+
+class SelfTest():
+    """Sweep every joint through its range while sampling battery current.
+
+    The current of each step is compared to a linear baseline fitted over
+    the whole sweep of that joint. A localized rise above the baseline
+    flags a binding servo and a sustained high current flags a stalling
+    one. Legs are swept together in groups that fit into the power budget;
+    a flagged group is swept again one leg at a time to find the culprit.
+    All currents are in microamps, like ``current_now``.
+    """
+
+    def __init__(
+            self,
+            pupper: Pupper,
+            read_current: Callable[[], int] = read_battery_current,
+            steps: int = 40,
+            samples_per_step: int = 4,
+            settle: float = 0.01,
+            power_budget: int = 3000000,
+            joint_current: int = 700000,
+            binding_threshold: int = 400000,
+            stall_threshold: int = 1200000,
+            overload_current_max: int = 1500000,
+            clock: Clock = SYSTEM_CLOCK
+        ) -> None:
+        self._pupper = pupper
+        self._clock = clock
+        self._read_current = read_current
+        self._steps = steps
+        self._samples_per_step = samples_per_step
+        self._settle = settle
+        self._group_size = max(1, power_budget // joint_current)
+        self._binding_threshold = binding_threshold
+        self._stall_threshold = stall_threshold
+        self._overload_current_max = overload_current_max
+        self._idle_current = 0.0
+
+    def _send(self) -> None:
+        """Push the current leg values to the servos."""
+        self._pupper.publish_joints()
+        self._pupper.hardware_interface.set_actuator_postions(
+            self._pupper.calculate_joint_angles())
+
+    def _sample(self, out: np.ndarray) -> None:
+        """Fill out with back-to-back current readings."""
+        for k in range(out.shape[0]):
+            out[k] = self._read_current()
+
+    def measure_idle(self) -> float:
+        """Measure the current drawn while all joints hold still."""
+        self._send()
+        self._clock.sleep(self._settle)
+        samples = np.zeros(self._samples_per_step * 4)
+        self._sample(samples)
+        self._idle_current = float(np.median(samples))
+
+        return self._idle_current
+
+    def sweep(
+            self,
+            legs: List[str],
+            joint: str
+        ) -> Tuple[np.ndarray, np.ndarray, bool]:
+        """Sweep one joint of the given legs together.
+
+        Returns the trajectory, the current samples of every step and
+        whether the sweep was aborted because of an overload.
+        """
+        starts = [getattr(self._pupper.__dict__[name], joint) for name in legs]
+        minimum, maximum = self._pupper.__dict__[legs[0]].joint_range(joint)
+        trajectory = build_trajectory(
+            starts[0], minimum, maximum, self._steps)
+        samples = np.zeros((trajectory.shape[0], self._samples_per_step))
+
+        aborted = False
+        for step, value in enumerate(trajectory.tolist()):
+            for name in legs:
+                setattr(self._pupper.__dict__[name], joint, value)
+            self._send()
+            self._clock.sleep(self._settle)
+            self._sample(samples[step])
+            if samples[step].min() > self._overload_current_max:
+                aborted = True
+                samples = samples[:step + 1]
+                trajectory = trajectory[:step + 1]
+                break
+
+        for name, start in zip(legs, starts):
+            setattr(self._pupper.__dict__[name], joint, start)
+        self._send()
+
+        return trajectory, samples, aborted
+
+    def analyze(
+            self,
+            legs: List[str],
+            joint: str,
+            trajectory: np.ndarray,
+            samples: np.ndarray,
+            aborted: bool
+        ) -> List[JointResult]:
+        """Fit a baseline to a sweep and classify its joints."""
+        # Classify on the total excess current so a single binding joint is
+        # not diluted by the other joints of its group
+        excess = samples.mean(axis=1) - self._idle_current
+        if trajectory.shape[0] > 1 and np.ptp(trajectory) > 0:
+            slope, intercept = np.polyfit(trajectory, excess, 1)
+        else:
+            slope, intercept = 0.0, float(excess.mean())
+        residual = excess - (slope * trajectory + intercept)
+
+        if aborted or np.median(excess) > self._stall_threshold * len(legs):
+            status = 'stalling'
+        elif residual.max() > self._binding_threshold:
+            status = 'binding'
+        else:
+            status = 'ok'
+
+        excess /= len(legs)
+        return [
+            JointResult(
+                leg=name,
+                joint=joint,
+                status=status,
+                peak_excess=float(excess.max()),
+                mean_excess=float(excess.mean()),
+                slope=float(slope) / len(legs),
+                intercept=float(intercept) / len(legs),
+            )
+            for name in legs
+        ]
+
+    def run(self) -> List[JointResult]:
+        """Sweep all twelve joints and return their results."""
+        self.measure_idle()
+        groups = [
+            list(LEG_NAMES[i:i + self._group_size])
+            for i in range(0, len(LEG_NAMES), self._group_size)
+        ]
+
+        results = []
+        for joint in JOINT_NAMES:
+            for legs in groups:
+                group_results = self.analyze(
+                    legs, joint, *self.sweep(legs, joint))
+                if len(legs) > 1 and group_results[0].status != 'ok':
+                    # Sweep one leg at a time to find the failing joint
+                    group_results = []
+                    for name in legs:
+                        group_results.extend(self.analyze(
+                            [name], joint, *self.sweep([name], joint)))
+                results.extend(group_results)
+
+        return results
@@ -0,0 +1,211 @@
+"""JSON-lines RPC server exposing Pupper operations on a Unix socket.
+
+Every request is a single line of JSON such as::
+
+    {"id": 1, "method": "set_joint",
+     "params": {"leg": "left_front", "joint": "hip", "value": 10}}
+
+and is answered by a single line holding either ``result`` or ``error``.
+A line containing a JSON array is a batch: all of its requests are handled
+in one round trip without yielding to other clients, and the answers are
+returned as an array in the same order.
+"""
+import asyncio
+import json
+import os
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from mp_calibration_tool.quadruped import JOINT_NAMES
+from mp_calibration_tool.quadruped import LEG_NAMES
+from mp_calibration_tool.quadruped import Pupper
+
+
+DEFAULT_SOCKET_PATH = '/tmp/mpct.sock'
+
+
+class RpcError(Exception):
+    """Error reported back to the RPC client."""
+
+
+class PupperRpcServer():
+    """Serve Pupper operations to local clients over a Unix domain socket."""
+
+    def __init__(
+            self,
+            pupper: Pupper,
+            socket_path: str = DEFAULT_SOCKET_PATH
+        ) -> None:
+        self._pupper = pupper
+        self._socket_path = socket_path
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._methods: Dict[str, Callable[[Dict[str, Any]], Any]] = {
+            'get_joints': self.get_joints,
+            'set_joint': self.set_joint,
+            'set_joints': self.set_joints,
+            'reset_joints': self.reset_joints,
+            'read_calibration': self.read_calibration,
+            'apply_calibration': self.apply_calibration,
+            'get_overload': self.get_overload,
+        }
+
+    async def start(self) -> None:
+        """Start listening on the Unix socket."""
+        if os.path.exists(self._socket_path):
+            os.unlink(self._socket_path)
+
+        self._server = await asyncio.start_unix_server(
+            self._handle_client, path=self._socket_path)
+
+    async def serve_forever(self) -> None:
+        """Start the server and serve clients until cancelled."""
+        await self.start()
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            if os.path.exists(self._socket_path):
+                os.unlink(self._socket_path)
+
+    async def _handle_client(
+            self,
+            reader: asyncio.StreamReader,
+            writer: asyncio.StreamWriter
+        ) -> None:
+        """Answer every request line sent by a single client."""
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+
+                writer.write(self.handle_line(line))
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    def handle_line(self, line: bytes) -> bytes:
+        """Decode one request line and return the encoded response line."""
+        try:
+            message = json.loads(line)
+        except ValueError:
+            response = {'id': None, 'error': 'Invalid JSON request!'}
+        else:
+            if isinstance(message, list):
+                response = [self.handle_request(request) for request in message]
+            else:
+                response = self.handle_request(message)
+
+        return json.dumps(response).encode() + b'\n'
+
+    def handle_request(self, request: Any) -> Dict[str, Any]:
+        """Run a single decoded request and build its response."""
+        if not isinstance(request, dict):
+            return {'id': None, 'error': 'Request must be a JSON object!'}
+
+        request_id = request.get('id')
+        name = request.get('method')
+        method = self._methods.get(name) if isinstance(name, str) else None
+        if method is None:
+            return {'id': request_id, 'error': f'Unknown method: {name}'}
+
+        params = request.get('params') or {}
+        if not isinstance(params, dict):
+            return {'id': request_id, 'error': 'Params must be a JSON object!'}
+
+        try:
+            return {'id': request_id, 'result': method(params)}
+        except RpcError as error:
+            return {'id': request_id, 'error': str(error)}
+        except Exception as error:
+            # Answer the request rather than drop the client and its batch
+            return {
+                'id': request_id,
+                'error': f'{name} failed: {type(error).__name__}: {error}',
+            }
+
+    def _validate_update(self, update: Any) -> Tuple[str, str, int]:
+        """Check a single joint update and return it as a tuple."""
+        if not isinstance(update, dict):
+            raise RpcError('Joint update must be a JSON object!')
+
+        leg = update.get('leg')
+        joint = update.get('joint')
+        value = update.get('value')
+        if leg not in LEG_NAMES:
+            raise RpcError(f'Unknown leg: {leg}')
+        if joint not in JOINT_NAMES:
+            raise RpcError(f'Unknown joint: {joint}')
+        if not isinstance(value, int) or isinstance(value, bool):
+            raise RpcError('Joint value must be an int!')
+
+        return leg, joint, value
+
+    def get_joints(self, params: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """Return the joint values of every leg."""
+        joints = {}
+        for leg in LEG_NAMES:
+            values = self._pupper.__dict__[leg].get_all_joint_values()
+            joints[leg] = dict(zip(JOINT_NAMES, values))
+
+        return joints
+
+    def set_joint(self, params: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """Set a single joint value."""
+        return self.set_joints({'updates': [params]})
+
+    def set_joints(self, params: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """Set many joint values atomically.
+
+        Every update is validated before any of them is applied, so a bad
+        entry leaves all legs untouched.
+        """
+        updates = params.get('updates')
+        if not isinstance(updates, list):
+            raise RpcError('set_joints requires a list of updates!')
+
+        validated = [self._validate_update(update) for update in updates]
+        for leg, joint, value in validated:
+            setattr(self._pupper.__dict__[leg], joint, value)
+        self._pupper.publish_joints()
+
+        return self.get_joints(params)
+
+    def reset_joints(self, params: Dict[str, Any]) -> Dict[str, Dict[str, int]]:
+        """Reset every joint to its standard angle."""
+        self._pupper.reset_leg_joint_values()
+        return self.get_joints(params)
+
+    def read_calibration(self, params: Dict[str, Any]) -> List[List[int]]:
+        """Read the calibration matrix from EEPROM."""
+        self._pupper.read_calibration_file()
+        return self._pupper.calibration.matrix_eeprom.tolist()
+
+    def apply_calibration(self, params: Dict[str, Any]) -> List[List[int]]:
+        """Write the calibration of the current joint values to EEPROM."""
+        angle = self._pupper.apply_calibration(wait=True)
+        return [[int(value) for value in row] for row in angle]
+
+    def get_overload(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        """Run overload detection and return the overload state."""
+        overload = self._pupper.overload_detection()
+        return {
+            'overload': overload,
+            'overload_hold_counter': self._pupper.overload_hold_counter,
+        }
+
+
+def serve(pupper: Pupper, socket_path: str = DEFAULT_SOCKET_PATH) -> None:
+    """Run the RPC server until interrupted."""
+    server = PupperRpcServer(pupper, socket_path)
+    try:
+        asyncio.run(server.serve_forever())
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,189 @@
+"""Joint and status exchange between the UI and control processes."""
+from multiprocessing import shared_memory
+import os
+import time
+
+from typing import NamedTuple
+from typing import Optional
+
+import numpy as np
+
+from mp_calibration_tool.actuator import DeltaActuator
+from mp_calibration_tool.control import ControlLoop
+from mp_calibration_tool.quadruped import Pupper
+from mp_calibration_tool.realtime import RealtimeSettings
+
+
+STATE_DTYPE = np.dtype([
+    ('joint_sequence', '<u8'),
+    ('joints', '<i4', (4, 3)),
+    ('status_sequence', '<u8'),
+    ('overload', 'u1'),
+    ('overload_hold_counter', '<i4'),
+    ('current', '<i8'),
+    ('heartbeat', '<f8'),
+    ('quit', 'u1'),
+], align=True)
+
+# Status older than this means the control process stopped responding
+HEARTBEAT_TIMEOUT = 1.0
+
+
+class PupperStatus(NamedTuple):
+    """Status published by the control process."""
+    overload: bool
+    overload_hold_counter: int
+    current: int
+    heartbeat: float
+
+    def describe(self, now: Optional[float] = None) -> str:
+        """Return a one-line summary for the UI."""
+        if self.heartbeat == 0:
+            return 'Control: starting'
+        if now is None:
+            now = time.monotonic()
+        if now - self.heartbeat > HEARTBEAT_TIMEOUT:
+            return 'Control: not responding'
+
+        state = 'OVERLOAD' if self.overload else 'ok'
+        return (f'Control: {state}, {self.current // 1000} mA, '
+                f'hold {self.overload_hold_counter}')
+
+
+class SharedPupperState():
+    """Shared memory block holding the 4x3 joint matrix and control status.
+
+    The joints and the status are each guarded by a sequence counter that
+    is odd while the single writer is updating them. Readers retry until
+    they see the same even sequence before and after copying.
+    """
+
+    def __init__(self, name: Optional[str] = None) -> None:
+        if name is None:
+            self._shm = shared_memory.SharedMemory(
+                create=True, size=STATE_DTYPE.itemsize)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+
+        self._state = np.ndarray((), dtype=STATE_DTYPE, buffer=self._shm.buf)
+        if name is None:
+            self._state[()] = np.zeros((), dtype=STATE_DTYPE)
+
+        self._joint_sequence = self._state['joint_sequence']
+        self._joints = self._state['joints']
+        self._status_sequence = self._state['status_sequence']
+
+    @property
+    def name(self) -> str:
+        return self._shm.name
+
+    @property
+    def joint_sequence(self) -> int:
+        return int(self._joint_sequence)
+
+    @property
+    def quit_requested(self) -> bool:
+        return bool(self._state['quit'])
+
+    def request_quit(self) -> None:
+        """Ask the control process to shut down."""
+        self._state['quit'] = 1
+
+    def write_joints(self, values) -> None:
+        """Publish a new 4x3 joint matrix."""
+        self._joint_sequence += 1
+        self._joints[...] = values
+        self._joint_sequence += 1
+
+    def read_joints(self, out: np.ndarray) -> int:
+        """Copy a consistent joint matrix into out and return its sequence."""
+        while True:
+            sequence = int(self._joint_sequence)
+            if sequence & 1:
+                continue
+            out[...] = self._joints
+            if sequence == int(self._joint_sequence):
+                return sequence
+
+    def write_status(
+            self,
+            overload: bool,
+            overload_hold_counter: int,
+            current: int
+        ) -> None:
+        """Publish the control status."""
+        self._status_sequence += 1
+        self._state['overload'] = overload
+        self._state['overload_hold_counter'] = overload_hold_counter
+        self._state['current'] = current
+        self._state['heartbeat'] = time.monotonic()
+        self._status_sequence += 1
+
+    def read_status(self) -> PupperStatus:
+        """Return a consistent copy of the control status."""
+        while True:
+            sequence = int(self._status_sequence)
+            if sequence & 1:
+                continue
+            status = PupperStatus(
+                bool(self._state['overload']),
+                int(self._state['overload_hold_counter']),
+                int(self._state['current']),
+                float(self._state['heartbeat']),
+            )
+            if sequence == int(self._status_sequence):
+                return status
+
+    def close(self) -> None:
+        """Detach from the shared memory block."""
+        del self._joint_sequence, self._joints, self._status_sequence
+        del self._state
+        self._shm.close()
+
+    def unlink(self) -> None:
+        """Destroy the shared memory block."""
+        self._shm.unlink()
+
+
+class SharedStateControlLoop(ControlLoop):
+    """Control loop taking its joints from a SharedPupperState.
+
+    It stops once quit is requested, or once the UI process that started
+    it is gone without asking.
+    """
+
+    def __init__(
+            self,
+            pupper: Pupper,
+            state: SharedPupperState,
+            period: float = 0.01,
+            realtime: Optional[RealtimeSettings] = None,
+            actuator: Optional[DeltaActuator] = None
+        ) -> None:
+        super().__init__(pupper, period, realtime, actuator)
+        self._state = state
+        self._joints = np.zeros((4, 3), dtype=np.int32)
+        self._joint_sequence = -1
+        self._parent_pid = os.getppid()
+
+    def tick(self) -> None:
+        """Adopt the latest joints, run a control step and publish status."""
+        if self._state.quit_requested:
+            self._stop_event.set()
+            return
+        if os.getppid() != self._parent_pid:
+            print('UI process is gone, stopping the servo control')
+            self._stop_event.set()
+            return
+
+        sequence = self._state.read_joints(self._joints)
+        if sequence != self._joint_sequence:
+            self._joint_sequence = sequence
+            self._pupper.modify_all_leg_joint_values(self._joints.tolist())
+
+        super().tick()
+        self._state.write_status(
+            self.overload,
+            self._pupper.overload_hold_counter,
+            self._pupper.current_now
+        )
@@ -0,0 +1,146 @@
+"""Run the overload and control logic on a simulated clock."""
+from bisect import bisect_right
+import tempfile
+import time
+
+from dataclasses import dataclass
+from typing import List
+from typing import Optional
+
+from mp_calibration_tool.backend import EEPROM_PATH
+from mp_calibration_tool.backend import SimulatedBackend
+from mp_calibration_tool.clock import SimulatedClock
+from mp_calibration_tool.control import ControlLoop
+from mp_calibration_tool.quadruped import Pupper
+
+
+class CurrentTrace():
+    """Battery current over time, held from one sample to the next.
+
+    Times are in seconds from the start of the trace. With loop set, the
+    trace repeats past its end, otherwise its last current is held.
+    """
+
+    def __init__(
+            self,
+            times: List[float],
+            currents: List[int],
+            loop: bool = True
+        ) -> None:
+        if not times or len(times) != len(currents):
+            raise ValueError('A current trace needs as many times as currents!')
+        self._times = times
+        self._currents = currents
+        self.loop = loop
+
+    @property
+    def duration(self) -> float:
+        return self._times[-1]
+
+    def current(self, t: float) -> int:
+        """Return the battery current in uA at t seconds."""
+        if self.loop and self.duration > 0:
+            t %= self.duration
+        index = bisect_right(self._times, t) - 1
+
+        return self._currents[max(index, 0)]
+
+    @classmethod
+    def from_telemetry(cls, path: str, loop: bool = True) -> 'CurrentTrace':
+        """Return the currents recorded in a telemetry file."""
+        from mp_calibration_tool.telemetry import load_telemetry
+
+        records = load_telemetry(path)
+        if records.size == 0:
+            raise ValueError(f'{path} holds no samples!')
+        times = records['timestamp'] - records['timestamp'][0]
+
+        return cls(times.tolist(), records['current'].tolist(), loop)
+
+    @classmethod
+    def synthetic(
+            cls,
+            idle_current: int = 500000,
+            stall_current: int = 1800000,
+            stall_every: float = 600.0,
+            stall_length: float = 5.0
+        ) -> 'CurrentTrace':
+        """Return an idle current with a stall at the end of every period."""
+        if not 0.0 < stall_length < stall_every:
+            raise ValueError('Stalls must be shorter than their period!')
+
+        return cls(
+            [0.0, stall_every - stall_length, stall_every],
+            [idle_current, stall_current, idle_current]
+        )
+
+
+@dataclass
+class SimulationReport():
+    """Outcome of a simulated control run."""
+    simulated: float = 0.0
+    wall: float = 0.0
+    ticks: int = 0
+    overload_trips: int = 0
+    overload_seconds: float = 0.0
+    servo_writes: int = 0
+
+    def __str__(self) -> str:
+        speedup = self.simulated / self.wall if self.wall > 0 else 0.0
+        return (
+            f'Simulated {self.simulated:.1f} s in {self.wall:.2f} s '
+            f'({speedup:.0f}x): {self.ticks} ticks, '
+            f'{self.overload_trips} overload trips, '
+            f'{self.overload_seconds:.2f} s overloaded, '
+            f'{self.servo_writes} servo writes'
+        )
+
+
+def simulate_control(
+        trace: CurrentTrace,
+        duration: float,
+        period: float = 0.01,
+        root: Optional[str] = None,
+        overload_current_max: Optional[int] = None,
+        overload_hold_counter_max: Optional[int] = None,
+        telemetry_path: Optional[str] = None
+    ) -> SimulationReport:
+    """Run the control loop of a simulated robot for duration seconds.
+
+    The loop runs in the calling thread on a simulated clock, so it takes
+    only as long as its ticks do. The robot lives under root, or under a
+    temporary directory when no root is given.
+    """
+    with tempfile.TemporaryDirectory(prefix='mpct-sim-') as tmp_root:
+        clock = SimulatedClock()
+        backend = SimulatedBackend(root or tmp_root)
+        backend.current_source = lambda: trace.current(clock.monotonic())
+
+        pupper = Pupper(EEPROM_PATH, True, backend)
+        if overload_current_max is not None:
+            pupper.overload_current_max = overload_current_max
+        if overload_hold_counter_max is not None:
+            pupper.overload_hold_counter_max = overload_hold_counter_max
+        if telemetry_path is not None:
+            from mp_calibration_tool.telemetry import TelemetryRecorder
+
+            pupper.telemetry = TelemetryRecorder(
+                telemetry_path, int(duration / period) + 1, clock)
+
+        control = ControlLoop(pupper, period, clock=clock)
+        start = time.perf_counter()
+        try:
+            control.run_for(duration)
+        finally:
+            wall = time.perf_counter() - start
+            if pupper.telemetry is not None:
+                pupper.telemetry.close()
+
+    return SimulationReport(
+        simulated=clock.monotonic(),
+        wall=wall,
+        ticks=control.ticks,
+        overload_trips=control.overload_trips,
+        overload_seconds=control.overload_ticks * period,
+        servo_writes=sum(driver.writes for driver in backend.servo_drivers)
+    )
@@ -0,0 +1,43 @@
+"""Double-buffered joint snapshot for consistent cross-thread reads."""
+from array import array
+
+from typing import Sequence
+
+
+class JointSnapshot():
+    """Latest 12 joint values, published by one writer to any reader.
+
+    The writer fills the buffer readers are not using and then bumps the
+    sequence counter, which both publishes it and selects it for the next
+    read. A reader copies the selected buffer and retries if the sequence
+    moved meanwhile, so it never returns a half-updated pose and never
+    takes a lock.
+    """
+
+    def __init__(self, size: int = 12) -> None:
+        self._buffers = (
+            array('i', bytes(4 * size)),
+            array('i', bytes(4 * size)),
+        )
+        self._size = size
+        self._sequence = 0
+
+    @property
+    def sequence(self) -> int:
+        return self._sequence
+
+    def publish(self, values: Sequence[int]) -> None:
+        """Publish a new set of joint values."""
+        sequence = self._sequence
+        buffer = self._buffers[(sequence + 1) & 1]
+        for i in range(self._size):
+            buffer[i] = values[i]
+        self._sequence = sequence + 1
+
+    def read(self, out: array) -> int:
+        """Copy the latest joint values into out and return their sequence."""
+        while True:
+            sequence = self._sequence
+            out[:] = self._buffers[sequence & 1]
+            if sequence == self._sequence:
+                return sequence
@@ -0,0 +1,164 @@
+"""Concurrent bring-up of the Pupper while the UI is already shown."""
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import time
+
+from typing import Any
+from typing import Callable
+from typing import Dict
+from typing import Optional
+from typing import Sequence
+
+
+class StartupStep():
+    """A named bring-up step and its progress."""
+
+    def __init__(
+            self,
+            name: str,
+            function: Callable[[], Any],
+            after: Sequence[str]
+        ) -> None:
+        self.name = name
+        self.function = function
+        self.after = tuple(after)
+        self.state = 'pending'
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+    @property
+    def duration(self) -> float:
+        if self.started is None:
+            return 0.0
+        finished = time.perf_counter() if self.finished is None else self.finished
+
+        return finished - self.started
+
+    def __str__(self) -> str:
+        if self.state in ['done', 'failed']:
+            return f'{self.name} {self.duration * 1e3:.0f} ms'
+
+        return f'{self.name} {self.state}'
+
+
+class Startup():
+    """Run bring-up steps on a thread pool as soon as their dependencies end.
+
+    A failed step skips every step that has not started yet, and its
+    error is raised again by check().
+    """
+
+    def __init__(self, max_workers: int = 4) -> None:
+        self._max_workers = max_workers
+        self._steps: Dict[str, StartupStep] = {}
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._started: Optional[float] = None
+        self._finished: Optional[float] = None
+
+    def add(
+            self,
+            name: str,
+            function: Callable[[], Any],
+            after: Sequence[str] = ()
+        ) -> None:
+        """Add a step that runs once every step named in after is done."""
+        for dependency in after:
+            if dependency not in self._steps:
+                raise ValueError(f'Unknown startup step {dependency}!')
+        self._steps[name] = StartupStep(name, function, after)
+
+    @property
+    def steps(self) -> Sequence[StartupStep]:
+        return list(self._steps.values())
+
+    @property
+    def done(self) -> bool:
+        return self._done.is_set()
+
+    @property
+    def failed(self) -> bool:
+        return any(step.error is not None for step in self._steps.values())
+
+    @property
+    def ready(self) -> bool:
+        return self.done and not self.failed
+
+    @property
+    def duration(self) -> float:
+        if self._started is None:
+            return 0.0
+        finished = time.perf_counter() if self._finished is None else self._finished
+
+        return finished - self._started
+
+    def start(self) -> None:
+        """Start every step without pending dependencies."""
+        self._executor = ThreadPoolExecutor(
+            self._max_workers, thread_name_prefix='startup')
+        self._started = time.perf_counter()
+        with self._lock:
+            self._submit_ready_steps()
+
+    def _submit_ready_steps(self) -> None:
+        """Submit runnable steps and detect the end; called under the lock."""
+        steps = self._steps.values()
+        if self.failed:
+            for step in steps:
+                if step.state == 'pending':
+                    step.state = 'skipped'
+        else:
+            for step in steps:
+                if step.state == 'pending' and all(
+                        self._steps[name].state == 'done'
+                        for name in step.after):
+                    step.state = 'queued'
+                    self._executor.submit(self._run_step, step)
+
+        if all(step.state in ['done', 'failed', 'skipped'] for step in steps):
+            self._finished = time.perf_counter()
+            self._executor.shutdown(wait=False)
+            self._done.set()
+
+    def _run_step(self, step: StartupStep) -> None:
+        step.started = time.perf_counter()
+        step.state = 'running'
+        try:
+            step.result = step.function()
+            step.state = 'done'
+        except BaseException as error:
+            step.error = error
+            step.state = 'failed'
+        step.finished = time.perf_counter()
+
+        with self._lock:
+            self._submit_ready_steps()
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the bring-up to end and return whether it did."""
+        return self._done.wait(timeout)
+
+    def check(self) -> None:
+        """Raise the error of the first failed step, if any."""
+        for step in self._steps.values():
+            if step.error is not None:
+                raise RuntimeError(
+                    f'Startup step {step.name} failed') from step.error
+
+    def result(self, name: str) -> Any:
+        """Return the value returned by a finished step."""
+        return self._steps[name].result
+
+    def status(self) -> str:
+        """Return a single line describing the progress of every step."""
+        steps = ', '.join(str(step) for step in self._steps.values())
+        if not self.done:
+            return f'Initializing: {steps}'
+        for step in self._steps.values():
+            if step.error is not None:
+                return f'Startup failed in {step.name}: {step.error}'
+
+        return f'Ready in {self.duration * 1e3:.0f} ms: {steps}'
@@ -0,0 +1,136 @@
+"""Telemetry recorder writing fixed-width records into a memory-mapped ring."""
+import os
+
+from typing import Optional
+
+import numpy as np
+
+from mp_calibration_tool.clock import SYSTEM_CLOCK
+from mp_calibration_tool.clock import Clock
+
+
+TELEMETRY_MAGIC = b'MPCTTLM1'
+TELEMETRY_HEADER_SIZE = 64
+DEFAULT_TELEMETRY_CAPACITY = 100 * 60 * 60 * 4  # 4 hours at 100 Hz
+
+HEADER_DTYPE = np.dtype([
+    ('magic', 'S8'),
+    ('capacity', '<u8'),
+    ('count', '<u8'),
+])
+
+TELEMETRY_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('current', '<i8'),
+    ('overload_hold_counter', '<i4'),
+    ('overload', 'u1'),
+    ('joints', '<f4', (3, 4)),
+], align=True)
+
+
+class TelemetryRecorder():
+    """Record battery current, overload state and joint commands to a file.
+
+    The file is preallocated to hold ``capacity`` records and is used as a
+    ring buffer, so the newest ``capacity`` samples are always on disk.
+    Recording a sample only writes into views of the memory map and does
+    not allocate any arrays.
+    """
+
+    def __init__(
+            self,
+            path: str,
+            capacity: int = DEFAULT_TELEMETRY_CAPACITY,
+            clock: Clock = SYSTEM_CLOCK
+        ) -> None:
+        self._path = path
+        self._capacity = capacity
+        self._clock = clock
+
+        with open(path, 'wb') as tlm_f:
+            tlm_f.truncate(
+                TELEMETRY_HEADER_SIZE + capacity * TELEMETRY_DTYPE.itemsize)
+
+        self._header = np.memmap(
+            path, dtype=HEADER_DTYPE, mode='r+', shape=(1,))
+        self._header['magic'] = TELEMETRY_MAGIC
+        self._header['capacity'] = capacity
+        self._header['count'] = 0
+        self._count = self._header['count']
+
+        self._records = np.memmap(
+            path, dtype=TELEMETRY_DTYPE, mode='r+',
+            offset=TELEMETRY_HEADER_SIZE, shape=(capacity,))
+        self._timestamp = self._records['timestamp']
+        self._current = self._records['current']
+        self._overload_hold_counter = self._records['overload_hold_counter']
+        self._overload = self._records['overload']
+        self._joints = self._records['joints']
+        self._index = 0
+
+    @property
+    def path(self) -> str:
+        return self._path
+
+    @property
+    def capacity(self) -> int:
+        return self._capacity
+
+    def record(
+            self,
+            current: int,
+            overload_hold_counter: int,
+            overload: bool,
+            joints: np.ndarray,
+            timestamp: Optional[float] = None
+        ) -> None:
+        """Write a single sample into the next slot of the ring."""
+        index = self._index
+        self._timestamp[index] = self._clock.time() if timestamp is None else timestamp
+        self._current[index] = current
+        self._overload_hold_counter[index] = overload_hold_counter
+        self._overload[index] = overload
+        self._joints[index] = joints
+
+        self._index = index + 1 if index + 1 < self._capacity else 0
+        self._count += 1
+
+    def flush(self) -> None:
+        """Flush the memory map to disk."""
+        self._header.flush()
+        self._records.flush()
+
+    def close(self) -> None:
+        """Flush and release the memory map."""
+        self.flush()
+        del self._timestamp, self._current, self._overload_hold_counter
+        del self._overload, self._joints, self._count
+        del self._records, self._header
+
+    def __enter__(self) -> 'TelemetryRecorder':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+def load_telemetry(path: str) -> np.ndarray:
+    """Load a telemetry file as a structured array in chronological order."""
+    header = np.fromfile(path, dtype=HEADER_DTYPE, count=1)
+    if header.size == 0 or header['magic'][0] != TELEMETRY_MAGIC:
+        raise ValueError(f'{path} is not a telemetry file!')
+
+    capacity = int(header['capacity'][0])
+    count = int(header['count'][0])
+    expected_size = TELEMETRY_HEADER_SIZE + capacity * TELEMETRY_DTYPE.itemsize
+    if os.path.getsize(path) < expected_size:
+        raise ValueError(f'{path} is truncated!')
+
+    records = np.memmap(
+        path, dtype=TELEMETRY_DTYPE, mode='r',
+        offset=TELEMETRY_HEADER_SIZE, shape=(capacity,))
+    if count <= capacity:
+        return np.array(records[:count])
+
+    start = count % capacity
+    return np.concatenate((records[start:], records[:start]))
@@ -0,0 +1,253 @@
+"""Per-robot overload thresholds learned from battery current history."""
+import json
+import os
+import tempfile
+
+from dataclasses import asdict
+from dataclasses import dataclass
+from typing import Dict
+from typing import Iterable
+from typing import List
+from typing import Optional
+
+
+DEFAULT_THRESHOLDS_PATH = os.path.expanduser('~/.mpct/thresholds.json')
+
+DEFAULT_CURRENT_MAX = 1500000
+DEFAULT_HOLD_COUNTER_MAX = 100  # almost 3s
+
+# Learned thresholds never leave these bounds, so a noisy history can not
+# cut power on a healthy robot nor stop a real stall from tripping
+CURRENT_MAX_BOUNDS = (1200000, 2000000)
+HOLD_COUNTER_MAX_BOUNDS = (DEFAULT_HOLD_COUNTER_MAX, 150)
+
+
+class P2Quantile():
+    """Streaming estimate of a quantile with the P-square algorithm.
+
+    Only five markers are kept, whatever the number of observations.
+    """
+
+    def __init__(self, quantile: float) -> None:
+        if not 0.0 < quantile < 1.0:
+            raise ValueError('Quantile must be between 0 and 1!')
+        self.quantile = quantile
+        self.count = 0
+        self._heights: List[float] = []
+        self._positions = [1.0, 2.0, 3.0, 4.0, 5.0]
+        self._desired = [
+            1.0,
+            1.0 + 2.0 * quantile,
+            1.0 + 4.0 * quantile,
+            3.0 + 2.0 * quantile,
+            5.0,
+        ]
+        self._increments = [0.0, quantile / 2.0, quantile, (1.0 + quantile) / 2.0, 1.0]
+
+    @property
+    def value(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            heights = sorted(self._heights)
+            return heights[min(len(heights) - 1, int(self.quantile * len(heights)))]
+
+        return self._heights[2]
+
+    def observe(self, x: float) -> None:
+        """Update the estimate with a new observation."""
+        self.count += 1
+        heights = self._heights
+        if self.count <= 5:
+            heights.append(x)
+            if self.count == 5:
+                heights.sort()
+            return
+
+        if x < heights[0]:
+            heights[0] = x
+            k = 0
+        elif x >= heights[4]:
+            heights[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= heights[k + 1]:
+                k += 1
+
+        positions = self._positions
+        for i in range(k + 1, 5):
+            positions[i] += 1.0
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in range(1, 4):
+            d = self._desired[i] - positions[i]
+            if (d >= 1.0 and positions[i + 1] - positions[i] > 1.0) or \
+                    (d <= -1.0 and positions[i - 1] - positions[i] < -1.0):
+                d = 1.0 if d > 0 else -1.0
+                height = self._parabolic(i, d)
+                if not heights[i - 1] < height < heights[i + 1]:
+                    height = self._linear(i, d)
+                heights[i] = height
+                positions[i] += d
+
+    def _parabolic(self, i: int, d: float) -> float:
+        q = self._heights
+        n = self._positions
+        return q[i] + d / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + d) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - d) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def _linear(self, i: int, d: float) -> float:
+        q = self._heights
+        n = self._positions
+        j = i + int(d)
+        return q[i] + d * (q[j] - q[i]) / (n[j] - n[i])
+
+
+@dataclass
+class OverloadThresholds():
+    """Overload detection thresholds of a single robot."""
+    current_max: int = DEFAULT_CURRENT_MAX
+    hold_counter_max: int = DEFAULT_HOLD_COUNTER_MAX
+    robot_id: str = ''
+    samples: int = 0
+
+    def bounded(self) -> 'OverloadThresholds':
+        """Return the thresholds clamped to the safety bounds."""
+        low, high = CURRENT_MAX_BOUNDS
+        current_max = min(high, max(low, int(self.current_max)))
+        low, high = HOLD_COUNTER_MAX_BOUNDS
+        hold_counter_max = min(high, max(low, int(self.hold_counter_max)))
+
+        return OverloadThresholds(
+            current_max, hold_counter_max, self.robot_id, self.samples)
+
+    def __str__(self) -> str:
+        return (
+            f'{self.robot_id}: overload above {self.current_max} uA '
+            f'held for {self.hold_counter_max} samples '
+            f'(learned from {self.samples} samples)'
+        )
+
+
+class ThresholdLearner():
+    """Learn overload thresholds from a stream of battery currents.
+
+    The current threshold is a high quantile of the currents with a margin.
+    The hold counter threshold is a high quantile of how long the current
+    stays above that level, with a margin, so the usual bursts of a
+    healthy robot do not trip while a stall that lasts longer does.
+    """
+
+    def __init__(
+            self,
+            quantile: float = 0.999,
+            current_margin: float = 1.2,
+            burst_quantile: float = 0.99,
+            hold_margin: float = 2.0,
+            min_samples: int = 1000
+        ) -> None:
+        self._current = P2Quantile(quantile)
+        self._burst = P2Quantile(burst_quantile)
+        self._current_margin = current_margin
+        self._hold_margin = hold_margin
+        self._min_samples = min_samples
+        self._burst_length = 0
+
+    @property
+    def samples(self) -> int:
+        return self._current.count
+
+    def observe(self, current: int) -> None:
+        """Add a battery current sample in uA."""
+        self._current.observe(current)
+        if self._current.count < self._min_samples:
+            return
+
+        if current > self._current.value:
+            self._burst_length += 1
+        elif self._burst_length > 0:
+            self._burst.observe(self._burst_length)
+            self._burst_length = 0
+
+    def observe_many(self, currents: Iterable[int]) -> None:
+        """Add many battery current samples in uA."""
+        for current in currents:
+            self.observe(current)
+
+    def learn(self, robot_id: str) -> OverloadThresholds:
+        """Return the bounded thresholds learned so far.
+
+        The defaults are kept until enough samples were seen.
+        """
+        thresholds = OverloadThresholds(robot_id=robot_id, samples=self.samples)
+        if self.samples >= self._min_samples:
+            thresholds.current_max = int(
+                self._current.value * self._current_margin)
+        if self._burst.count >= 5:
+            thresholds.hold_counter_max = int(
+                self._burst.value * self._hold_margin)
+
+        return thresholds.bounded()
+
+
+def load_thresholds(path: str, robot_id: str) -> Optional[OverloadThresholds]:
+    """Return the bounded thresholds stored for a robot, if any.
+
+    A corrupt or hand-edited file counts as having none, so the defaults
+    apply rather than keeping the tool from starting.
+    """
+    try:
+        with open(path, 'r') as thresholds_f:
+            stored = json.load(thresholds_f)
+    except FileNotFoundError:
+        return None
+    except ValueError as error:
+        print(f'Ignoring the overload thresholds in {path}: {error}')
+        return None
+
+    if not isinstance(stored, dict) or robot_id not in stored:
+        return None
+
+    try:
+        return OverloadThresholds(**stored[robot_id]).bounded()
+    except (TypeError, ValueError) as error:
+        print(f'Ignoring the overload thresholds of {robot_id} in {path}: '
+              f'{error}')
+        return None
+
+
+def save_thresholds(path: str, thresholds: OverloadThresholds) -> None:
+    """Store the thresholds of a robot, keeping those of other robots.
+
+    A corrupt file is moved aside to path.corrupt and replaced, so the
+    thresholds just learned are never lost to it.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    try:
+        with open(path, 'r') as thresholds_f:
+            stored: Dict[str, Dict] = json.load(thresholds_f)
+    except FileNotFoundError:
+        stored = {}
+    except ValueError:
+        stored = None
+    if not isinstance(stored, dict):
+        print(f'Moving the corrupt overload thresholds in {path} to '
+              f'{path}.corrupt')
+        os.replace(path, f'{path}.corrupt')
+        stored = {}
+    stored[thresholds.robot_id] = asdict(thresholds)
+
+    fd, tmp_path = tempfile.mkstemp(
+        dir=directory, prefix='.mpct-thresholds-', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as thresholds_f:
+            json.dump(stored, thresholds_f, indent=2)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -0,0 +1,263 @@
+"""Local browser dashboard streaming Pupper state as server-sent events."""
+from array import array
+from http.server import BaseHTTPRequestHandler
+from http.server import ThreadingHTTPServer
+import json
+import threading
+
+from typing import Any
+from typing import Dict
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from mp_calibration_tool.clock import SYSTEM_CLOCK
+from mp_calibration_tool.clock import Clock
+from mp_calibration_tool.quadruped import JOINT_NAMES
+from mp_calibration_tool.quadruped import LEG_NAMES
+from mp_calibration_tool.quadruped import Pupper
+
+
+DASHBOARD_PAGE = b'''<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>Mini Pupper Calibration</title>
+<style>
+body { font-family: monospace; margin: 2em; }
+table { border-collapse: collapse; }
+td, th { border: 1px solid #888; padding: 0.3em 0.8em; text-align: right; }
+.overload { color: white; background: red; }
+</style>
+</head>
+<body>
+<h1>Mini Pupper Calibration</h1>
+<table>
+<tr><th>Leg</th><th>hip</th><th>thigh</th><th>calf</th></tr>
+<tr><th>left_front</th><td id="left_front.hip"></td><td id="left_front.thigh"></td><td id="left_front.calf"></td></tr>
+<tr><th>right_front</th><td id="right_front.hip"></td><td id="right_front.thigh"></td><td id="right_front.calf"></td></tr>
+<tr><th>left_back</th><td id="left_back.hip"></td><td id="left_back.thigh"></td><td id="left_back.calf"></td></tr>
+<tr><th>right_back</th><td id="right_back.hip"></td><td id="right_back.thigh"></td><td id="right_back.calf"></td></tr>
+</table>
+<p>Overload: <span id="overload"></span>
+ (hold counter <span id="overload_hold_counter"></span>)</p>
+<p>Battery current: <span id="current"></span> uA</p>
+<p id="overload_note"></p>
+<script>
+const events = new EventSource('/events');
+events.onmessage = function (message) {
+  const delta = JSON.parse(message.data);
+  for (const key in delta) {
+    const cell = document.getElementById(key);
+    if (cell !== null) {
+      cell.textContent = delta[key];
+    }
+  }
+  if ('overload' in delta) {
+    document.getElementById('overload').className =
+      delta.overload ? 'overload' : '';
+  }
+};
+</script>
+</body>
+</html>
+'''
+
+
+class ClientStream():
+    """Pending changes of a single dashboard client.
+
+    Changes are merged into a dict instead of queued, so a slow client
+    only ever holds the latest value of every field and publishing to it
+    never waits for the network.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+        self._pending: Dict[str, Any] = {}
+
+    def push(self, delta: Dict[str, Any]) -> None:
+        """Merge a delta into the pending changes."""
+        with self._lock:
+            self._pending.update(delta)
+        self._ready.set()
+
+    def take(self, timeout: float) -> Dict[str, Any]:
+        """Wait for and return all pending changes."""
+        self._ready.wait(timeout)
+        with self._lock:
+            pending = self._pending
+            self._pending = {}
+            self._ready.clear()
+
+        return pending
+
+
+class DashboardPublisher(threading.Thread):
+    """Sample the Pupper state at a capped rate and fan out the changes."""
+
+    def __init__(
+            self,
+            pupper: Pupper,
+            max_rate: float = 10.0,
+            clock: Clock = SYSTEM_CLOCK,
+            live: bool = True
+        ) -> None:
+        super().__init__(name='web-publisher', daemon=True)
+        self._pupper = pupper
+        self._live = live
+        self._period = 1.0 / max_rate
+        self._clock = clock
+        self._clients_lock = threading.Lock()
+        self._clients: List[ClientStream] = []
+        self._state: Dict[str, Any] = {}
+        self._stop_event = threading.Event()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Return the current dashboard fields of the Pupper.
+
+        The joints come from one read of the joint snapshot, so they are
+        never a half-updated pose. Subscribing clients call this from their
+        own threads, so every call reads into its own buffer.
+        """
+        joints = array('i', bytes(4 * 12))
+        self._pupper.joint_snapshot.read(joints)
+        state = {}
+        for j, leg in enumerate(LEG_NAMES):
+            for k, joint in enumerate(JOINT_NAMES):
+                state[f'{leg}.{joint}'] = joints[3 * j + k]
+        state['overload'] = bool(self._pupper.overload)
+        state['overload_hold_counter'] = self._pupper.overload_hold_counter
+        state['current'] = self._pupper.current_now
+        state['overload_note'] = '' if self._live else (
+            'Overload and current are not live, run with --live to '
+            'update them.')
+
+        return state
+
+    def subscribe(self) -> ClientStream:
+        """Register a new client and seed it with the full state."""
+        client = ClientStream()
+        client.push(self.snapshot())
+        with self._clients_lock:
+            self._clients.append(client)
+
+        return client
+
+    def unsubscribe(self, client: ClientStream) -> None:
+        """Forget a disconnected client."""
+        with self._clients_lock:
+            self._clients.remove(client)
+
+    def publish(self) -> None:
+        """Send the fields that changed since the last publish."""
+        state = self.snapshot()
+        delta = {
+            key: value for key, value in state.items()
+            if self._state.get(key) != value
+        }
+        self._state = state
+        if not delta:
+            return
+
+        with self._clients_lock:
+            clients = list(self._clients)
+        for client in clients:
+            client.push(delta)
+
+    def run(self) -> None:
+        """Publish until stopped."""
+        self._state = self.snapshot()
+        while not self._clock.wait(self._stop_event, self._period):
+            self.publish()
+
+    def stop(self) -> None:
+        """Stop publishing."""
+        self._stop_event.set()
+
+
+class DashboardRequestHandler(BaseHTTPRequestHandler):
+    """Serve the dashboard page and its event stream."""
+
+    publisher: Optional[DashboardPublisher] = None
+    keepalive = 15.0
+
+    def log_message(self, format: str, *args) -> None:
+        """Keep request logging off the calibration UI."""
+
+    def do_GET(self) -> None:
+        if self.path in ['/', '/index.html']:
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(DASHBOARD_PAGE)))
+            self.end_headers()
+            self.wfile.write(DASHBOARD_PAGE)
+        elif self.path == '/events':
+            self._stream_events()
+        else:
+            self.send_error(404)
+
+    def _stream_events(self) -> None:
+        """Write pending changes to the client until it disconnects."""
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.end_headers()
+
+        client = self.publisher.subscribe()
+        try:
+            while not self.server.stopping:
+                delta = client.take(self.keepalive)
+                if delta:
+                    self.wfile.write(
+                        b'data: ' + json.dumps(delta).encode() + b'\n\n')
+                else:
+                    self.wfile.write(b': keepalive\n\n')
+                self.wfile.flush()
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            self.publisher.unsubscribe(client)
+
+
+class WebDashboard():
+    """Local HTTP server for the browser dashboard."""
+
+    def __init__(
+            self,
+            pupper: Pupper,
+            host: str = '0.0.0.0',
+            port: int = 8080,
+            max_rate: float = 10.0,
+            clock: Clock = SYSTEM_CLOCK,
+            live: bool = True
+        ) -> None:
+        self.publisher = DashboardPublisher(pupper, max_rate, clock, live)
+        handler = type(
+            'BoundDashboardRequestHandler',
+            (DashboardRequestHandler,),
+            {'publisher': self.publisher}
+        )
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._server.stopping = False
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        return self._server.server_address
+
+    def start(self) -> None:
+        """Start publishing and serving in background threads."""
+        self.publisher.start()
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name='web-server', daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the server and the publisher."""
+        self._server.stopping = True
+        self.publisher.stop()
+        self._server.shutdown()
+        self._server.server_close()
@@ -0,0 +1,137 @@
+"""Background writer taking slow EEPROM and GPIO writes off the caller."""
+from collections import OrderedDict
+from concurrent.futures import Future
+import threading
+import time
+
+from typing import Any
+from typing import Callable
+from typing import Hashable
+from typing import List
+from typing import Optional
+from typing import Tuple
+
+from mp_calibration_tool.metrics import REGISTRY
+
+
+WRITE_QUEUE_DEPTH = REGISTRY.gauge(
+    'mpct_write_queue_depth', 'Number of device writes waiting to run.')
+WRITE_LATENCY_SECONDS = REGISTRY.histogram(
+    'mpct_write_latency_seconds',
+    'Time from queueing a device write until it completed.')
+WRITES_MERGED = REGISTRY.counter(
+    'mpct_writes_merged_total',
+    'Number of queued writes superseded by newer ones.')
+WRITE_ERRORS = REGISTRY.counter(
+    'mpct_write_errors_total',
+    'Number of background device writes that failed.')
+
+
+class _Write():
+    """Latest write queued for a key and everyone waiting for it."""
+
+    def __init__(
+            self,
+            write: Callable[..., Any],
+            args: Tuple,
+            future: Future
+        ) -> None:
+        self.write = write
+        self.args = args
+        self.futures: List[Future] = [future]
+        self.queued = time.perf_counter()
+
+
+class WriteBehindQueue():
+    """Single background thread running device writes in order.
+
+    Every write has a key naming what it overwrites, like the calibration
+    EEPROM or a set of GPIOs. A write queued while another one for the same
+    key is still waiting replaces it, so only the latest value is written,
+    and the futures of both complete once it is. A failed write is only
+    counted and raises from the futures, since printing from this thread
+    would land in the middle of the UI.
+
+    Queueing blocks while max_pending distinct keys are waiting.
+    """
+
+    def __init__(self, max_pending: int = 16) -> None:
+        self._max_pending = max_pending
+        self._pending: 'OrderedDict[Hashable, _Write]' = OrderedDict()
+        self._condition = threading.Condition()
+        self._busy = False
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name='write-behind', daemon=True)
+        self._thread.start()
+
+    @property
+    def depth(self) -> int:
+        return len(self._pending)
+
+    def submit(
+            self,
+            key: Hashable,
+            write: Callable[..., Any],
+            *args
+        ) -> Future:
+        """Queue write(*args) and return a future of its result."""
+        future: Future = Future()
+        with self._condition:
+            if self._closed:
+                raise RuntimeError('Write-behind queue is closed!')
+
+            queued = self._pending.get(key)
+            if queued is not None:
+                queued.write = write
+                queued.args = args
+                queued.futures.append(future)
+                WRITES_MERGED.inc()
+            else:
+                while len(self._pending) >= self._max_pending:
+                    self._condition.wait()
+                self._pending[key] = _Write(write, args, future)
+
+            WRITE_QUEUE_DEPTH.set(len(self._pending))
+            self._condition.notify_all()
+
+        return future
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every queued write ran and return whether they did."""
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: not self._pending and not self._busy, timeout)
+
+    def close(self) -> None:
+        """Run the writes still queued and stop the writer thread."""
+        with self._condition:
+            self._closed = True
+            self._condition.notify_all()
+        self._thread.join()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closed)
+                if not self._pending:
+                    return
+                _, queued = self._pending.popitem(last=False)
+                self._busy = True
+                WRITE_QUEUE_DEPTH.set(len(self._pending))
+                self._condition.notify_all()
+
+            try:
+                result = queued.write(*queued.args)
+            except Exception as error:
+                WRITE_ERRORS.inc()
+                for future in queued.futures:
+                    future.set_exception(error)
+            else:
+                for future in queued.futures:
+                    future.set_result(result)
+            WRITE_LATENCY_SECONDS.observe(time.perf_counter() - queued.queued)
+
+            with self._condition:
+                self._busy = False
+                self._condition.notify_all()
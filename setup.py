@@ -10,6 +10,7 @@ setup(
         ('dockerfiles')
     ],
     install_requires=['setuptools', 'rich'],
+    extras_require={'analysis': ['numpy']},
     zip_safe=False,
     maintainer='zmk5',
     maintainer_email='zkakish@gmail.com',
@@ -0,0 +1,89 @@
+"""Tests of the calibration transform, lookup table and validation."""
+import math
+import random
+
+import pytest
+
+from mp_calibration_tool.calibration import CalibrationTransform
+from mp_calibration_tool.calibration import JointLookupTable
+from mp_calibration_tool.calibration import validate_matrix
+from mp_calibration_tool.matrix import Matrix
+
+
+RANGES = [(-100, 100), (-100, 100), (-200, 0)]
+
+
+def create_transform() -> CalibrationTransform:
+    return CalibrationTransform(offset=Matrix.from_rows([
+        [3, -7, 0, 12],
+        [45, 40, 52, 45],
+        [-45, -38, -51, -90],
+    ], 'd'))
+
+
+def arithmetic_commands(transform, joints, convert=None) -> Matrix:
+    """Command the joints through the float math the table replaces."""
+    values = Matrix.zeros(3, 4)
+    for servo in range(12):
+        axis, leg = divmod(servo, 4)
+        low, high = RANGES[axis]
+        values[axis, leg] = min(high, max(low, joints[3 * leg + axis]))
+    commands = transform.apply(values, Matrix.zeros(3, 4))
+    if convert is not None:
+        commands = Matrix(3, 4, 'd', [convert(value) for value in commands.data])
+
+    return commands
+
+
+@pytest.mark.parametrize('convert', [None, lambda angle: 1500 + 500 * angle])
+def test_lookup_table_matches_the_arithmetic_path(convert):
+    transform = create_transform()
+    table = JointLookupTable(RANGES)
+    table.compile(transform, convert)
+    rng = random.Random(1)
+
+    out = Matrix.zeros(3, 4)
+    for _ in range(500):
+        # Includes values out of range, which both paths clamp
+        joints = [rng.randint(-250, 150) for _ in range(12)]
+        expected = arithmetic_commands(transform, joints, convert)
+        assert table.apply(joints, out).data == pytest.approx(expected.data)
+
+
+def test_lookup_table_follows_a_recompiled_calibration():
+    table = JointLookupTable(RANGES)
+    table.compile(CalibrationTransform())
+    transform = create_transform()
+    table.compile(transform)
+
+    joints = [10, 20, -30] * 4
+    expected = arithmetic_commands(transform, joints)
+    assert table.apply(joints, Matrix.zeros(3, 4)).data == pytest.approx(
+        expected.data)
+
+
+def test_validate_matrix_accepts_calibration_angles():
+    validate_matrix([[0, 0, 0, 0], [45, 45, 45, 45], [-45, -45, -45, -45.5]])
+    validate_matrix(Matrix.from_rows([[90] * 4, [-90] * 4, [0] * 4]))
+
+
+@pytest.mark.parametrize('matrix', [
+    [[True, 0, 0, 0], [0] * 4, [0] * 4],
+    [[math.nan, 0, 0, 0], [0] * 4, [0] * 4],
+    [[math.inf, 0, 0, 0], [0] * 4, [0] * 4],
+    [['1', 0, 0, 0], [0] * 4, [0] * 4],
+    [[91, 0, 0, 0], [0] * 4, [0] * 4],
+    [[0] * 4, [0] * 4],
+    [[0] * 4, [0] * 3, [0] * 4],
+    [[[0] * 4] * 3] * 2,
+    None,
+    5,
+])
+def test_validate_matrix_rejects_invalid_matrices(matrix):
+    with pytest.raises(ValueError):
+        validate_matrix(matrix)
+
+
+def test_validate_matrix_reports_the_shape_it_got():
+    with pytest.raises(ValueError, match=r'3 rows of 4 angles, got 2 rows'):
+        validate_matrix([[0] * 4, [0] * 3])
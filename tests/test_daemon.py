@@ -0,0 +1,126 @@
+"""Tests of the robot daemon control socket protocol."""
+import asyncio
+import json
+import socket
+import threading
+
+import pytest
+
+from mp_calibration_tool.backend import SimulatedServoDriver
+from mp_calibration_tool.daemon import DaemonClient
+from mp_calibration_tool.daemon import DaemonError
+from mp_calibration_tool.daemon import StandInDaemon
+
+
+MATRIX = [[0, 0, 0, 0], [45, 45, 45, 45], [-45, -45, -45, -45]]
+
+
+@pytest.fixture
+def daemon(tmp_path):
+    return StandInDaemon(
+        SimulatedServoDriver(), MATRIX, str(tmp_path / 'daemon.sock'))
+
+
+def handle(daemon: StandInDaemon, message) -> dict:
+    """Answer a request line, running a control tick while it waits."""
+    line = message if isinstance(message, bytes) else json.dumps(message)
+
+    async def run() -> dict:
+        response = asyncio.ensure_future(daemon._handle_line(line))
+        await asyncio.sleep(0)
+        daemon.tick()
+        return await response
+
+    return asyncio.run(run())
+
+
+def test_applied_calibration_drives_the_next_tick(daemon):
+    matrix = [[1, 2, 3, 4], [40, 41, 42, 43], [-40, -41, -42, -43]]
+    response = handle(daemon, {
+        'id': 7, 'method': 'apply_calibration', 'params': {'matrix': matrix}})
+    assert response['id'] == 7
+    assert response['result']['generation'] == 2
+
+    response = handle(daemon, {'id': 8, 'method': 'get_calibration'})
+    assert response['result']['matrix'] == matrix
+
+
+@pytest.mark.parametrize('message, error', [
+    (b'not json\n', 'Invalid JSON request!'),
+    ([1, 2], 'Request must be a JSON object!'),
+    ({'id': 1, 'method': 'reboot'}, 'Unknown method: reboot'),
+    ({'id': 1, 'method': 7}, 'Unknown method: 7'),
+    ({'id': 1, 'method': 'ping', 'params': 'now'},
+     'Params must be a JSON object!'),
+])
+def test_invalid_request_is_answered_with_an_error(daemon, message, error):
+    assert handle(daemon, message)['error'] == error
+
+
+@pytest.mark.parametrize('matrix', [
+    None,
+    [[0] * 4] * 2,
+    [[True] * 4] * 3,
+    [[float('nan')] * 4] * 3,
+])
+def test_invalid_matrix_is_not_applied(daemon, matrix):
+    response = handle(daemon, {
+        'id': 1, 'method': 'apply_calibration', 'params': {'matrix': matrix}})
+    assert 'error' in response
+    assert daemon.generation == 1
+
+
+def serve_once(path: str, response: bytes) -> threading.Thread:
+    """Answer the first request sent to path with a canned response."""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(1)
+
+    def answer() -> None:
+        connection, _ = listener.accept()
+        with listener, connection, connection.makefile('rb') as request_f:
+            request_f.readline()
+            connection.sendall(response)
+
+    thread = threading.Thread(target=answer)
+    thread.start()
+    return thread
+
+
+def test_client_returns_the_result(tmp_path):
+    path = str(tmp_path / 'daemon.sock')
+    thread = serve_once(path, b'{"id": 1, "result": {"ticks": 3}}\n')
+    client = DaemonClient(path)
+    try:
+        assert client.ping() == {'ticks': 3}
+    finally:
+        client.close()
+        thread.join()
+
+
+@pytest.mark.parametrize('response, error', [
+    (b'{"id": 1, "resu\n', 'Invalid JSON'),
+    (b'[1]\n', 'not a JSON object'),
+    (b'{"id": 1}\n', 'no result'),
+    (b'{"id": 1, "error": "Unknown method: ping"}\n', 'Unknown method'),
+])
+def test_client_rejects_invalid_responses(tmp_path, response, error):
+    path = str(tmp_path / 'daemon.sock')
+    thread = serve_once(path, response)
+    client = DaemonClient(path)
+    try:
+        with pytest.raises(DaemonError, match=error):
+            client.ping()
+    finally:
+        client.close()
+        thread.join()
+
+
+def test_client_drops_a_connection_sending_invalid_json(tmp_path):
+    path = str(tmp_path / 'daemon.sock')
+    thread = serve_once(path, b'garbage\n')
+    client = DaemonClient(path)
+    with pytest.raises(DaemonError):
+        client.ping()
+    thread.join()
+    assert client._socket is None
@@ -0,0 +1,97 @@
+"""Tests of the published calibration record."""
+import pytest
+
+from mp_calibration_tool.published import CHECKSUM_START
+from mp_calibration_tool.published import SEQUENCE
+from mp_calibration_tool.published import SEQUENCE_OFFSET
+from mp_calibration_tool.published import CalibrationPublisher
+from mp_calibration_tool.published import CalibrationReader
+
+
+MATRIX = [[1, 2, 3, 4], [45, 46, 47, 48], [-45, -46, -47, -48]]
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / 'calibration')
+
+
+def publish(path: str, matrix=MATRIX) -> int:
+    publisher = CalibrationPublisher(path)
+    try:
+        return publisher.publish(matrix, 'P2', 'robot-1', 1234.5)
+    finally:
+        publisher.close()
+
+
+def test_record_round_trips(path):
+    assert publish(path) == 1
+
+    with CalibrationReader(path) as reader:
+        calibration = reader.read()
+        assert calibration.generation == 1
+        assert calibration.timestamp == 1234.5
+        assert calibration.matrix.tolist() == MATRIX
+        assert calibration.hw_version == 'P2'
+        assert calibration.robot_id == 'robot-1'
+        assert reader.read_if_changed(1) is None
+
+
+def test_generation_counts_across_publishers(path):
+    publish(path)
+    assert publish(path, [[0] * 4] * 3) == 2
+
+    with CalibrationReader(path) as reader:
+        assert reader.read().matrix.tolist() == [[0] * 4] * 3
+
+
+@pytest.mark.parametrize('offset', [CHECKSUM_START, 40, 100])
+def test_corrupted_record_is_rejected(path, offset):
+    publish(path)
+    with open(path, 'r+b') as record_f:
+        record_f.seek(offset)
+        byte = record_f.read(1)
+        record_f.seek(offset)
+        record_f.write(bytes([byte[0] ^ 0xff]))
+
+    with CalibrationReader(path) as reader:
+        with pytest.raises(ValueError, match='corrupt'):
+            reader.read()
+
+
+def test_record_being_written_is_not_read(path):
+    publish(path)
+    with open(path, 'r+b') as record_f:
+        record_f.seek(SEQUENCE_OFFSET)
+        record_f.write(SEQUENCE.pack(3))
+
+    with CalibrationReader(path, timeout=0.01) as reader:
+        with pytest.raises(ValueError, match='kept changing'):
+            reader.read()
+
+    # The next publisher finishes the write its predecessor left behind
+    assert publish(path) == 2
+    with CalibrationReader(path) as reader:
+        assert reader.read().generation == 2
+
+
+def test_empty_and_foreign_records_are_rejected(path, tmp_path):
+    CalibrationPublisher(path).close()
+    with CalibrationReader(path) as reader:
+        with pytest.raises(ValueError, match='No calibration'):
+            reader.read()
+
+    foreign = tmp_path / 'foreign'
+    foreign.write_bytes(b'\0' * 200)
+    with pytest.raises(ValueError):
+        CalibrationReader(str(foreign))
+
+
+def test_invalid_matrix_is_not_published(path):
+    publisher = CalibrationPublisher(path)
+    try:
+        with pytest.raises(ValueError):
+            publisher.publish([[True] * 4] * 3, 'P2', 'robot-1', 0.0)
+        assert publisher.generation == 0
+    finally:
+        publisher.close()
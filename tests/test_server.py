@@ -0,0 +1,82 @@
+"""Tests of the RPC request handling."""
+import json
+
+import pytest
+
+from mp_calibration_tool.backend import EEPROM_PATH
+from mp_calibration_tool.backend import SimulatedBackend
+from mp_calibration_tool.quadruped import Pupper
+from mp_calibration_tool.server import PupperRpcServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    pupper = Pupper(
+        EEPROM_PATH, hardware=False, backend=SimulatedBackend(str(tmp_path)))
+    return PupperRpcServer(pupper, str(tmp_path / 'rpc.sock'))
+
+
+def call(server: PupperRpcServer, message) -> dict:
+    line = message if isinstance(message, bytes) else json.dumps(message)
+    return json.loads(server.handle_line(line))
+
+
+def test_valid_request_is_answered_with_its_result(server):
+    response = call(server, {'id': 1, 'method': 'set_joint', 'params': {
+        'leg': 'left_front', 'joint': 'hip', 'value': 12}})
+    assert response['id'] == 1
+    assert response['result']['left_front']['hip'] == 12
+
+
+@pytest.mark.parametrize('message, error', [
+    (b'{"id": 1', 'Invalid JSON request!'),
+    (5, 'Request must be a JSON object!'),
+    ({'id': 1, 'method': 'format_disk'}, 'Unknown method: format_disk'),
+    ({'id': 1, 'method': ['get_joints']}, "Unknown method: ['get_joints']"),
+    ({'id': 1, 'method': 'get_joints', 'params': [1]},
+     'Params must be a JSON object!'),
+    ({'id': 1, 'method': 'set_joints', 'params': {'updates': {}}},
+     'set_joints requires a list of updates!'),
+    ({'id': 1, 'method': 'set_joint', 'params': {
+        'leg': 'tail', 'joint': 'hip', 'value': 0}}, 'Unknown leg: tail'),
+    ({'id': 1, 'method': 'set_joint', 'params': {
+        'leg': 'left_front', 'joint': 'hip', 'value': True}},
+     'Joint value must be an int!'),
+])
+def test_invalid_request_is_answered_with_an_error(server, message, error):
+    response = call(server, message)
+    assert response['error'] == error
+    assert 'result' not in response
+
+
+def test_invalid_update_leaves_every_joint_untouched(server):
+    before = call(server, {'id': 1, 'method': 'get_joints'})['result']
+    call(server, {'id': 2, 'method': 'set_joints', 'params': {'updates': [
+        {'leg': 'left_front', 'joint': 'hip', 'value': 12},
+        {'leg': 'left_front', 'joint': 'knee', 'value': 12},
+    ]}})
+    assert call(server, {'id': 3, 'method': 'get_joints'})['result'] == before
+
+
+def test_batch_answers_every_request(server):
+    responses = call(server, [
+        {'id': 1, 'method': 'get_joints'},
+        'get_joints',
+        {'id': 3, 'method': 'get_joints', 'params': 'all'},
+    ])
+    assert 'result' in responses[0]
+    assert responses[1] == {
+        'id': None, 'error': 'Request must be a JSON object!'}
+    assert responses[2] == {'id': 3, 'error': 'Params must be a JSON object!'}
+
+
+def test_failing_method_is_answered_with_its_error(server, monkeypatch):
+    def fail(*args) -> None:
+        raise OSError('EEPROM is gone')
+
+    monkeypatch.setattr(server._pupper, '_write_calibration', fail)
+    response = call(server, {'id': 1, 'method': 'apply_calibration'})
+    assert response == {
+        'id': 1,
+        'error': 'apply_calibration failed: OSError: EEPROM is gone',
+    }
@@ -0,0 +1,99 @@
+"""Tests of the joint and status exchange between processes."""
+import threading
+import time
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from mp_calibration_tool.shared_state import HEARTBEAT_TIMEOUT
+from mp_calibration_tool.shared_state import PupperStatus
+from mp_calibration_tool.shared_state import SharedPupperState
+
+
+@pytest.fixture
+def state():
+    state = SharedPupperState()
+    yield state
+    state.close()
+    state.unlink()
+
+
+class PublishingArray(np.ndarray):
+    """Array publishing new joints while the first copy into it runs."""
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self.copies += 1
+        if self.copies == 1:
+            self.state.write_joints(self.values)
+
+
+def finish_write_later(sequence, delay: float = 0.02) -> threading.Thread:
+    """Complete a write left half done after delay."""
+    def finish() -> None:
+        time.sleep(delay)
+        sequence[...] += 1
+
+    thread = threading.Thread(target=finish)
+    thread.start()
+    return thread
+
+
+def test_joints_round_trip_between_attachments(state):
+    values = np.arange(12, dtype='<i4').reshape(4, 3)
+    state.write_joints(values)
+
+    other = SharedPupperState(state.name)
+    try:
+        out = np.zeros((4, 3), dtype='<i4')
+        assert other.read_joints(out) == 2
+        assert (out == values).all()
+    finally:
+        other.close()
+
+
+def test_read_joints_retries_when_written_meanwhile(state):
+    state.write_joints(np.ones((4, 3), dtype='<i4'))
+    out = np.zeros((4, 3), dtype='<i4').view(PublishingArray)
+    out.state = state
+    out.values = np.full((4, 3), 2, dtype='<i4')
+    out.copies = 0
+
+    assert state.read_joints(out) == 4
+    assert out.copies == 2
+    assert (out == 2).all()
+
+
+def test_read_joints_waits_for_a_write_in_progress(state):
+    state.write_joints(np.ones((4, 3), dtype='<i4'))
+    # A writer stopped between bumping the sequence and the joints
+    state._joint_sequence += 1
+    state._joints[...] = 2
+    thread = finish_write_later(state._joint_sequence)
+
+    out = np.zeros((4, 3), dtype='<i4')
+    assert state.read_joints(out) == 4
+    thread.join()
+    assert (out == 2).all()
+
+
+def test_read_status_waits_for_a_write_in_progress(state):
+    state.write_status(True, 7, 1500000)
+    state._status_sequence += 1
+    state._state['overload_hold_counter'] = 8
+    thread = finish_write_later(state._status_sequence)
+
+    status = state.read_status()
+    thread.join()
+    assert status.overload
+    assert status.overload_hold_counter == 8
+    assert status.current == 1500000
+
+
+def test_status_describes_a_stalled_control_process():
+    assert PupperStatus(False, 0, 0, 0.0).describe() == 'Control: starting'
+    status = PupperStatus(True, 3, 1500000, 10.0)
+    assert status.describe(now=10.5) == 'Control: OVERLOAD, 1500 mA, hold 3'
+    assert status.describe(now=10.0 + 2 * HEARTBEAT_TIMEOUT) == (
+        'Control: not responding')
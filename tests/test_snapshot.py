@@ -0,0 +1,55 @@
+"""Tests of the double-buffered joint snapshot."""
+from array import array
+
+from mp_calibration_tool.snapshot import JointSnapshot
+
+
+class PublishingBuffer(array):
+    """Buffer publishing new values while the first copy into it runs."""
+
+    def setup(self, snapshot: JointSnapshot, values) -> 'PublishingBuffer':
+        self.snapshot = snapshot
+        self.values = values
+        self.copies = 0
+        return self
+
+    def __setitem__(self, index, value) -> None:
+        super().__setitem__(index, value)
+        self.copies += 1
+        if self.copies == 1:
+            self.snapshot.publish(self.values)
+
+
+def test_read_returns_latest_publication():
+    snapshot = JointSnapshot()
+    out = array('i', bytes(4 * 12))
+    assert snapshot.read(out) == 0
+    assert list(out) == [0] * 12
+
+    snapshot.publish(range(12))
+    snapshot.publish(range(100, 112))
+    assert snapshot.read(out) == 2
+    assert list(out) == list(range(100, 112))
+
+
+def test_read_retries_when_published_meanwhile():
+    snapshot = JointSnapshot()
+    snapshot.publish([1] * 12)
+    out = PublishingBuffer('i', bytes(4 * 12)).setup(snapshot, [2] * 12)
+
+    assert snapshot.read(out) == 2
+    assert out.copies == 2
+    assert list(out) == [2] * 12
+
+
+def test_publish_leaves_the_read_buffer_alone():
+    snapshot = JointSnapshot()
+    snapshot.publish([1] * 12)
+
+    # The writer fills the other buffer, so a reader copying the selected
+    # one while a publication is under way never sees a mix of both
+    buffers = snapshot._buffers
+    selected = buffers[snapshot.sequence & 1]
+    snapshot.publish([2] * 12)
+    assert list(selected) == [1] * 12
+    assert list(buffers[snapshot.sequence & 1]) == [2] * 12
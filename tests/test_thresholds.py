@@ -0,0 +1,58 @@
+"""Tests of the overload threshold learning."""
+import random
+
+import pytest
+
+from mp_calibration_tool.thresholds import P2Quantile
+from mp_calibration_tool.thresholds import OverloadThresholds
+from mp_calibration_tool.thresholds import load_thresholds
+from mp_calibration_tool.thresholds import save_thresholds
+
+
+@pytest.mark.parametrize('quantile', [0.5, 0.9, 0.99])
+@pytest.mark.parametrize('distribution', ['uniform', 'normal', 'exponential'])
+def test_p2_quantile_matches_numpy(quantile, distribution):
+    np = pytest.importorskip('numpy')
+    rng = random.Random(1)
+    draw = {
+        'uniform': lambda: rng.uniform(0, 1000),
+        'normal': lambda: rng.gauss(500, 100),
+        'exponential': lambda: rng.expovariate(1 / 100),
+    }[distribution]
+    samples = [draw() for _ in range(20000)]
+
+    estimator = P2Quantile(quantile)
+    for sample in samples:
+        estimator.observe(sample)
+
+    expected = np.percentile(samples, quantile * 100)
+    spread = np.percentile(samples, 99) - np.percentile(samples, 1)
+    assert estimator.count == len(samples)
+    assert abs(estimator.value - expected) < 0.02 * spread
+
+
+def test_p2_quantile_of_few_samples_is_one_of_them():
+    estimator = P2Quantile(0.5)
+    assert estimator.value is None
+    for sample in [3, 1, 2]:
+        estimator.observe(sample)
+    assert estimator.value == 2
+
+
+def test_p2_quantile_rejects_quantiles_outside_0_1():
+    for quantile in [0.0, 1.0, 1.5]:
+        with pytest.raises(ValueError):
+            P2Quantile(quantile)
+
+
+def test_corrupt_thresholds_file_is_moved_aside(tmp_path):
+    path = str(tmp_path / 'thresholds.json')
+    with open(path, 'w') as thresholds_f:
+        thresholds_f.write('{"robot')
+
+    assert load_thresholds(path, 'robot') is None
+    save_thresholds(path, OverloadThresholds(1500000, 100, 'robot', 2000))
+
+    assert load_thresholds(path, 'robot').current_max == 1500000
+    with open(f'{path}.corrupt') as corrupt_f:
+        assert corrupt_f.read() == '{"robot'
@@ -0,0 +1,100 @@
+"""Tests of the write-behind queue."""
+import threading
+
+import pytest
+
+from mp_calibration_tool.writer import WriteBehindQueue
+
+
+@pytest.fixture
+def queue():
+    queue = WriteBehindQueue()
+    yield queue
+    queue.close()
+
+
+def hold(queue: WriteBehindQueue) -> threading.Event:
+    """Keep the writer busy until the returned event is set."""
+    started = threading.Event()
+    release = threading.Event()
+
+    def wait() -> None:
+        started.set()
+        release.wait()
+
+    queue.submit('hold', wait)
+    started.wait()
+    return release
+
+
+def test_writes_run_in_submission_order(queue):
+    written = []
+    release = hold(queue)
+    for key in ['a', 'b', 'c']:
+        queue.submit(key, written.append, key)
+    release.set()
+
+    assert queue.flush(timeout=5)
+    assert written == ['a', 'b', 'c']
+
+
+def test_waiting_write_is_replaced_by_a_newer_one(queue):
+    written = []
+    release = hold(queue)
+    first = queue.submit('eeprom', written.append, 1)
+    queue.submit('gpio', written.append, 'gpio')
+    second = queue.submit('eeprom', written.append, 2)
+    release.set()
+
+    assert queue.flush(timeout=5)
+    # The newer write keeps the place of the one it replaced
+    assert written == [2, 'gpio']
+    assert first.result() is None
+    assert second.result() is None
+    assert first.done() and second.done()
+
+
+def test_write_in_progress_is_not_replaced(queue):
+    written = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_write(value) -> None:
+        started.set()
+        release.wait()
+        written.append(value)
+
+    queue.submit('eeprom', slow_write, 1)
+    started.wait()
+    queue.submit('eeprom', written.append, 2)
+    release.set()
+
+    assert queue.flush(timeout=5)
+    assert written == [1, 2]
+
+
+def test_failed_write_raises_from_every_future(queue, capsys):
+    def fail() -> None:
+        raise OSError('bus error')
+
+    release = hold(queue)
+    futures = [queue.submit('eeprom', fail) for _ in range(2)]
+    release.set()
+
+    for future in futures:
+        with pytest.raises(OSError, match='bus error'):
+            future.result(timeout=5)
+    assert capsys.readouterr().out == ''
+
+
+def test_close_runs_the_queued_writes():
+    written = []
+    queue = WriteBehindQueue()
+    release = hold(queue)
+    queue.submit('a', written.append, 'a')
+    release.set()
+    queue.close()
+
+    assert written == ['a']
+    with pytest.raises(RuntimeError):
+        queue.submit('b', written.append, 'b')